@@ -0,0 +1,135 @@
+"""
+여러 분배의 지문 생성을 하나의 요청으로 묶는 계획을 세우는 파일
+
+분배마다 지문 1개짜리 프롬프트를 따로 보내면 긴 지시문이 매번 다시 전송되고 왕복 횟수도 분배 수만큼 늘어납니다.
+묶음 계획은 호환되는 분배(같은 학년 수준과 단어 목록)를 토큰 예산 안에서 하나의 "슬롯 목록" 프롬프트로 묶고,
+응답의 `slot` 필드로 지문/예문을 원래 분배에 돌려줍니다.
+
+- max_batch_size: 한 요청에 넣을 최대 분배 수 (1이면 묶지 않음)
+- token_budget: 한 요청의 예상 입력 + 출력 토큰 상한
+
+묶음 크기를 키우면 왕복 횟수는 줄지만 요청 하나의 응답 시간은 길어집니다.
+"""
+from prompts import format_prompt
+from token_budget import estimate_tokens, get_stage_budget
+
+# 지문/예문 1단어당 예상 출력 토큰 (영어 본문 + 한글 번역 + JSON 구조)
+OUTPUT_TOKENS_PER_WORD = 3
+
+
+def format_slot(slot, params):
+    """분배 하나의 조건을 슬롯 목록의 한 줄로 표현"""
+    return (
+        f"- 슬롯 {slot}: 지문 {params['passage_count']}개 (각 {params['passage_length']} 단어 내외), "
+        f"예문 {params['sentence_count']}개 (각 {params['sentence_length']} 단어 내외), "
+        f"핵심 문법 `{params['grammar_point']}`, 독해 유형 `{params['reading_type']}`, "
+        f"소재 `{params['topic']}`"
+    )
+
+
+def estimate_output_tokens(params):
+    """분배 하나의 예상 출력 토큰 수"""
+    words = (int(params['passage_count']) * int(params['passage_length'])
+             + int(params['sentence_count']) * int(params['sentence_length']))
+    return words * OUTPUT_TOKENS_PER_WORD
+
+
+class PassageBatch:
+    """하나의 요청으로 생성할 분배 묶음"""
+
+    def __init__(self, level, word_list):
+        self.level = level
+        self.word_list = word_list
+        self.members = []  # (원래 분배 순번, 분배, 프롬프트 매개변수)
+        self.estimated_tokens = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def indices(self):
+        return [index for index, _, _ in self.members]
+
+    def format_prompt(self):
+        """묶음 프롬프트 생성 (분배가 하나뿐이면 기존 단일 지문 프롬프트 사용)"""
+        if len(self.members) == 1:
+            return format_prompt("passage", **self.members[0][2])
+
+        slots = "\n".join(format_slot(slot, params) for slot, (_, _, params) in enumerate(self.members, 1))
+        return format_prompt(
+            "passage_batch",
+            level=self.level,
+            word_list=self.word_list,
+            slot_count=len(self.members),
+            slots=slots
+        )
+
+    def split_response(self, data):
+        """
+        묶음 응답을 분배별 지문/예문 데이터로 분리
+
+        slot 필드가 없거나 범위를 벗어난 항목은 버립니다.
+
+        Returns:
+            list: members와 같은 순서의 {"passages", "sentences"} 목록 (지문을 받지 못한 분배는 None)
+        """
+        if len(self.members) == 1:
+            return [data]
+
+        results = [{"passages": [], "sentences": []} for _ in self.members]
+        for kind in ("passages", "sentences"):
+            for item in (data or {}).get(kind, []):
+                slot = self.slot_of(item)
+                if slot is not None:
+                    results[slot][kind].append(item)
+        return [result if result["passages"] else None for result in results]
+
+    def slot_of(self, item):
+        """항목의 slot 필드를 members 순번(0부터)으로 변환하고 항목에서 제거 (잘못된 값이면 None)"""
+        slot = item.pop("slot", None)
+        try:
+            slot = int(slot) - 1
+        except (TypeError, ValueError):
+            return None
+        return slot if 0 <= slot < len(self.members) else None
+
+
+def plan_passage_batches(distributions, params_list, max_batch_size=1, token_budget=None):
+    """
+    분배들을 지문 생성 요청 묶음으로 나누기
+
+    학년 수준과 단어 목록이 같은 분배끼리만 묶으며, 원래 분배 순서를 유지하면서
+    묶음 크기와 토큰 예산을 넘기 직전까지 채웁니다. 예산보다 큰 분배 하나는 단독 묶음이 됩니다.
+
+    Args:
+        distributions: 문항 분배 목록
+        params_list: distributions와 같은 순서의 프롬프트 매개변수 목록
+        max_batch_size: 한 요청에 넣을 최대 분배 수
+        token_budget: 한 요청의 예상 입력 + 출력 토큰 상한 (기본값: get_stage_budget("passage"))
+
+    Returns:
+        list: PassageBatch 목록
+    """
+    max_batch_size = max(1, max_batch_size)
+    token_budget = token_budget or get_stage_budget("passage")
+    batches = []
+    open_batches = {}  # (학년 수준, 단어 목록) → 채우는 중인 묶음
+
+    for index, (dist, params) in enumerate(zip(distributions, params_list)):
+        key = (params['level'], params['word_list'])
+        cost = estimate_tokens(format_slot(0, params)) + estimate_output_tokens(params)
+
+        batch = open_batches.get(key)
+        if batch is None or len(batch) >= max_batch_size or batch.estimated_tokens + cost > token_budget:
+            batch = PassageBatch(params['level'], params['word_list'])
+            # 공통 지시문은 묶음당 한 번만 계산
+            batch.estimated_tokens = estimate_tokens(format_prompt("passage_batch", level=batch.level,
+                                                                   word_list=batch.word_list,
+                                                                   slot_count=0, slots=""))
+            open_batches[key] = batch
+            batches.append(batch)
+
+        batch.members.append((index, dist, params))
+        batch.estimated_tokens += cost
+
+    return batches
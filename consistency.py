@@ -0,0 +1,115 @@
+"""
+문제와 정답의 일관성을 로컬에서 검사하는 파일
+
+문제와 정답/해설을 한 번의 요청으로 생성하면(question_answer 프롬프트) 답안 생성 요청을 따로 보내지 않아도 됩니다.
+대신 응답의 정답이 실제 문제와 선택지를 가리키는지 여기서 검사하고, 어긋난 문항만 다시 요청합니다.
+"""
+import re
+
+_LABEL_RE = re.compile(r"^\s*[\(\[]?\s*([A-Za-z]|[①-⑤]|\d)\s*[\)\]\.]")
+_CIRCLED = "①②③④⑤"
+_SOURCE_RE = re.compile(r"(지문|예문)\s*(\d+)")
+
+
+def normalize_choice(value):
+    """선택지 기호 정규화 ("(B)", "B)", "b", "②", "2" → "B")"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = _LABEL_RE.match(text) or re.fullmatch(r"\s*([A-Za-z]|[①-⑤]|\d)\s*", text)
+    if not match:
+        return None
+    label = match.group(1)
+    if label in _CIRCLED:
+        return "ABCDE"[_CIRCLED.index(label)]
+    if label.isdigit():
+        return "ABCDE"[int(label) - 1] if 1 <= int(label) <= 5 else None
+    return label.upper()
+
+
+def choice_labels(question):
+    """문제 선택지의 기호 목록 (기호가 없는 선택지는 순서대로 A, B, C, ...)"""
+    labels = []
+    for i, choice in enumerate(question.get('choices') or []):
+        labels.append(normalize_choice(choice) or "ABCDEFGH"[i % 8])
+    return labels
+
+
+def split_combined_answers(questions):
+    """
+    통합 응답의 문제별 answer 필드를 answers 목록으로 분리
+
+    Returns:
+        list: {"question_id", "correct_choice", "explanation"} 답안 목록 (answer 필드가 없는 문제는 제외)
+    """
+    answers = []
+    for question in questions:
+        answer = question.pop('answer', None)
+        if isinstance(answer, dict):
+            answers.append({
+                'question_id': question.get('id'),
+                'correct_choice': answer.get('correct_choice'),
+                'explanation': answer.get('explanation'),
+            })
+    return answers
+
+
+def is_valid_answer(question, answer):
+    """정답이 문제의 선택지 중 하나이고 해설이 있는지 확인"""
+    if not answer or not answer.get('explanation'):
+        return False
+    label = normalize_choice(answer.get('correct_choice'))
+    return label is not None and label in choice_labels(question)
+
+
+def find_answer_mismatches(questions, answers):
+    """
+    문제와 답안을 대조하여 다시 요청해야 할 문제 찾기
+
+    답안이 없거나, 없는 문제 id를 가리키거나, 정답이 선택지에 없거나, 해설이 빠진 경우가 대상입니다.
+
+    Returns:
+        tuple: (문제 id → 올바른 답안 딕셔너리, 다시 요청할 문제 목록)
+    """
+    answers_by_id = {}
+    for answer in answers:
+        answers_by_id.setdefault(str(answer.get('question_id')), answer)
+
+    valid = {}
+    mismatched = []
+    for question in questions:
+        key = str(question.get('id'))
+        answer = answers_by_id.get(key)
+        if key not in valid and is_valid_answer(question, answer):
+            valid[key] = answer
+        else:
+            mismatched.append(question)
+    return valid, mismatched
+
+
+def number_map(items, combined):
+    """items의 번호(1부터) → 같은 항목의 combined 안 번호 (combined에 없는 항목은 빠짐)"""
+    positions = {id(item): number for number, item in enumerate(combined, 1)}
+    return {number: positions[id(item)] for number, item in enumerate(items, 1) if id(item) in positions}
+
+
+def renumber_source(question, passage_numbers, sentence_numbers=None):
+    """
+    문제 source의 "지문 n"/"예문 n" 번호를 바꾸기
+
+    샤드나 은행 묶음 안에서 매긴 번호를 합친 결과의 번호로 옮길 때 사용합니다 (표에 없는 번호는 그대로 둠).
+
+    Args:
+        passage_numbers: {옛 지문 번호: 새 지문 번호}
+        sentence_numbers: {옛 예문 번호: 새 예문 번호}
+    """
+    source = question.get('source')
+    if not isinstance(source, str):
+        return
+    numbers = {"지문": passage_numbers or {}, "예문": sentence_numbers or {}}
+
+    def replace(match):
+        new_number = numbers[match.group(1)].get(int(match.group(2)))
+        return match.group(0) if new_number is None else f"{match.group(1)} {new_number}"
+
+    question['source'] = _SOURCE_RE.sub(replace, source)
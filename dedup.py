@@ -0,0 +1,232 @@
+"""
+생성된 지문/예문의 유사 중복을 MinHash + LSH로 찾는 파일
+
+분배마다 같은 단어 목록과 비슷한 소재로 지문을 요청하므로 모델이 거의 같은 지문을 돌려주는 경우가 있습니다.
+지문/예문 텍스트의 단어 2-gram 집합을 MinHash 서명(NumPy)으로 요약하고, 서명을 밴드로 나눈 LSH 색인으로
+비슷한 후보만 골라 서명 일치율(자카드 유사도 추정치)을 확인합니다.
+질의 하나는 항목 수와 관계없이 1ms 안쪽이며, 밴드 키는 정렬된 NumPy 배열에 모아 두므로
+수십만 개의 지문도 메모리에 올릴 수 있습니다.
+
+- DEDUP: 1이면 한 요청 안의 유사 중복 지문/예문을 결과에서 제외 (기본값 1)
+- DEDUP_THRESHOLD: 중복으로 보는 자카드 유사도 (기본값 0.6)
+"""
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv('DEDUP', '1') == '1'
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.6))
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def shingles(text, size=2):
+    """소문자 단어 size-gram 집합 (단어가 size개보다 적으면 단어 하나씩)"""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def item_text(kind, item):
+    """지문은 제목과 본문, 예문은 영어 문장"""
+    if kind == "passages":
+        return f"{item.get('title', '')} {item.get('content', '')}"
+    return item.get('english', '')
+
+
+class MinHashLSH:
+    """MinHash 서명 + LSH 밴드 색인"""
+
+    # 밴드 키를 정렬 배열에 합치기 전까지 사전에 모아 두는 최대 항목 수
+    MERGE_EVERY = 4096
+
+    def __init__(self, threshold=None, num_perm=64, bands=16, seed=1):
+        """
+        Args:
+            threshold: 중복으로 보는 자카드 유사도 (기본값: DEDUP_THRESHOLD)
+            num_perm: 서명 길이 (bands로 나누어떨어져야 함)
+            bands: LSH 밴드 수 (밴드당 num_perm / bands개 값)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm은 bands로 나누어떨어져야 합니다.")
+        self.threshold = DEDUP_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        # 곱셈-시프트 해시 (홀수 a, 64비트 곱셈 후 상위 32비트)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._band_salt = np.arange(bands, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._count = 0
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_ids = np.zeros(0, dtype=np.uint32)
+        self._pending = {}  # 아직 정렬 배열에 합치지 않은 밴드 키 → 항목 번호 목록
+        self._pending_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def signature(self, text):
+        """텍스트의 MinHash 서명 (uint32 배열, 빈 텍스트면 None)"""
+        tokens = shingles(text)
+        if not tokens:
+            return None
+        hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens),
+                             dtype=np.uint64, count=len(tokens))
+        with np.errstate(over="ignore"):
+            values = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature):
+        """서명을 밴드별 64비트 키로 변환"""
+        with np.errstate(over="ignore"):
+            mixed = signature.reshape(self.bands, self.rows).astype(np.uint64) * self._band_mix
+            return mixed.sum(axis=1, dtype=np.uint64) ^ self._band_salt
+
+    def query(self, signature):
+        """
+        서명과 유사도가 threshold 이상인 항목 찾기
+
+        Returns:
+            list: (항목 번호, 추정 자카드 유사도) 목록 (유사도가 큰 순)
+        """
+        if signature is None or self._count == 0:
+            return []
+        keys = self.band_keys(signature)
+
+        candidates = []
+        if len(self._sorted_keys):
+            left = np.searchsorted(self._sorted_keys, keys, side="left")
+            right = np.searchsorted(self._sorted_keys, keys, side="right")
+            for start, end in zip(left, right):
+                if end > start:
+                    candidates.append(self._sorted_ids[start:end])
+        for key in keys.tolist():
+            ids = self._pending.get(key)
+            if ids:
+                candidates.append(np.asarray(ids, dtype=np.uint32))
+        if not candidates:
+            return []
+
+        ids = np.unique(np.concatenate(candidates))
+        similarity = (self._signatures[ids] == signature).mean(axis=1)
+        matched = similarity >= self.threshold
+        order = np.argsort(-similarity[matched])
+        return [(int(i), float(s)) for i, s in zip(ids[matched][order], similarity[matched][order])]
+
+    def add(self, signature):
+        """서명을 색인에 추가하고 항목 번호 반환"""
+        item_id = self._count
+        if item_id >= len(self._signatures):
+            grown = np.zeros((max(1024, len(self._signatures) * 2), self.num_perm), dtype=np.uint32)
+            grown[:item_id] = self._signatures[:item_id]
+            self._signatures = grown
+        self._signatures[item_id] = signature
+        self._count += 1
+
+        for key in self.band_keys(signature).tolist():
+            self._pending.setdefault(key, []).append(item_id)
+        self._pending_count += 1
+        if self._pending_count >= self.MERGE_EVERY:
+            self._merge_pending()
+        return item_id
+
+    def _merge_pending(self):
+        # 새 키만 정렬한 뒤 기존 정렬 배열의 제자리에 끼워 넣음 (전체를 다시 정렬하지 않음)
+        keys = np.fromiter((key for key, ids in self._pending.items() for _ in ids), dtype=np.uint64)
+        ids = np.fromiter((i for ids in self._pending.values() for i in ids), dtype=np.uint32)
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        positions = np.searchsorted(self._sorted_keys, keys, side="right")
+        self._sorted_keys = np.insert(self._sorted_keys, positions, keys)
+        self._sorted_ids = np.insert(self._sorted_ids, positions, ids)
+        self._pending = {}
+        self._pending_count = 0
+
+    def is_new(self, signature, others=()):
+        """
+        색인과 others(아직 색인에 넣지 않은 서명 목록)에 유사 중복이 없는지 확인만 함 (색인에 추가하지 않음)
+
+        저장이 끝난 뒤에 add_all로 추가해야 하는 경우(문항 은행 등)에 사용합니다.
+        """
+        if signature is None:
+            return True
+        if any((signature == other).mean() >= self.threshold for other in others):
+            return False
+        with self._lock:
+            return not self.query(signature)
+
+    def add_all(self, signatures):
+        """서명 목록을 색인에 추가 (None은 건너뜀)"""
+        with self._lock:
+            for signature in signatures:
+                if signature is not None:
+                    self.add(signature)
+
+    def add_if_new(self, text):
+        """
+        유사 중복이 없으면 색인에 추가 (확인과 추가를 한 번에 처리하여 여러 스레드에서 안전)
+
+        Returns:
+            bool: 새 항목이면 True, 유사 중복이면 False (빈 텍스트는 True)
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return True
+        with self._lock:
+            if self.query(signature):
+                return False
+            self.add(signature)
+            return True
+
+
+class DuplicateFilter:
+    """한 요청에서 생성된 지문/예문의 유사 중복 거르기 (지문과 예문은 따로 색인)"""
+
+    def __init__(self, threshold=None):
+        self.indexes = {"passages": MinHashLSH(threshold), "sentences": MinHashLSH(threshold)}
+        self.rejected = 0
+        # id(항목) → (항목, 통과 여부): 스트리밍 중 이미 확인한 항목
+        # (항목을 함께 보관하여, 버려진 항목의 id가 새 항목에 다시 쓰여 이전 판정을 물려받지 않게 함)
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def accept(self, kind, item):
+        """처음 보는 항목이면 색인에 추가하고 통과 여부 반환 (같은 항목은 다시 확인하지 않음)"""
+        key = id(item)
+        if key in self._checked:
+            return self._checked[key][1]
+        accepted = self.indexes[kind].add_if_new(item_text(kind, item))
+        with self._lock:
+            self._checked[key] = (item, accepted)
+            if not accepted:
+                self.rejected += 1
+        return accepted
+
+    def seed(self, passage_data):
+        """이미 확정된 지문/예문(체크포인트 등)을 색인에 추가"""
+        self.filter(passage_data)
+
+    def filter(self, passage_data):
+        """
+        지문/예문 데이터에서 유사 중복 항목 제외
+
+        Returns:
+            dict: 중복을 뺀 지문/예문 데이터 (지문이 하나도 남지 않으면 None)
+        """
+        if not passage_data:
+            return passage_data
+        filtered = dict(passage_data)
+        for kind in ("passages", "sentences"):
+            filtered[kind] = [item for item in passage_data.get(kind, []) if self.accept(kind, item)]
+        return filtered if filtered["passages"] else None
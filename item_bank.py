@@ -0,0 +1,317 @@
+"""
+미리 생성해 둔 지문/문제를 분배 조각별로 꺼내 쓰는 문항 은행 파일
+
+대부분의 시험은 같은 (학년, 세부 카테고리, 상/중/하) 조각을 반복해서 요청하므로,
+검증을 통과한 지문/예문/문제/답안을 분배 조각(QuestionDistribution의 카테고리, 세부 카테고리, 난이도)과
+학년, 문제 유형으로 색인하여 저장하고, 다음 요청에서는 은행에서 먼저 채운 뒤 모자란 문항만 LLM으로 생성합니다.
+은행에서는 지금까지 적게 낸 문제부터 고르고(같으면 무작위), user_id를 주면 그 사용자에게 이미 낸 문제는
+다시 고르지 않습니다.
+
+요청이 들어올 때마다 분배 조각별 수요(요청 문항 수)를 반감기(ITEM_BANK_DEMAND_HALF_LIFE 시간)로 감쇠하며 누적하고,
+pool_warmer.py가 이 수요를 보고 인기 조각의 재고를 미리 채웁니다.
+DEDUP이 켜져 있으면 은행에 이미 있는 지문과 유사 중복인 지문 묶음은 저장하지 않습니다.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, func
+from sqlalchemy.exc import IntegrityError
+
+from consistency import is_valid_answer, number_map, renumber_source
+from dedup import DEDUP_ENABLED, MinHashLSH, item_text
+from models import ItemBankDemand, ItemBankQuestion, ItemBankSet, ItemBankUsage, QuestionDistribution
+
+# 수요가 절반으로 줄어드는 시간 (시간 단위)
+DEMAND_HALF_LIFE_HOURS = float(os.getenv('ITEM_BANK_DEMAND_HALF_LIFE', 72))
+
+# 이 기간(일) 안에 조각의 문제를 받은 사용자를 활동 중인 사용자로 보고 재고를 계산
+ACTIVE_USER_DAYS = float(os.getenv('ITEM_BANK_ACTIVE_DAYS', 14))
+
+def decay_demand(demand, since, now, half_life_hours=None):
+    """since 시각에 기록된 수요를 now 시각 기준으로 감쇠"""
+    half_life_hours = half_life_hours or DEMAND_HALF_LIFE_HOURS
+    elapsed_hours = max(0.0, (now - since).total_seconds() / 3600) if since else 0.0
+    return demand * 0.5 ** (elapsed_hours / half_life_hours)
+
+
+# DB별 은행 지문 유사 중복 색인 (DatabaseManager.cache_key → MinHashLSH)
+_passage_indexes = {}
+_passage_index_lock = threading.Lock()
+
+
+def get_bank_passage_index(db_manager):
+    """DB별 은행 지문 유사 중복 색인 (DB마다 처음 호출 시 item_bank_sets에서 한 번 로드)"""
+    index = _passage_indexes.get(db_manager.cache_key)
+    if index is not None:
+        return index
+
+    with _passage_index_lock:
+        index = _passage_indexes.get(db_manager.cache_key)
+        if index is None:
+            index = MinHashLSH()
+            with db_manager.session_scope() as session:
+                for (passages,) in session.query(ItemBankSet.passages).yield_per(1000):
+                    for passage in json.loads(passages):
+                        signature = index.signature(item_text("passages", passage))
+                        if signature is not None:
+                            index.add(signature)
+            _passage_indexes[db_manager.cache_key] = index
+    return index
+
+
+def _strip_distribution_info(items):
+    return [{key: value for key, value in item.items() if key != 'distribution_info'} for item in items]
+
+
+def attribute_questions(results, capacities):
+    """
+    생성된 문제를 분배 조각에 배정
+
+    분배 하나의 지문/예문만으로 만든 문제에는 distribution_info가 표시되어 있으므로(main.generate_content_with_llm의
+    per_distribution 참고) 그 분배에만 배정합니다. 표시가 없는 문제는 어느 지문으로 만들었는지 확실하지 않아
+    다른 지문과 함께 잘못 출제될 수 있으므로 배정하지 않습니다. 분배마다 요청한 문항 수만큼만 배정합니다.
+
+    Args:
+        results: {'passages', 'sentences', 'questions', 'answers'} 생성 결과
+        capacities: distribution_info → 요청한 문항 수 (분배 순서대로)
+
+    Returns:
+        dict: distribution_info → (문제, 답안) 목록
+    """
+    answers = {str(answer.get('question_id')): answer for answer in results.get('answers', [])}
+    remaining = dict(capacities)
+    attributed = {info: [] for info in capacities}
+
+    for question in results.get('questions', []):
+        info = question.get('distribution_info')
+        answer = answers.get(str(question.get('id')))
+        if remaining.get(info, 0) <= 0 or not is_valid_answer(question, answer):
+            continue
+        attributed[info].append((question, answer))
+        remaining[info] -= 1
+    return attributed
+
+
+class ItemBank:
+    """분배 조각별 문항 은행"""
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def slice_filter(model, request, dist):
+        """분배 조각 조건 (학년, 카테고리, 세부 카테고리, 난이도)"""
+        return and_(model.grade == request.grade, model.category == dist.category,
+                    model.subcategory == dist.subcategory, model.difficulty_level == dist.difficulty_level)
+
+    def fill(self, request, distributions, user_id=None):
+        """
+        분배별 문항을 은행에서 먼저 채우기
+
+        Returns:
+            tuple: (은행에서 채운 분배별 {'dist', 'passages', 'sentences', 'questions', 'answers'} 목록,
+                    모자란 문항 수만큼만 count를 줄인 분배 목록)
+        """
+        served = []
+        deficits = []
+        with self.db_manager.session_scope() as session:
+            for dist in distributions:
+                query = session.query(ItemBankQuestion).filter(
+                    self.slice_filter(ItemBankQuestion, request, dist),
+                    ItemBankQuestion.question_type == request.question_type
+                )
+                if user_id is not None:
+                    query = query.filter(~exists().where(and_(
+                        ItemBankUsage.user_id == user_id, ItemBankUsage.question_id == ItemBankQuestion.id
+                    )))
+                # 모든 요청이 같은 앞쪽 문제를 받지 않도록 적게 낸 문제부터, 같으면 무작위로 고름
+                rows = query.order_by(func.coalesce(ItemBankQuestion.served_count, 0),
+                                      func.random()).limit(dist.count).all()
+
+                if rows:
+                    set_ids = sorted({row.set_id for row in rows})
+                    sets = session.query(ItemBankSet).filter(ItemBankSet.id.in_(set_ids)).order_by(ItemBankSet.id).all()
+                    questions = [json.loads(row.question) for row in rows]
+                    answers = [json.loads(row.answer) for row in rows]
+                    # 서로 다른 묶음의 문제 id가 겹치지 않도록 1부터 다시 매김
+                    for number, (question, answer) in enumerate(zip(questions, answers), 1):
+                        question['id'] = number
+                        answer['question_id'] = number
+                    # 문제 source는 자기 묶음 안의 지문/예문 번호이므로 이어 붙인 목록의 번호로 바꿈
+                    passages, sentences, numbers = [], [], {}
+                    for bank_set in sets:
+                        set_passages = json.loads(bank_set.passages)
+                        set_sentences = json.loads(bank_set.sentences)
+                        numbers[bank_set.id] = ({n: len(passages) + n for n in range(1, len(set_passages) + 1)},
+                                                {n: len(sentences) + n for n in range(1, len(set_sentences) + 1)})
+                        passages.extend(set_passages)
+                        sentences.extend(set_sentences)
+                    for row, question in zip(rows, questions):
+                        renumber_source(question, *numbers[row.set_id])
+                    served.append({
+                        'dist': dist,
+                        'question_ids': [row.id for row in rows],
+                        'passages': passages,
+                        'sentences': sentences,
+                        'questions': questions,
+                        'answers': answers,
+                    })
+
+                if len(rows) < dist.count:
+                    deficits.append(QuestionDistribution(dist.category, dist.subcategory,
+                                                         dist.count - len(rows), dist.difficulty_level))
+
+            served_ids = [qid for item in served for qid in item['question_ids']]
+            if served_ids:
+                session.query(ItemBankQuestion).filter(ItemBankQuestion.id.in_(served_ids)).update({
+                    ItemBankQuestion.served_count: func.coalesce(ItemBankQuestion.served_count, 0) + 1,
+                    ItemBankQuestion.last_served_at: datetime.utcnow(),
+                }, synchronize_session=False)
+            if user_id is not None:
+                self.record_usage(session, user_id, served_ids)
+        return served, deficits
+
+    def deposit(self, request, distributions, results, distribution_info_of, user_id=None):
+        """
+        LLM으로 생성한 결과를 분배 조각별로 은행에 저장
+
+        답안 검증을 통과하고 분배가 표시된 문제만 저장하며(attribute_questions 참고), 문제가 배정되지 않은 분배나
+        은행 지문과 유사 중복인 분배의 지문 묶음은 저장하지 않습니다.
+
+        Args:
+            distribution_info_of: 분배 → distribution_info 함수
+            user_id: 지정하면 저장한 문제를 그 사용자가 이미 받은 문제로 기록
+
+        Returns:
+            int: 저장한 문제 수
+        """
+        infos = {distribution_info_of(dist): dist for dist in distributions}
+        attributed = attribute_questions(results, {info: dist.count for info, dist in infos.items()})
+        passage_index = get_bank_passage_index(self.db_manager) if DEDUP_ENABLED else None
+        stored = 0
+        # 저장할 묶음의 지문 서명 (커밋이 성공한 뒤에만 색인에 추가하여, 저장되지 않은 지문이 이후 묶음을 막지 않게 함)
+        accepted_signatures = []
+        with self.db_manager.session_scope() as session:
+            question_ids = []
+            for info, dist in infos.items():
+                pairs = attributed.get(info)
+                if not pairs:
+                    continue
+                passages = [p for p in results.get('passages', []) if p.get('distribution_info') == info]
+                if passage_index is not None:
+                    signatures = [passage_index.signature(item_text("passages", p)) for p in passages]
+                    if not all(passage_index.is_new(signature, accepted_signatures) for signature in signatures):
+                        print(f"♻️ 문항 은행에 비슷한 지문이 있어 {info} 묶음을 저장하지 않습니다.")
+                        continue
+                    accepted_signatures.extend(signature for signature in signatures if signature is not None)
+                sentences = [s for s in results.get('sentences', []) if s.get('distribution_info') == info]
+                bank_set = ItemBankSet(
+                    grade=request.grade, category=dist.category, subcategory=dist.subcategory,
+                    difficulty_level=dist.difficulty_level,
+                    passages=json.dumps(_strip_distribution_info(passages), ensure_ascii=False),
+                    sentences=json.dumps(_strip_distribution_info(sentences), ensure_ascii=False),
+                )
+                session.add(bank_set)
+                session.flush()
+
+                # 문제 source를 결과 전체 기준 번호에서 이 묶음 안의 번호로 바꿔 저장
+                passage_numbers = number_map(results.get('passages', []), passages)
+                sentence_numbers = number_map(results.get('sentences', []), sentences)
+                for question, answer in pairs:
+                    question = _strip_distribution_info([question])[0]
+                    renumber_source(question, passage_numbers, sentence_numbers)
+                    row = ItemBankQuestion(
+                        set_id=bank_set.id, grade=request.grade, category=dist.category,
+                        subcategory=dist.subcategory, difficulty_level=dist.difficulty_level,
+                        question_type=request.question_type,
+                        question=json.dumps(question, ensure_ascii=False),
+                        answer=json.dumps(answer, ensure_ascii=False),
+                    )
+                    session.add(row)
+                    session.flush()
+                    question_ids.append(row.id)
+                stored += len(pairs)
+
+            unattributed = len(results.get('questions', [])) - sum(len(pairs) for pairs in attributed.values())
+            if unattributed:
+                print(f"🏦 어느 분배에서 나왔는지 확실하지 않거나 검증을 통과하지 못한 {unattributed}문항은 은행에 저장하지 않습니다.")
+
+            if user_id is not None:
+                self.record_usage(session, user_id, question_ids)
+
+        if passage_index is not None:
+            passage_index.add_all(accepted_signatures)
+        return stored
+
+    @staticmethod
+    def record_usage(session, user_id, question_ids):
+        """사용자에게 낸 문제 기록"""
+        for question_id in question_ids:
+            session.add(ItemBankUsage(user_id=user_id, question_id=question_id))
+
+    def record_demand(self, request, distributions, now=None):
+        """
+        요청의 분배 조각별 문항 수를 수요로 누적 (기존 수요는 감쇠 후 더함)
+
+        같은 조각이 처음 동시에 기록되어 충돌하면 한 번 다시 시도합니다.
+        """
+        now = now or datetime.utcnow()
+        for attempt in range(2):
+            try:
+                with self.db_manager.session_scope() as session:
+                    for dist in distributions:
+                        row = session.query(ItemBankDemand).filter(
+                            self.slice_filter(ItemBankDemand, request, dist),
+                            ItemBankDemand.question_type == request.question_type
+                        ).first()
+                        if row is None:
+                            row = ItemBankDemand(grade=request.grade, category=dist.category,
+                                                 subcategory=dist.subcategory,
+                                                 difficulty_level=dist.difficulty_level,
+                                                 question_type=request.question_type, demand=0.0)
+                            session.add(row)
+                        row.demand = decay_demand(row.demand or 0.0, row.updated_at, now) + dist.count
+                        row.updated_at = now
+                return
+            except IntegrityError:
+                if attempt:
+                    raise
+
+    def hot_slices(self, limit, now=None):
+        """
+        현재 수요가 가장 큰 분배 조각 목록
+
+        Returns:
+            list: (ItemBankDemand, 감쇠된 수요) 목록 (수요가 큰 순)
+        """
+        now = now or datetime.utcnow()
+        with self.db_manager.session_scope() as session:
+            rows = session.query(ItemBankDemand).all()
+        ranked = sorted(((row, decay_demand(row.demand, row.updated_at, now)) for row in rows),
+                        key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def stock(self, grade, category, subcategory, difficulty_level, question_type, now=None):
+        """
+        분배 조각에서 활동 중인 사용자가 아직 받지 않은 은행 문제 수
+
+        사용자에게 이미 낸 문제는 그 사용자에게 다시 내지 않으므로, 최근 ACTIVE_USER_DAYS일 안에 이 조각의 문제를
+        받은 사용자 중 가장 많이 받은 사용자 기준으로 남은 문제 수를 셉니다 (활동 중인 사용자가 없으면 전체 문제 수).
+        """
+        now = now or datetime.utcnow()
+        slice_filter = and_(
+            ItemBankQuestion.grade == grade, ItemBankQuestion.category == category,
+            ItemBankQuestion.subcategory == subcategory,
+            ItemBankQuestion.difficulty_level == difficulty_level,
+            ItemBankQuestion.question_type == question_type
+        )
+        with self.db_manager.session_scope() as session:
+            total = session.query(func.count(ItemBankQuestion.id)).filter(slice_filter).scalar()
+            seen = session.query(func.count(ItemBankUsage.id)).join(
+                ItemBankQuestion, ItemBankQuestion.id == ItemBankUsage.question_id
+            ).filter(slice_filter).group_by(ItemBankUsage.user_id).having(
+                func.max(ItemBankUsage.created_at) >= now - timedelta(days=ACTIVE_USER_DAYS)
+            ).order_by(func.count(ItemBankUsage.id).desc()).limit(1).scalar()
+            return total - (seen or 0)
@@ -0,0 +1,392 @@
+"""
+체크포인트를 남기며 콘텐츠를 생성하고, 중단된 작업을 이어서 실행하는 파일
+
+process_user_request_new는 모든 결과를 메모리의 all_results에만 모으므로, 분배 10개 중 9개를 만든 뒤
+프로세스가 죽으면 이미 비용을 낸 LLM 호출 9번이 모두 버려집니다.
+작업(generation_jobs)과 단계(generation_stages) 테이블에 단계가 끝날 때마다 파싱된 결과를 저장하고,
+다시 실행하면 완료된 단계는 저장된 결과를 읽어 LLM을 호출하지 않습니다.
+
+생성은 process_user_request_new가 그대로 실행하며(문항 은행, 파이프라인 모드, 진행 상황 전달 포함),
+작업은 체크포인트 객체(JobCheckpoint)만 넘겨 단계 결과를 저장하고 읽습니다. API 서버(server.py)도 요청마다
+작업을 만들어 같은 경로로 실행합니다.
+
+단계 이름:
+    demand            문항 은행 수요 기록 여부 (이어서 실행할 때 수요를 다시 더하지 않음)
+    db_info           단어 목록 등 조회 결과 (다시 실행해도 같은 프롬프트가 되도록 고정)
+    bank              문항 은행에서 고른 문항과 부족분
+    passage:{b}       b번째 지문 요청 묶음의 지문/예문
+    questions:{s}     s번째 문제 샤드의 문제 (통합 모드에서는 함께 받은 답안 포함, 파이프라인 모드는 {n}.{k})
+    answers:{s}       s번째 문제 샤드의 검증된 문제/답안
+    bank_deposit      생성된 문항의 은행 저장 여부
+
+단계 결과는 단계 입력의 요약(key)과 함께 저장되며, key가 다르면(예: 지문이 빠져 샤드 구성이 바뀜) 다시 생성합니다.
+
+같은 작업을 두 프로세스가 동시에 이어서 실행하지 않도록 작업 행에 임대(lease_owner, lease_expires_at)를 겁니다.
+실행하는 동안 JOB_LEASE_SECONDS/3마다 임대를 연장하고, 프로세스가 죽어 임대가 만료되면 다른 프로세스가 이어받습니다.
+임대를 잃은 프로세스는 단계 결과를 저장하지 못하며, 새 단계의 LLM 호출을 시작하지 않고 JobLeaseError로 멈춥니다.
+
+- JOB_LEASE_SECONDS: 작업 임대 시간(초, 기본값 120)
+
+사용법:
+    python jobs.py run request.json     # 작업 생성 후 실행
+    python jobs.py resume 3             # 3번 작업 이어서 실행
+    python jobs.py list                 # 끝나지 않은 작업 목록
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from main import calculate_question_distribution, process_user_request_new, setup_database
+from models import ContentGenerationRequest, GenerationJob, GenerationStage, JobLeaseError
+
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 120))
+
+
+def request_to_dict(request):
+    """ContentGenerationRequest를 작업 테이블에 저장할 딕셔너리로 변환"""
+    if isinstance(request, dict):
+        return request
+    distribution = request.difficulty_distribution
+    return {
+        "grade": request.grade,
+        "categories": [{"name": cat.name, "subcategories": list(cat.subcategories), "ratio": cat.ratio}
+                       for cat in request.categories],
+        "question_type": request.question_type,
+        "difficulty": request.difficulty,
+        "total_questions": request.total_questions,
+        "difficulty_distribution": {"high": distribution.high, "medium": distribution.medium,
+                                    "low": distribution.low},
+    }
+
+
+class JobStore:
+    """생성 작업과 단계별 체크포인트 저장소"""
+
+    def __init__(self, db_manager, lease_seconds=None):
+        self.db_manager = db_manager
+        self.lease_seconds = lease_seconds or JOB_LEASE_SECONDS
+
+    def create_job(self, request, user_id=None):
+        """생성 요청을 pending 작업으로 저장하고 작업 id 반환"""
+        with self.db_manager.session_scope() as session:
+            job = GenerationJob(status='pending', payload=json.dumps(request_to_dict(request), ensure_ascii=False),
+                                user_id=user_id)
+            session.add(job)
+            session.flush()
+            return job.id
+
+    def get_job(self, job_id):
+        with self.db_manager.session_scope() as session:
+            return session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+
+    def list_jobs(self, unfinished_only=True):
+        """작업 목록 (기본값: 완료되지 않은 작업만)"""
+        with self.db_manager.session_scope() as session:
+            query = session.query(GenerationJob)
+            if unfinished_only:
+                query = query.filter(GenerationJob.status != 'completed')
+            return query.order_by(GenerationJob.id).all()
+
+    def claim(self, job_id, owner):
+        """
+        임대가 없거나 만료된 작업을 owner가 실행하도록 임대하고 running으로 변경
+
+        조건부 UPDATE 한 번으로 처리하므로 두 프로세스가 동시에 요청해도 한쪽만 성공합니다.
+
+        Returns:
+            int: 실행 횟수 (완료된 작업이거나 다른 프로세스가 임대 중이면 None)
+        """
+        now = datetime.utcnow()
+        with self.db_manager.session_scope() as session:
+            claimed = session.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                GenerationJob.status != 'completed',
+                or_(GenerationJob.lease_owner.is_(None), GenerationJob.lease_owner == owner,
+                    GenerationJob.lease_expires_at < now)
+            ).update({
+                GenerationJob.lease_owner: owner,
+                GenerationJob.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+                GenerationJob.status: 'running',
+                GenerationJob.attempts: GenerationJob.attempts + 1,
+                GenerationJob.updated_at: now,
+            }, synchronize_session=False)
+            if not claimed:
+                return None
+            return session.query(GenerationJob.attempts).filter(GenerationJob.id == job_id).scalar()
+
+    def renew(self, job_id, owner):
+        """owner가 아직 임대 중이면 임대를 연장하고 True 반환"""
+        with self.db_manager.session_scope() as session:
+            return self._renew(session, job_id, owner)
+
+    def _renew(self, session, job_id, owner):
+        now = datetime.utcnow()
+        renewed = session.query(GenerationJob).filter(
+            GenerationJob.id == job_id, GenerationJob.lease_owner == owner
+        ).update({GenerationJob.lease_expires_at: now + timedelta(seconds=self.lease_seconds)},
+                 synchronize_session=False)
+        return renewed > 0
+
+    def finish_job(self, job_id, status, result=None, owner=None):
+        """
+        작업 상태와 최종 결과를 저장하고 임대 해제
+
+        owner를 지정하면 그 프로세스가 아직 임대 중일 때만 저장합니다 (임대를 잃었으면 False 반환).
+        """
+        with self.db_manager.session_scope() as session:
+            query = session.query(GenerationJob).filter(GenerationJob.id == job_id)
+            if owner is not None:
+                query = query.filter(GenerationJob.lease_owner == owner)
+            job = query.first()
+            if job is None:
+                return False
+            job.status = status
+            job.lease_owner = None
+            job.lease_expires_at = None
+            if result is not None:
+                job.result = json.dumps(result, ensure_ascii=False)
+            return True
+
+    def load_stages(self, job_id):
+        """완료된 단계 이름 → 저장된 결과"""
+        with self.db_manager.session_scope() as session:
+            stages = session.query(GenerationStage).filter(
+                GenerationStage.job_id == job_id, GenerationStage.status == 'completed'
+            ).all()
+            return {stage.stage: json.loads(stage.payload) for stage in stages}
+
+    def save_stage(self, job_id, stage, payload, owner=None):
+        """
+        단계 결과를 completed로 저장 (실패 기록이 있으면 덮어씀)
+
+        owner를 지정하면 같은 트랜잭션에서 임대를 확인하고 연장하며, 임대를 잃었으면 JobLeaseError를 발생시킵니다.
+        """
+        self._record(job_id, stage, 'completed', json.dumps(payload, ensure_ascii=False), owner)
+
+    def fail_stage(self, job_id, stage, owner=None):
+        """단계 실패 기록 (다음 실행에서 다시 시도)"""
+        self._record(job_id, stage, 'failed', None, owner)
+
+    def _record(self, job_id, stage, status, payload, owner=None):
+        with self.db_manager.session_scope() as session:
+            if owner is not None and not self._renew(session, job_id, owner):
+                raise JobLeaseError(f"{job_id}번 작업의 임대를 잃어 {stage} 단계를 저장하지 않았습니다.")
+            row = session.query(GenerationStage).filter(
+                GenerationStage.job_id == job_id, GenerationStage.stage == stage
+            ).first()
+            if row is None:
+                row = GenerationStage(job_id=job_id, stage=stage, attempts=0)
+                session.add(row)
+            row.status = status
+            row.payload = payload
+            row.attempts += 1
+            row.updated_at = datetime.utcnow()
+
+
+class JobCheckpoint:
+    """
+    process_user_request_new에 넘기는 작업 체크포인트
+
+    단계 결과는 {'key': 단계 입력 요약, 'value': 결과}로 저장하며, load는 key가 같을 때만 결과를 돌려줍니다.
+    이번 실행에서 실패한 단계 이름은 failed에 모읍니다.
+    임대를 잃으면(LeaseHeartbeat가 알리거나 저장이 거부됨) lost가 설정되고, check는 JobLeaseError를 발생시킵니다.
+    """
+
+    def __init__(self, store, job_id, owner):
+        self.store = store
+        self.job_id = job_id
+        self.owner = owner
+        self.failed = set()
+        self.lost = threading.Event()
+        self._stages = store.load_stages(job_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stages)
+
+    def load(self, stage, key=None):
+        saved = self._stages.get(stage)
+        if isinstance(saved, dict) and 'value' in saved and saved.get('key') == key:
+            return saved['value']
+        return None
+
+    def check(self):
+        """임대를 잃었으면 JobLeaseError 발생 (단계를 새로 생성하기 전에 호출)"""
+        if self.lost.is_set():
+            raise JobLeaseError(f"{self.job_id}번 작업의 임대를 잃어 남은 단계를 실행하지 않습니다.")
+
+    def save(self, stage, value, key=None):
+        # JSON으로 한 번 오간 key와 비교하도록 저장한 형태 그대로 보관
+        payload = json.loads(json.dumps({'key': key, 'value': value}, ensure_ascii=False))
+        try:
+            self.store.save_stage(self.job_id, stage, payload, self.owner)
+        except JobLeaseError:
+            self.lost.set()
+            raise
+        with self._lock:
+            self._stages[stage] = payload
+            self.failed.discard(stage)
+
+    def fail(self, stage):
+        with self._lock:
+            self.failed.add(stage)
+        try:
+            self.store.fail_stage(self.job_id, stage, self.owner)
+        except JobLeaseError:
+            self.lost.set()
+            raise
+
+
+class LeaseHeartbeat:
+    """작업을 실행하는 동안 임대 시간의 1/3마다 임대를 연장하는 스레드 (임대를 잃으면 lost 설정)"""
+
+    def __init__(self, store, job_id, owner, lost=None):
+        """
+        Args:
+            lost: 임대를 잃었을 때 설정할 threading.Event (JobCheckpoint.lost를 넘기면 남은 단계가 멈춤)
+        """
+        self.store = store
+        self.job_id = job_id
+        self.owner = owner
+        self.lost = lost or threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"job-{job_id}-lease", daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.store.lease_seconds / 3):
+            try:
+                renewed = self.store.renew(self.job_id, self.owner)
+            except Exception as e:
+                # 일시적인 DB 오류는 다음 주기에 다시 시도 (그 사이 만료되면 단계 저장에서 확인됨)
+                print(f"⚠️ {self.job_id}번 작업 임대 연장 실패: {e}")
+                continue
+            if not renewed:
+                print(f"⚠️ {self.job_id}번 작업의 임대를 다른 프로세스가 가져갔습니다.")
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_lease_owner():
+    """임대 소유자 이름 (호스트:프로세스:실행마다 다른 값)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def run_job(db_manager, job_id, on_item=None):
+    """
+    작업을 실행하거나 마지막으로 완료된 단계부터 이어서 실행
+
+    작업 행을 임대한 뒤 process_user_request_new에 체크포인트를 넘겨 실행하므로, 완료된 단계는 저장된 결과를
+    사용하고 빠진 단계만 생성합니다. 실패한 단계가 있거나 문제가 없으면 failed로 끝내며, 다시 실행하면
+    실패한 단계부터 이어서 생성합니다.
+
+    Args:
+        on_item: process_user_request_new 참고 (체크포인트에서 불러온 지문/예문도 전달)
+
+    Returns:
+        dict: 생성된 콘텐츠 (지문, 예문, 문제, 답안) - 작업이 없으면 None
+
+    Raises:
+        JobLeaseError: 다른 프로세스가 작업을 실행 중인 경우
+    """
+    store = JobStore(db_manager)
+    job = store.get_job(job_id)
+    if job is None:
+        print(f"❌ {job_id}번 작업이 없습니다.")
+        return None
+
+    def completed_result(job):
+        print(f"✅ {job_id}번 작업은 이미 완료되었습니다.")
+        results = json.loads(job.result)
+        results['distributions'] = calculate_question_distribution(ContentGenerationRequest(**json.loads(job.payload)))
+        return results
+
+    if job.status == 'completed' and job.result:
+        return completed_result(job)
+
+    owner = make_lease_owner()
+    attempt = store.claim(job_id, owner)
+    if attempt is None:
+        job = store.get_job(job_id)
+        if job.status == 'completed' and job.result:
+            return completed_result(job)
+        raise JobLeaseError(f"{job_id}번 작업은 다른 프로세스({job.lease_owner})가 실행 중입니다. "
+                            f"(임대 만료: {job.lease_expires_at:%Y-%m-%d %H:%M:%S} UTC)")
+
+    checkpoint = JobCheckpoint(store, job_id, owner)
+    print(f"========== {job_id}번 작업 실행 ({attempt}번째, 완료된 단계 {len(checkpoint)}개) ==========")
+    try:
+        with LeaseHeartbeat(store, job_id, owner, checkpoint.lost):
+            results = process_user_request_new(db_manager, ContentGenerationRequest(**json.loads(job.payload)),
+                                               on_item=on_item, user_id=job.user_id, checkpoint=checkpoint)
+    except Exception:
+        store.finish_job(job_id, 'failed', owner=owner)
+        raise
+
+    if checkpoint.failed or not results.get('questions'):
+        failed = ', '.join(sorted(checkpoint.failed)) or '문제 없음'
+        print(f"⚠️ {job_id}번 작업 실패 ({failed}) - python jobs.py resume {job_id} 로 이어서 실행")
+        store.finish_job(job_id, 'failed', owner=owner)
+        return results
+
+    result = {key: value for key, value in results.items() if key != 'distributions'}
+    if not store.finish_job(job_id, 'completed', result, owner=owner):
+        raise JobLeaseError(f"{job_id}번 작업의 임대를 잃어 결과를 저장하지 않았습니다.")
+    print(f"✅ {job_id}번 작업 완료 (문제 {len(results['questions'])}개)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="체크포인트를 남기는 콘텐츠 생성 작업")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="요청 JSON 파일로 작업을 만들어 실행")
+    run_parser.add_argument("request_file", help="ContentGenerationRequest 형식의 JSON 파일")
+    resume_parser = subparsers.add_parser("resume", help="작업을 이어서 실행")
+    resume_parser.add_argument("job_id", type=int)
+    list_parser = subparsers.add_parser("list", help="작업 목록")
+    list_parser.add_argument("--all", action="store_true", help="완료된 작업도 표시")
+    args = parser.parse_args()
+
+    db_manager = setup_database()
+    if not db_manager:
+        print("❌ 데이터베이스 연결 실패로 작업을 종료합니다.")
+        return 1
+
+    store = JobStore(db_manager)
+    if args.command == "list":
+        for job in store.list_jobs(unfinished_only=not args.all):
+            lease = f"  실행 중: {job.lease_owner}" if job.lease_owner else ""
+            print(f"{job.id:>5}  {job.status:<10} 실행 {job.attempts}회  {job.updated_at:%Y-%m-%d %H:%M:%S}{lease}")
+        return 0
+
+    if args.command == "run":
+        with open(args.request_file, encoding="utf-8") as f:
+            job_id = store.create_job(json.load(f))
+        print(f"🆕 {job_id}번 작업을 만들었습니다.")
+    else:
+        job_id = args.job_id
+
+    try:
+        run_job(db_manager, job_id)
+    except JobLeaseError as e:
+        print(f"❌ {e}")
+        return 1
+    job = store.get_job(job_id)
+    return 0 if job is not None and job.status == 'completed' else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
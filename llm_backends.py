@@ -0,0 +1,469 @@
+"""
+LLM 백엔드를 정의하는 파일
+
+generate_response는 LLMBackend 인터페이스만 사용하므로, 실제 제미나이 API 대신
+로컬 가짜 백엔드(FakeBackend)로 바꿔 끼워 API 없이 전체 파이프라인을 실행하고
+처리량을 측정할 수 있습니다.
+"""
+import collections
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from models import GeminiModel
+
+
+class LLMBackendError(Exception):
+    """백엔드 호출 실패"""
+    pass
+
+
+class LLMBackend:
+    """LLM 백엔드 기본 클래스"""
+    model_name = None
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def generation_settings(self):
+        """응답에 영향을 주는 생성 설정 (캐시 키에 포함)"""
+        return {}
+
+    def generate(self, prompt, prompt_type=None):
+        """
+        프롬프트로 응답 텍스트 생성
+
+        Args:
+            prompt: 완성된 프롬프트
+            prompt_type: 프롬프트 유형 ("passage", "question", "answer")
+
+        Returns:
+            str: 응답 텍스트 (실패 시 예외 발생)
+        """
+        start = time.perf_counter()
+        try:
+            return self._generate(prompt, prompt_type)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.calls += 1
+                self.total_latency += time.perf_counter() - start
+
+    def _generate(self, prompt, prompt_type):
+        raise NotImplementedError
+
+    def generate_stream(self, prompt, prompt_type=None):
+        """
+        프롬프트로 응답 텍스트를 조각 단위로 생성
+
+        스트리밍을 지원하지 않는 백엔드는 전체 응답을 한 조각으로 반환합니다.
+
+        Yields:
+            str: 응답 텍스트 조각
+        """
+        start = time.perf_counter()
+        try:
+            yield from self._generate_stream(prompt, prompt_type)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.calls += 1
+                self.total_latency += time.perf_counter() - start
+
+    def _generate_stream(self, prompt, prompt_type):
+        yield self._generate(prompt, prompt_type)
+
+    def stats(self):
+        """호출 통계 반환"""
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+            }
+
+
+def _sdk_supports_json_mode():
+    """설치된 google-generativeai가 response_mime_type(JSON 모드)을 지원하는지 확인"""
+    try:
+        import inspect
+        from google.generativeai.types import GenerationConfig
+    except ImportError:
+        return False
+    return "response_mime_type" in inspect.signature(GenerationConfig).parameters
+
+
+class GeminiBackend(LLMBackend):
+    """제미나이 API 백엔드"""
+
+    def __init__(self, api_key=None, model_name="gemini-2.5-pro", generation_config=None, json_mode=False,
+                 context_cache_ttl=0):
+        """
+        Args:
+            json_mode: True이면 SDK가 지원하는 경우 응답 MIME 타입을 application/json으로 요청
+            context_cache_ttl: 0보다 크면 프롬프트의 고정 앞부분(static_prefix)을 이 시간(초) 동안
+                제공자 컨텍스트 캐시에 올리고 나머지(payload)만 전송
+        """
+        super().__init__()
+        self.model_name = model_name
+        generation_config = dict(generation_config or {})
+        if json_mode and _sdk_supports_json_mode():
+            generation_config["response_mime_type"] = "application/json"
+        self.gemini = GeminiModel(api_key or os.getenv('GEMINI_API_KEY'), model_name, generation_config)
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_hits = 0
+        self._cached_models = {}  # 앞부분 해시 → (캐시 모델 또는 None(생성 실패), 만료 시각)
+        self._cache_lock = threading.Lock()
+
+    @property
+    def generation_settings(self):
+        return dict(self.gemini.generation_config)
+
+    def _cached_model(self, prompt):
+        """
+        프롬프트의 고정 앞부분을 담은 컨텍스트 캐시 모델 (사용할 수 없으면 None)
+
+        캐시는 만료 전에 새로 만들고, 생성에 실패한 앞부분은 TTL 동안 다시 시도하지 않고 전체 프롬프트를 보냅니다.
+        """
+        prefix = getattr(prompt, "static_prefix", None)
+        if self.context_cache_ttl <= 0 or not prefix:
+            return None
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            model, expires_at = self._cached_models.get(key, (None, 0.0))
+            if time.monotonic() >= expires_at:
+                try:
+                    model = self.gemini.create_cached_model(prefix, self.context_cache_ttl)
+                except Exception as e:
+                    print(f"⚠️ 컨텍스트 캐시를 만들지 못해 전체 프롬프트를 보냅니다 ({self.model_name}): {e}")
+                    model = None
+                # 제공자 쪽 만료와 겹치지 않도록 TTL의 90%만 사용
+                self._cached_models[key] = (model, time.monotonic() + self.context_cache_ttl * 0.9)
+            if model is not None:
+                self.context_cache_hits += 1
+            return model
+
+    def _generate(self, prompt, prompt_type):
+        model = self._cached_model(prompt)
+        if model is not None:
+            return model.generate_content(prompt.payload).text
+        response = self.gemini.generate_content(prompt)
+        return response.text
+
+    def _generate_stream(self, prompt, prompt_type):
+        model = self._cached_model(prompt)
+        if model is not None:
+            response = model.generate_content(prompt.payload, stream=True)
+        else:
+            response = self.gemini.generate_content(prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def stats(self):
+        stats = super().stats()
+        stats["context_cache_hits"] = self.context_cache_hits
+        return stats
+
+
+class FakeBackend(LLMBackend):
+    """
+    API 없이 동작하는 로컬 가짜 백엔드
+
+    프롬프트 내용으로부터 스키마에 맞는 지문/문제/답안 JSON을 결정적으로 생성합니다.
+    지연 시간은 로그정규분포(중앙값 latency, 분산 latency_sigma)에 응답 1,000자당
+    output_latency초를 더한 값이며, error_rate 확률로 LLMBackendError를 발생시킵니다.
+    rpm을 지정하면 최근 60초 동안의 호출이 rpm을 넘을 때 제공자처럼 429 오류를 발생시킵니다.
+    """
+    model_name = "fake-llm"
+
+    FILLER_WORDS = ("the", "students", "we", "like", "to", "read", "books", "at", "school",
+                    "every", "day", "and", "they", "often", "talk", "about", "their", "friends")
+
+    def __init__(self, latency=0.0, latency_sigma=0.0, error_rate=0.0, seed=0, output_latency=0.0, rpm=0,
+                 model_name=None):
+        """
+        Args:
+            model_name: 모델 경로 실험용 이름 (응답 내용과 캐시 키에 반영)
+        """
+        super().__init__()
+        if model_name:
+            self.model_name = model_name
+        self.rpm = rpm
+        self._recent_calls = collections.deque()
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.output_latency = output_latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def generation_settings(self):
+        return {"seed": self.seed, "model": self.model_name}
+
+    def _check_quota(self):
+        """최근 60초 호출 수가 rpm을 넘으면 한도 초과 오류 (호출 잠금 안에서 실행)"""
+        if self.rpm <= 0:
+            return
+        now = time.monotonic()
+        while self._recent_calls and now - self._recent_calls[0] >= 60:
+            self._recent_calls.popleft()
+        if len(self._recent_calls) >= self.rpm:
+            raise LLMBackendError("429 ResourceExhausted: 가짜 백엔드 분당 요청 한도 초과")
+        self._recent_calls.append(now)
+
+    def _generate(self, prompt, prompt_type):
+        # 지연 시간과 오류 여부는 인스턴스 난수열에서, 응답 내용은 프롬프트 해시에서 결정
+        with self._rng_lock:
+            self._check_quota()
+            delay = self._sample_latency()
+            failed = self._rng.random() < self.error_rate
+
+        text = self._render(prompt, prompt_type)
+        delay += self.output_latency * len(text) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise LLMBackendError("가짜 백엔드 오류 (error_rate 설정에 따른 실패)")
+
+        return text
+
+    def _generate_stream(self, prompt, prompt_type, chunk_size=64):
+        # 전체 지연 시간을 조각 수만큼 나누어 토큰이 순서대로 도착하는 것처럼 흉내냄
+        with self._rng_lock:
+            self._check_quota()
+            delay = self._sample_latency()
+            failed = self._rng.random() < self.error_rate
+
+        text = self._render(prompt, prompt_type)
+        delay += self.output_latency * len(text) / 1000
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for i, chunk in enumerate(chunks):
+            if delay > 0:
+                time.sleep(delay / len(chunks))
+            if failed and i == len(chunks) // 2:
+                raise LLMBackendError("가짜 백엔드 오류 (error_rate 설정에 따른 실패)")
+            yield chunk
+
+    def _render(self, prompt, prompt_type):
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+
+        prompt_type = prompt_type or self._infer_prompt_type(prompt)
+        if prompt_type == "passage":
+            payload = self._fake_passages(prompt, rng)
+        elif prompt_type == "passage_batch":
+            payload = self._fake_passage_batch(prompt, rng)
+        elif prompt_type == "question":
+            payload = self._fake_questions(prompt, rng)
+        elif prompt_type == "question_answer":
+            payload = self._fake_questions(prompt, rng, with_answers=True)
+        elif prompt_type == "answer":
+            payload = self._fake_answers(prompt, rng)
+        elif prompt_type == "json_repair":
+            payload = self._fake_json_repair(prompt)
+        else:
+            raise LLMBackendError(f"가짜 백엔드가 지원하지 않는 프롬프트 유형: {prompt_type}")
+
+        return "```json\n" + json.dumps(payload, ensure_ascii=False, indent=2) + "\n```"
+
+    def _sample_latency(self):
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_sigma <= 0:
+            return self.latency
+        return self._rng.lognormvariate(math.log(self.latency), self.latency_sigma)
+
+    @staticmethod
+    def _infer_prompt_type(prompt):
+        if "JSON 수정 AI" in prompt:
+            return "json_repair"
+        if "[슬롯 목록]" in prompt:
+            return "passage_batch"
+        if "지문 및 예문 생성 AI" in prompt:
+            return "passage"
+        if "문제 해설 AI" in prompt:
+            return "answer"
+        if "문제 출제 AI" in prompt and "정답과 상세한 해설을 함께" in prompt:
+            return "question_answer"
+        if "문제 출제 AI" in prompt:
+            return "question"
+        return None
+
+    @staticmethod
+    def _find_int(pattern, prompt, default):
+        match = re.search(pattern, prompt)
+        return int(match.group(1)) if match else default
+
+    def _make_text(self, rng, word_count, required_words):
+        words = [rng.choice(self.FILLER_WORDS) for _ in range(max(word_count, 1))]
+        # 요구 단어를 임의 위치에 끼워 넣음
+        for word in required_words[:word_count]:
+            words[rng.randrange(len(words))] = word
+        # 10단어 안팎마다 문장을 나눔 (지문 가독성 검사가 실제 응답처럼 측정하도록)
+        sentences = []
+        while words:
+            size = rng.randint(8, 12)
+            sentence = " ".join(words[:size])
+            sentences.append(sentence[0].upper() + sentence[1:] + ".")
+            words = words[size:]
+        return " ".join(sentences)
+
+    def _fake_passages(self, prompt, rng):
+        passage_count = self._find_int(r"지문 개수\**:\s*(\d+)", prompt, 1)
+        passage_length = self._find_int(r"각 지문당\s*(\d+)", prompt, 80)
+        sentence_count = self._find_int(r"예문 개수\**:\s*(\d+)", prompt, 2)
+        sentence_length = self._find_int(r"각 예문은\s*(\d+)", prompt, 12)
+
+        match = re.search(r"필수 단어\**:\s*(.+)", prompt)
+        required = [w.strip() for w in match.group(1).split(",")] if match else []
+        required = [w for w in required if w][:3]
+
+        return {
+            "passages": [
+                {
+                    "title": f"Fake Passage {i+1}",
+                    "content": self._make_text(rng, passage_length, required),
+                    "korean_translation": f"가짜 지문 {i+1} 번역",
+                }
+                for i in range(passage_count)
+            ],
+            "sentences": [
+                {
+                    "english": self._make_text(rng, sentence_length, required),
+                    "korean": f"가짜 예문 {i+1} 번역",
+                }
+                for i in range(sentence_count)
+            ],
+        }
+
+    def _fake_passage_batch(self, prompt, rng):
+        match = re.search(r"필수 단어\**:\s*(.+)", prompt)
+        required = [w.strip() for w in match.group(1).split(",")] if match else []
+        required = [w for w in required if w][:3]
+
+        payload = {"passages": [], "sentences": []}
+        slot_pattern = r"- 슬롯 (\d+): 지문 (\d+)개 \(각 (\d+) 단어 내외\), 예문 (\d+)개 \(각 (\d+) 단어 내외\)"
+        for slot, passage_count, passage_length, sentence_count, sentence_length in re.findall(slot_pattern, prompt):
+            slot = int(slot)
+            for i in range(int(passage_count)):
+                payload["passages"].append({
+                    "slot": slot,
+                    "title": f"Fake Passage {slot}-{i+1}",
+                    "content": self._make_text(rng, int(passage_length), required),
+                    "korean_translation": f"가짜 지문 {slot}-{i+1} 번역",
+                })
+            for i in range(int(sentence_count)):
+                payload["sentences"].append({
+                    "slot": slot,
+                    "english": self._make_text(rng, int(sentence_length), required),
+                    "korean": f"가짜 예문 {slot}-{i+1} 번역",
+                })
+        return payload
+
+    def _fake_questions(self, prompt, rng, with_answers=False):
+        question_count = self._find_int(r"문제 개수\**:\s*(\d+)", prompt, 3)
+        match = re.search(r"학습 목표\**:\s*`([^`]*)`", prompt)
+        learning_objective = match.group(1) if match else ""
+
+        questions = []
+        for i in range(question_count):
+            questions.append({
+                "id": i + 1,
+                "question": f"Fake question {i+1}: What is the main idea?",
+                "modified_passage": self._make_text(rng, 20, []),
+                "choices": [f"({label}) choice {label}" for label in "ABCD"],
+                "source": f"지문 {rng.randint(1, 3)}",
+                "modification_type": "원본 유지",
+                "learning_objective": learning_objective,
+            })
+            if with_answers:
+                questions[-1]["answer"] = {
+                    "correct_choice": f"({rng.choice('ABCD')})",
+                    "explanation": {
+                        "main": f"문제 {i+1}의 가짜 해설",
+                        "distractors": "가짜 오답 설명",
+                        "learning_point": "가짜 학습 포인트",
+                    },
+                }
+        return {"questions": questions}
+
+    def _fake_answers(self, prompt, rng):
+        question_ids = [int(qid) for qid in re.findall(r"문제 (\d+):", prompt)] or [1]
+        return {
+            "answers": [
+                {
+                    "question_id": qid,
+                    "correct_choice": f"({rng.choice('ABCD')})",
+                    "explanation": {
+                        "main": f"문제 {qid}의 가짜 해설",
+                        "distractors": "가짜 오답 설명",
+                        "learning_point": "가짜 학습 포인트",
+                    },
+                }
+                for qid in question_ids
+            ]
+        }
+
+
+    @staticmethod
+    def _fake_json_repair(prompt):
+        # 로컬 복구 규칙으로 고칠 수 있는 범위만 고쳐서 반환
+        from response_parser import find_json_object, repair_json
+
+        broken = prompt.split("[손상된 JSON]**", 1)[-1]
+        data, candidate = find_json_object(broken)
+        if data is None and candidate:
+            data = repair_json(candidate)
+        if data is None:
+            raise LLMBackendError("가짜 백엔드가 JSON을 고치지 못했습니다.")
+        return data
+
+
+def create_backend(name=None, **kwargs):
+    """
+    이름으로 백엔드 생성 (기본값: LLM_BACKEND 환경변수, 없으면 "gemini")
+
+    Args:
+        name: "gemini" 또는 "fake"
+        **kwargs: 백엔드 생성자 인자 (지정하지 않으면 환경변수 사용)
+    """
+    name = name or os.getenv('LLM_BACKEND', 'gemini')
+
+    if name == "gemini":
+        options = {}
+        if os.getenv('GEMINI_CONTEXT_CACHE', '0') == '1':
+            options["context_cache_ttl"] = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', 3600))
+        options.update(kwargs)
+        return GeminiBackend(**options)
+    elif name == "fake":
+        options = {
+            "latency": float(os.getenv('FAKE_LLM_LATENCY', 0.0)),
+            "latency_sigma": float(os.getenv('FAKE_LLM_LATENCY_SIGMA', 0.0)),
+            "error_rate": float(os.getenv('FAKE_LLM_ERROR_RATE', 0.0)),
+            "seed": int(os.getenv('FAKE_LLM_SEED', 0)),
+            "output_latency": float(os.getenv('FAKE_LLM_OUTPUT_LATENCY', 0.0)),
+            "rpm": int(os.getenv('FAKE_LLM_RPM', 0)),
+        }
+        options.update(kwargs)
+        return FakeBackend(**options)
+    else:
+        raise ValueError(f"'{name}'은(는) 유효한 LLM 백엔드가 아닙니다.")
@@ -0,0 +1,144 @@
+"""
+LLM 응답 캐시를 관리하는 파일
+
+(모델 이름, 프롬프트 유형, 완성된 프롬프트, 생성 설정)의 해시를 키로 하여
+응답을 SQLite 파일에 저장합니다. 같은 요청이 다시 들어오면 API를 호출하지 않고
+저장된 응답을 반환합니다.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """디스크 기반 LLM 응답 캐시 (LRU + 용량 제한 + TTL)"""
+
+    def __init__(self, path=".cache/llm_responses.sqlite3", max_entries=5000,
+                 max_bytes=200 * 1024 * 1024, ttl=7 * 24 * 3600):
+        """
+        Args:
+            path: 캐시 파일 경로
+            max_entries: 최대 보관 항목 수 (초과 시 가장 오래 사용되지 않은 항목부터 제거)
+            max_bytes: 최대 보관 용량 (바이트)
+            ttl: 항목 유효 기간 (초, None이면 만료 없음)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   response TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt_type, prompt, settings=None):
+        """캐시 키 생성 (내용 기반 SHA-256 해시)"""
+        payload = json.dumps(
+            [model_name, prompt_type, prompt, settings or {}],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """캐시된 응답 조회 (없거나 만료된 경우 None)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def set(self, key, response):
+        """응답 저장 후 용량/개수 제한에 맞게 정리"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """만료 항목 제거 후, 제한을 넘으면 가장 오래 사용되지 않은 항목부터 제거"""
+        if self.ttl is not None:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self.evictions += cursor.rowcount
+
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            count -= 1
+            total_bytes -= size
+
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def clear(self):
+        """캐시 전체 삭제"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """캐시 적중/실패 통계 반환"""
+        with self._lock:
+            count, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total_bytes,
+        }
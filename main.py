@@ -1,40 +1,263 @@
-import google.generativeai as genai
+import copy
 import os
 import time
-import json
-import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from batching import plan_passage_batches
+from consistency import find_answer_mismatches, number_map, renumber_source, split_combined_answers
+from dedup import DEDUP_ENABLED, DuplicateFilter
+from item_bank import ItemBank
+from llm_backends import create_backend
+from llm_cache import ResponseCache
+from model_router import MODEL_ROUTING_ENABLED, ModelRouter
+from pipeline import TaskGraph
+from rate_limiter import RATE_LIMIT_ENABLED, AdaptiveRateLimiter, RateLimitedBackend, bind_priority
+from retry_policy import RETRY_ENABLED, RetryingCaller
+from response_parser import get_parse_metrics, is_parseable, parse_json_response
+from retrieval import retrieve_for_distribution
+from streaming import StreamingItemParser
+from token_budget import (OUTPUT_TOKENS_PER_ANSWER, QuestionShard, allocate, estimate_tokens,
+                          get_stage_budget, plan_question_shards, split_by_budget)
+from taxonomy import get_taxonomy
+from vocabulary_index import get_vocabulary_index
+from vocabulary_profile import passage_meets_vocabulary
+from readability import READABILITY_CHECK, PASSAGE_LENGTH, SENTENCE_LENGTH, item_meets_readability, score_items
 from models import (DatabaseConfig, DatabaseManager, User, ChatHistory, 
-                   GrammarCategory, GrammarTopic, GrammarAchievement, 
-                   ReadingType, VocabularyCategory, VocabularyAchievement, Word,
-                   ContentGenerationRequest, QuestionDistribution)
+                   ContentGenerationRequest, JobLeaseError, QuestionDistribution)
 
 # .env 파일 로드
 load_dotenv()
 
-# 제미나이 API 키 설정 (환경변수에서 가져오기)
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+# LLM 백엔드 생성 (LLM_BACKEND=fake 이면 API 없이 동작하는 로컬 가짜 백엔드 사용)
+MODEL_NAME = 'gemini-2.5-pro'
+GENERATION_CONFIG = {}
 
-# 제미나이 모델 생성
-model = genai.GenerativeModel('gemini-2.5-pro')
+# 모델별 속도/동시 호출 조절기 (제공자 한도가 모델마다 따로 있으므로 모델마다 두며, RATE_LIMIT=0 이면 사용하지 않음)
+rate_limiters = {}
+
+# 프롬프트 유형별 재시도/헤지 정책 (RETRY=0 이면 한 번만 호출)
+retrying_caller = RetryingCaller() if RETRY_ENABLED else None
+
+def create_model_backend(model_name):
+    """
+    모델 하나의 백엔드 생성 (가짜 백엔드는 모델 이름만 붙임)
+    
+    RATE_LIMIT=1이면 그 모델의 조절기로 감싸므로, 대체 모델로 넘기는 시도도 각자 조절기 자리를 차지합니다.
+    """
+    if os.getenv('LLM_BACKEND', 'gemini') == 'gemini':
+        model_backend = create_backend('gemini', model_name=model_name, generation_config=GENERATION_CONFIG,
+                                       json_mode=os.getenv('LLM_JSON_MODE', '1') == '1')
+    else:
+        model_backend = create_backend(model_name=model_name)
+    if not RATE_LIMIT_ENABLED:
+        return model_backend
+    rate_limiters[model_name] = AdaptiveRateLimiter.for_model(model_name)
+    return RateLimitedBackend(model_backend, rate_limiters[model_name])
+
+# MODEL_ROUTING=1 이면 프롬프트 유형별로 모델을 고르고 서킷 브레이커로 대체 모델에 넘김 (model_router.py 참고)
+# 실패한 호출을 대체 모델로 다시 보내는 것도 재시도이므로 재시도 예산에서 차감
+if MODEL_ROUTING_ENABLED:
+    backend = ModelRouter(create_model_backend, default_model=MODEL_NAME,
+                          failover_budget=retrying_caller.budget if retrying_caller else None)
+else:
+    backend = create_model_backend(MODEL_NAME)
+
+# LLM 응답 캐시 (LLM_CACHE_DISABLED=1 이면 사용하지 않음)
+if os.getenv('LLM_CACHE_DISABLED') == '1':
+    response_cache = None
+else:
+    response_cache = ResponseCache(
+        path=os.getenv('LLM_CACHE_PATH', '.cache/llm_responses.sqlite3'),
+        max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000)),
+        max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', 200 * 1024 * 1024)),
+        ttl=int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+    )
 
 # 프롬프트는 prompts.py 파일에서 관리
-from prompts import get_prompt, format_prompt
+from prompts import get_prompt, format_prompt, prompt_fields, record_prompt_bytes, get_prompt_metrics
+
+# 분배별 지문 생성 시 동시에 진행할 최대 LLM 호출 수 (1이면 순차 실행)
+MAX_CONCURRENT_PASSAGES = int(os.getenv('MAX_CONCURRENT_PASSAGES', 4))
 
-def generate_response(prompt):
-    """제미나이 모델을 사용해 응답 생성"""
+# 한 요청에 묶을 최대 분배 수 (1이면 분배마다 따로 요청, 묶음의 토큰 상한은 TOKEN_BUDGET_PASSAGE)
+PASSAGE_BATCH_SIZE = int(os.getenv('PASSAGE_BATCH_SIZE', 1))
+
+# 1이면 문제와 정답/해설을 한 번의 요청으로 생성 (0이면 답안 생성 요청을 따로 보냄)
+COMBINED_ANSWERS = os.getenv('COMBINED_ANSWERS', '1') == '1'
+
+# 파이프라인 실행 시 문제 샤드 하나에 넣을 지문 요청 수 (0이면 모든 지문을 기다린 뒤 한 번에 문제 생성)
+PIPELINE_SHARD_SIZE = int(os.getenv('PIPELINE_SHARD_SIZE', 0))
+
+# 1이면 분배별 문항을 문항 은행에서 먼저 채우고 모자란 문항만 생성하며, 생성된 문항을 은행에 저장
+ITEM_BANK_ENABLED = os.getenv('ITEM_BANK', '0') == '1'
+
+# 프롬프트 유형별로 응답 JSON에 반드시 있어야 하는 키 (이 키를 가진 JSON으로 파싱되는 응답만 캐시)
+RESPONSE_KEYS = {
+    "passage": ("passages",),
+    "passage_batch": ("passages",),
+    "question": ("questions",),
+    "question_answer": ("questions",),
+    "answer": ("answers",),
+}
+
+def is_cacheable_response(text, prompt_type):
+    """응답을 캐시에 저장하거나 캐시에서 꺼내 써도 되는지 (로컬 복구까지 해서 파싱되는 응답만)"""
+    return is_parseable(text, RESPONSE_KEYS.get(prompt_type, ()))
+
+def generate_response(prompt, prompt_type=None, use_cache=True, validate=None):
+    """
+    제미나이 모델을 사용해 응답 생성
+    
+    같은 (모델, 프롬프트 유형, 프롬프트, 생성 설정)에 대한 응답은 캐시에서 반환합니다.
+    모델 경로(ModelRouter)의 대체 모델이 응답한 경우는 캐시 키의 모델과 다르므로 캐시하지 않습니다.
+    
+    Args:
+        prompt: 완성된 프롬프트
+        prompt_type: 프롬프트 유형 (캐시 키에 포함)
+        use_cache: False이면 캐시를 건너뛰고 항상 API를 호출
+        validate: 응답 텍스트 → bool, True인 응답만 캐시하며 재시도/헤지에서도 이 검사를 통과한 첫 응답을 사용
+                  (기본값: 유형별 필수 키를 가진 JSON으로 파싱되는지)
+    """
+    validate = validate or (lambda text: is_cacheable_response(text, prompt_type))
+    cache_key = None
+    if use_cache and response_cache:
+        cache_key = ResponseCache.make_key(backend.model_name, prompt_type, prompt, backend.generation_settings)
+        cached = response_cache.get(cache_key)
+        if cached is not None and validate(cached):
+            return cached
+    
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        text = call_backend(prompt, prompt_type, validate)
     except Exception as e:
         return f"오류 발생: {str(e)}"
+    
+    # 오류 응답과 파싱할 수 없는 응답은 캐시하지 않음 (같은 잘못된 응답이 TTL 동안 재사용되지 않도록)
+    if cache_key and not getattr(text, "fallback", False) and validate(text):
+        response_cache.set(cache_key, str(text))
+    return text
+
+def generate_response_stream(prompt, prompt_type=None, use_cache=True, validate=None):
+    """
+    제미나이 모델의 응답을 조각 단위로 생성
+    
+    캐시에 있으면 저장된 응답을 한 조각으로 반환하고, 없으면 스트리밍이 끝난 뒤 검증을 통과한 전체 응답을 캐시합니다
+    (대체 모델의 응답은 캐시하지 않음).
+    
+    Args:
+        validate: generate_response 참고
+    
+    Yields:
+        str: 응답 텍스트 조각 (오류 시 "오류 발생: ..." 조각)
+    """
+    validate = validate or (lambda text: is_cacheable_response(text, prompt_type))
+    cache_key = None
+    if use_cache and response_cache:
+        cache_key = ResponseCache.make_key(backend.model_name, prompt_type, prompt, backend.generation_settings)
+        cached = response_cache.get(cache_key)
+        if cached is not None and validate(cached):
+            yield cached
+            return
+    
+    chunks = []
+    try:
+        for chunk in stream_backend(prompt, prompt_type):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        yield f"오류 발생: {str(e)}"
+        return
+    
+    text = "".join(chunks)
+    if cache_key and not any(getattr(chunk, "fallback", False) for chunk in chunks) and validate(text):
+        response_cache.set(cache_key, text)
+
+def call_backend(prompt, prompt_type=None, validate=None):
+    """
+    재시도 정책(retrying_caller)을 거쳐 백엔드 호출 (모든 시도가 실패하면 마지막 예외 발생)
+    
+    모델 호출마다 그 모델의 속도 조절기 자리를 따로 차지하므로 재시도 전 백오프 동안에는 다른 호출이 진행됩니다.
+    validate를 주면 헤지/재시도에서 검사를 통과한 첫 응답을 사용합니다 (RetryingCaller.call 참고).
+    """
+    if retrying_caller is None:
+        return call_backend_once(prompt, prompt_type)
+    return retrying_caller.call(lambda: call_backend_once(prompt, prompt_type), prompt_type, validate)
+
+def call_backend_once(prompt, prompt_type=None):
+    """
+    백엔드를 한 번 호출 (예외는 그대로 전달)
+    
+    속도 조절은 모델 백엔드를 감싼 RateLimitedBackend가 모델 호출마다 합니다 (create_model_backend 참고).
+    """
+    record_prompt_bytes(prompt_type, prompt)
+    return backend.generate(prompt, prompt_type)
+
+def stream_backend(prompt, prompt_type=None):
+    """재시도 정책을 거쳐 백엔드 스트리밍 호출 (첫 조각을 받기 전에 실패한 경우만 재시도)"""
+    if retrying_caller is None:
+        return stream_backend_once(prompt, prompt_type)
+    return retrying_caller.stream(lambda: stream_backend_once(prompt, prompt_type), prompt_type)
 
-def generate_content_with_prompt(prompt_type, **kwargs):
+def stream_backend_once(prompt, prompt_type=None):
+    """백엔드 스트리밍 호출 (모델 호출마다 응답이 끝날 때까지 그 모델의 동시 호출 자리를 차지)"""
+    record_prompt_bytes(prompt_type, prompt)
+    yield from backend.generate_stream(prompt, prompt_type)
+
+def parse_llm_response(response, prompt_type, required_keys=()):
+    """
+    LLM 응답에서 JSON 객체 추출
+    
+    괄호 짝으로 JSON을 찾고, 깨진 경우 로컬에서 고친 뒤, 그래도 실패하면 JSON 수정 프롬프트로 재요청합니다.
+    
+    Returns:
+        dict: 파싱된 객체 (실패 시 None)
+    """
+    def reprompt(broken_json):
+        return generate_content_with_prompt(
+            "json_repair",
+            broken_json=broken_json,
+            required_keys=", ".join(required_keys) or "(제한 없음)"
+        )
+    
+    return parse_json_response(response, prompt_type, required_keys, reprompt=reprompt)
+
+def set_backend(new_backend):
+    """generate_response가 사용할 LLM 백엔드 교체 (이전 백엔드 반환)"""
+    global backend
+    previous = backend
+    backend = new_backend
+    return previous
+
+def get_cache_stats():
+    """LLM 응답 캐시 통계 조회 (캐시 미사용 시 None)"""
+    return response_cache.stats() if response_cache else None
+
+def get_rate_limiter_stats():
+    """모델별 LLM 호출 속도 조절기 상태 조회 (미사용 시 None)"""
+    if not RATE_LIMIT_ENABLED:
+        return None
+    return {model: limiter.stats() for model, limiter in list(rate_limiters.items())}
+
+def get_retry_stats():
+    """프롬프트 유형별 재시도/헤지 결과와 지연 시간 백분위 조회 (미사용 시 None)"""
+    return retrying_caller.stats() if retrying_caller else None
+
+def get_llm_stats():
+    """백엔드 호출 통계, 호출 조절기 상태, 재시도 통계, 프롬프트 바이트 통계, 응답 캐시 통계를 함께 조회"""
+    return {
+        "backend": backend.stats(),
+        "rate_limiter": get_rate_limiter_stats(),
+        "retry": get_retry_stats(),
+        "prompts": get_prompt_metrics(),
+        "cache": get_cache_stats(),
+    }
+
+def generate_content_with_prompt(prompt_type, use_cache=True, **kwargs):
     """
     프롬프트 템플릿을 사용해 콘텐츠 생성
     
     Args:
         prompt_type: 프롬프트 유형 ("passage", "question", "answer")
+        use_cache: False이면 응답 캐시를 건너뜀 (재생성 요청 등)
         **kwargs: 프롬프트에 채울 파라미터들
     
     Returns:
@@ -45,7 +268,7 @@ def generate_content_with_prompt(prompt_type, **kwargs):
         formatted_prompt = format_prompt(prompt_type, **kwargs)
         
         # 응답 생성
-        response = generate_response(formatted_prompt)
+        response = generate_response(formatted_prompt, prompt_type=prompt_type, use_cache=use_cache)
         return response
     except Exception as e:
         print(f"콘텐츠 생성 오류: {e}")
@@ -53,13 +276,23 @@ def generate_content_with_prompt(prompt_type, **kwargs):
 
 # 데이터베이스 설정
 def setup_database():
-    """데이터베이스 연결 설정"""
+    """
+    데이터베이스 연결 설정
+    
+    DATABASE_URL이 지정되면 그 URL을 사용합니다 (예: 로컬 부하 테스트용 sqlite:///local.db).
+    """
     config = DatabaseConfig(
         host=os.getenv('DB_HOST', 'localhost'),
         port=int(os.getenv('DB_PORT', 5432)),
         database=os.getenv('DB_NAME', ''),
         username=os.getenv('DB_USER', ''),
-        password=os.getenv('DB_PASSWORD', '')
+        password=os.getenv('DB_PASSWORD', ''),
+        url=os.getenv('DATABASE_URL') or None,
+        pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        pool_pre_ping=os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 30))
     )
     
     db_manager = DatabaseManager(config)
@@ -71,129 +304,89 @@ def setup_database():
         print("데이터베이스 연결 실패")
         return None
 
-# SQLAlchemy CRUD 함수들
+# SQLAlchemy CRUD 함수들 (unit_of_work 안에서 호출되면 요청 단위 세션을 공유)
 def create_user(db_manager, username, email):
     """사용자 생성"""
-    session = db_manager.get_session()
     try:
-        new_user = User(username=username, email=email)
-        session.add(new_user)
-        session.commit()
+        with db_manager.session_scope() as session:
+            new_user = User(username=username, email=email)
+            session.add(new_user)
+            session.flush()
+            user_id = new_user.id
         print(f"사용자 생성: {username}")
-        return new_user.id
+        return user_id
     except Exception as e:
-        session.rollback()
         print(f"사용자 생성 오류: {e}")
         return None
-    finally:
-        session.close()
 
 def get_user_by_id(db_manager, user_id):
     """ID로 사용자 조회"""
-    session = db_manager.get_session()
-    try:
-        user = session.query(User).filter(User.id == user_id).first()
-        return user
-    finally:
-        session.close()
+    with db_manager.session_scope() as session:
+        return session.query(User).filter(User.id == user_id).first()
 
 def save_chat_history(db_manager, user_id, prompt, response):
     """채팅 기록 저장"""
-    session = db_manager.get_session()
     try:
-        chat = ChatHistory(user_id=user_id, prompt=prompt, response=response)
-        session.add(chat)
-        session.commit()
+        with db_manager.session_scope() as session:
+            chat = ChatHistory(user_id=user_id, prompt=prompt, response=response)
+            session.add(chat)
+            session.flush()
+            chat_id = chat.id
         print("채팅 기록 저장됨")
-        return chat.id
+        return chat_id
     except Exception as e:
-        session.rollback()
         print(f"채팅 기록 저장 오류: {e}")
         return None
-    finally:
-        session.close()
 
 def get_chat_history(db_manager, user_id=None, limit=10):
     """채팅 기록 조회"""
-    session = db_manager.get_session()
-    try:
+    with db_manager.session_scope() as session:
         query = session.query(ChatHistory)
         if user_id:
             query = query.filter(ChatHistory.user_id == user_id)
-        chats = query.order_by(ChatHistory.created_at.desc()).limit(limit).all()
-        return chats
-    finally:
-        session.close()
+        return query.order_by(ChatHistory.created_at.desc()).limit(limit).all()
 
-# 데이터 조회 함수들
+# 데이터 조회 함수들 (분류 체계는 메모리 스냅샷에서 조회)
 def get_grammar_categories(db_manager):
     """문법 카테고리 조회"""
-    session = db_manager.get_session()
-    try:
-        categories = session.query(GrammarCategory).order_by(GrammarCategory.order_num).all()
-        return categories
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).grammar_categories)
 
 def get_grammar_topics_by_category(db_manager, category_id):
     """카테고리별 문법 주제 조회"""
-    session = db_manager.get_session()
-    try:
-        topics = session.query(GrammarTopic).filter(
-            GrammarTopic.category_id == category_id
-        ).order_by(GrammarTopic.order_num).all()
-        return topics
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).grammar_topics(category_id))
 
 def get_achievements_by_topic(db_manager, topic_id):
     """주제별 성취기준 조회"""
-    session = db_manager.get_session()
-    try:
-        achievements = session.query(GrammarAchievement).filter(
-            GrammarAchievement.topic_id == topic_id
-        ).all()
-        return achievements
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).grammar_achievements(topic_id))
 
 def get_reading_types(db_manager):
     """독해 유형 조회"""
-    session = db_manager.get_session()
-    try:
-        reading_types = session.query(ReadingType).order_by(ReadingType.order_num).all()
-        return reading_types
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).reading_types)
 
 def get_vocabulary_categories(db_manager):
     """어휘 카테고리 조회"""
-    session = db_manager.get_session()
-    try:
-        categories = session.query(VocabularyCategory).order_by(VocabularyCategory.order_num).all()
-        return categories
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).vocabulary_categories)
 
 def get_vocabulary_achievements_by_category(db_manager, category_id):
     """카테고리별 어휘 성취기준 조회"""
-    session = db_manager.get_session()
-    try:
-        achievements = session.query(VocabularyAchievement).filter(
-            VocabularyAchievement.category_id == category_id
-        ).all()
-        return achievements
-    finally:
-        session.close()
+    return list(get_taxonomy(db_manager).vocabulary_achievements(category_id))
 
 def get_words_by_level(db_manager, level):
-    """레벨별 단어 조회"""
-    session = db_manager.get_session()
-    try:
-        words = session.query(Word).filter(Word.level == level).all()
-        return [word.word for word in words]
-    finally:
-        session.close()
+    """레벨별 단어 조회 (메모리 단어 인덱스 사용)"""
+    return list(get_vocabulary_index(db_manager).words(level))
+
+def get_word_list_by_difficulty(db_manager, difficulty, count=200):
+    """
+    난이도별 레벨 비율에 맞춰 단어 목록 추출
+    
+    Args:
+        difficulty: "하", "중간", "상" (또는 "중", "기본", "고급")
+        count: 추출할 단어 수
+    
+    Returns:
+        list: 무작위로 추출된 단어 목록
+    """
+    return get_vocabulary_index(db_manager).sample_by_difficulty(difficulty, count)
 
 def calculate_question_distribution(request: ContentGenerationRequest):
     """문항 수 계산 및 분배"""
@@ -266,13 +459,39 @@ def print_question_distribution(distributions):
     print(f"\n📝 총 문항 수: {total}문항")
     print("=" * 50)
 
-def process_user_request_new(db_manager, request_data):
+def checkpointed(checkpoint, stage, key, produce):
+    """
+    체크포인트에 저장된 단계 결과가 있으면 그대로 쓰고, 없으면 produce()로 만든 뒤 저장
+    
+    저장된 결과는 key(단계 입력의 요약, JSON으로 저장 가능한 값)가 같을 때만 사용합니다.
+    결과가 비어 있으면 실패로 기록하여 다음 실행에서 다시 시도합니다. checkpoint가 None이면 produce()만 실행합니다.
+    produce() 전에 checkpoint.check()로 작업 임대를 확인하여, 임대를 잃었으면 LLM을 호출하지 않고 JobLeaseError를 발생시킵니다.
+    """
+    if checkpoint is None:
+        return produce()
+    saved = checkpoint.load(stage, key)
+    if saved is not None:
+        return saved
+    checkpoint.check()
+    value = produce()
+    if value:
+        checkpoint.save(stage, value, key)
+    else:
+        checkpoint.fail(stage)
+    return value
+
+def process_user_request_new(db_manager, request_data, on_item=None, user_id=None, checkpoint=None):
     """
     새로운 구조의 사용자 요청을 처리하여 영어 학습 콘텐츠를 생성합니다.
     
     Args:
         db_manager: 데이터베이스 매니저
         request_data: ContentGenerationRequest 객체 또는 딕셔너리
+        on_item: 지정하면 지문/예문이 완성될 때마다 on_item(dist, kind, item) 호출 (진행 상황 전달용)
+        user_id: 지정하면 이 사용자에게 이미 낸 문항 은행 문제는 다시 고르지 않음
+        checkpoint: 지정하면 단계가 끝날 때마다 결과를 저장하고, 저장된 단계는 다시 실행하지 않음
+                    (load/save/fail/check 메서드와 이번 실행에서 실패한 단계 집합 failed를 가진 객체,
+                    jobs.JobCheckpoint 참고 - 작업 임대를 잃으면 남은 단계를 멈추고 JobLeaseError 발생)
     
     Returns:
         dict: 생성된 콘텐츠 (지문, 예문, 문제, 답안)
@@ -297,11 +516,29 @@ def process_user_request_new(db_manager, request_data):
     distributions = calculate_question_distribution(request)
     print_question_distribution(distributions)
     
-    # 2. 데이터베이스에서 정보 조회
-    db_info = gather_db_info_new(db_manager, request)
-    
-    # 3. 분배별로 콘텐츠 생성
-    all_results = generate_content_by_distribution(db_manager, request, distributions, db_info)
+    if ITEM_BANK_ENABLED:
+        # 수요 기록은 생성 작업과 별도의 짧은 트랜잭션으로 처리하여 인기 조각의 행 잠금을 오래 잡지 않음
+        # (이어서 실행하는 작업은 수요를 다시 더하지 않음)
+        def record_demand():
+            try:
+                ItemBank(db_manager).record_demand(request, distributions)
+                return True
+            except Exception as e:
+                print(f"⚠️ 문항 은행 수요 기록 실패: {e}")
+                return None
+        checkpointed(checkpoint, "demand", None, record_demand)
+    
+    # 2. 데이터베이스에서 정보 조회 (조회는 하나의 세션과 연결을 공유)
+    # LLM 생성은 몇 분씩 걸리므로 작업 단위 밖에서 실행하여 연결과 트랜잭션을 잡고 있지 않음
+    # 단어 목록은 무작위로 뽑으므로 이어서 실행할 때 같은 프롬프트가 되도록 저장된 값을 사용
+    def gather():
+        with db_manager.unit_of_work():
+            return gather_db_info_new(db_manager, request)
+    db_info = checkpointed(checkpoint, "db_info", None, gather)
+    
+    # 3. 분배별로 콘텐츠 생성 (문항 은행 조회/저장은 각자 짧은 트랜잭션으로 처리)
+    all_results = generate_content_by_distribution(db_manager, request, distributions, db_info,
+                                                   on_item=on_item, user_id=user_id, checkpoint=checkpoint)
     
     return all_results
 
@@ -336,16 +573,8 @@ def gather_db_info(db_manager, categories, difficulty, grammar_subcategories=Non
         'word_list': []
     }
     
-    # 난이도에 따른 어휘 레벨 매핑
-    level_mapping = {
-        "기본": "basic",
-        "중간": "middle", 
-        "고급": "high"
-    }
-    word_level = level_mapping.get(difficulty, "basic")
-    
-    # 단어 목록 조회
-    db_info['word_list'] = get_words_by_level(db_manager, word_level)[:20]  # 상위 20개만
+    # 난이도별 레벨 비율에 맞춰 단어 20개 추출 (기본/중간/고급)
+    db_info['word_list'] = get_word_list_by_difficulty(db_manager, difficulty, 20)
     
     for category in categories:
         if category == "문법":
@@ -384,21 +613,8 @@ def gather_db_info_new(db_manager, request: ContentGenerationRequest):
         'word_list': []
     }
     
-    # 난이도에 따른 어휘 레벨 매핑
-    level_mapping = {
-        "상": "high",
-        "중": "middle", 
-        "하": "basic"
-    }
-    
-    # 기본 단어 레벨 (분배인 경우 중간 레벨 사용)
-    if request.difficulty == "분배":
-        word_level = "middle"
-    else:
-        word_level = level_mapping.get(request.difficulty, "middle")
-    
-    # 단어 목록 조회
-    db_info['word_list'] = get_words_by_level(db_manager, word_level)[:20]
+    # 난이도별 레벨 비율에 맞춰 단어 20개 추출 (분배인 경우 중간 비율 사용)
+    db_info['word_list'] = get_word_list_by_difficulty(db_manager, request.difficulty, 20)
     
     # 카테고리별 정보 수집
     for category in request.categories:
@@ -416,8 +632,103 @@ def gather_db_info_new(db_manager, request: ContentGenerationRequest):
     
     return db_info
 
-def generate_content_by_distribution(db_manager, request: ContentGenerationRequest, distributions, db_info):
-    """분배 계획에 따라 콘텐츠 생성"""
+def generate_content_by_distribution(db_manager, request: ContentGenerationRequest, distributions, db_info,
+                                     max_workers=None, on_item=None, shard_size=None, user_id=None, checkpoint=None):
+    """
+    분배 계획에 따라 콘텐츠 생성
+
+    문항 은행이 켜져 있으면(ITEM_BANK) 분배별 문항을 은행에서 먼저 채우고, 모자란 문항 수만큼만
+    LLM으로 생성한 뒤 생성된 문항을 은행에 저장합니다. 문제 번호는 전체 기준으로 다시 매깁니다.
+    은행에 저장할 문항은 어느 분배의 지문으로 만들었는지 확실해야 하므로 문제를 분배마다 따로 생성합니다.
+
+    Args:
+        max_workers: 동시에 진행할 최대 지문 생성 호출 수 (기본값: MAX_CONCURRENT_PASSAGES)
+        on_item: 지정하면 지문/예문이 완성될 때마다 on_item(dist, kind, item)을 호출
+                 (kind: "passages" 또는 "sentences", 은행에서 채운 항목도 전달)
+        shard_size: 문제 샤드 하나에 넣을 지문 요청 수 (기본값: PIPELINE_SHARD_SIZE, 0이면 단계별 실행)
+        user_id: 지정하면 이 사용자에게 이미 낸 은행 문항은 고르지 않음
+        checkpoint: process_user_request_new 참고 (은행에서 고른 문항과 은행 저장 여부도 단계로 저장)
+    """
+    if not ITEM_BANK_ENABLED or db_manager is None:
+        return generate_content_with_llm(request, distributions, db_info, max_workers, on_item, shard_size,
+                                         checkpoint)
+    
+    bank = ItemBank(db_manager)
+    # 이어서 실행할 때 같은 문항과 같은 부족분을 쓰도록 은행에서 고른 결과를 저장
+    filled = checkpointed(checkpoint, "bank", None,
+                          lambda: serialize_bank_fill(*bank.fill(request, distributions, user_id)))
+    served, deficits = deserialize_bank_fill(filled)
+    served_count = sum(len(item['questions']) for item in served)
+    print(f"\n🏦 문항 은행에서 {served_count}문항을 채웠습니다. (LLM 생성 필요: {sum(d.count for d in deficits)}문항)")
+    
+    all_results = {
+        'passages': [],
+        'sentences': [],
+        'questions': [],
+        'answers': [],
+        'distributions': distributions
+    }
+    for item in served:
+        merge_passage_results(all_results, [item['dist']], [item])
+        if on_item:
+            for kind in ("passages", "sentences"):
+                for entry in item[kind]:
+                    on_item(item['dist'], kind, entry)
+    
+    generated = {}
+    if deficits:
+        # 모자란 문항 수만큼만 생성
+        deficit_request = copy.copy(request)
+        deficit_request.total_questions = sum(dist.count for dist in deficits)
+        generated = generate_content_with_llm(deficit_request, deficits, db_info, max_workers, on_item, shard_size,
+                                              checkpoint, per_distribution=True)
+        if checkpoint is not None and checkpoint.failed:
+            # 실패한 단계가 있으면 이어서 실행해 모든 문항이 갖춰진 뒤에 한 번만 저장
+            print("🏦 실패한 단계가 있어 생성된 문항을 아직 문항 은행에 저장하지 않습니다.")
+        else:
+            stored = checkpointed(checkpoint, "bank_deposit", None,
+                                  lambda: {"stored": bank.deposit(request, deficits, generated, get_distribution_info,
+                                                                  user_id)})
+            print(f"🏦 생성된 {stored['stored']}문항을 문항 은행에 저장했습니다.")
+        all_results['passages'].extend(generated.get('passages', []))
+        all_results['sentences'].extend(generated.get('sentences', []))
+    
+    all_results.update(merge_question_shards(served + [generated], all_results['passages'], all_results['sentences'])
+                       or {'questions': [], 'answers': []})
+    return all_results
+
+def serialize_bank_fill(served, deficits):
+    """ItemBank.fill 결과를 체크포인트에 저장할 수 있는 형태로 변환 (분배 객체 → 목록)"""
+    def dist_fields(dist):
+        return [dist.category, dist.subcategory, dist.count, dist.difficulty_level]
+    return {
+        "served": [dict(item, dist=dist_fields(item['dist'])) for item in served],
+        "deficits": [dist_fields(dist) for dist in deficits],
+    }
+
+def deserialize_bank_fill(filled):
+    """serialize_bank_fill의 역변환"""
+    served = [dict(item, dist=QuestionDistribution(*item['dist'])) for item in filled["served"]]
+    return served, [QuestionDistribution(*fields) for fields in filled["deficits"]]
+
+def generate_content_with_llm(request: ContentGenerationRequest, distributions, db_info, max_workers=None,
+                              on_item=None, shard_size=None, checkpoint=None, per_distribution=False):
+    """
+    분배 계획에 따라 LLM으로 콘텐츠 생성
+
+    분배별 지문 생성은 스레드 풀에서 동시에 실행되며, 결과는 원래 분배 순서대로 병합됩니다.
+    shard_size가 1 이상이면 지문 → 문제 → 답안을 샤드별 의존성 그래프로 실행하여,
+    지문이 준비된 샤드부터 문제 생성을 시작합니다 (generate_content_pipelined 참고).
+    인자는 generate_content_by_distribution과 같습니다.
+    checkpoint가 있으면 지문 요청 묶음, 문제 샤드, 답안 샤드가 끝날 때마다 저장하며, 단계별 실행에서는
+    빠진 지문이 있으면 문제 생성으로 넘어가지 않습니다 (이어서 실행하면 빠진 지문부터 생성).
+    per_distribution이 True이면 문제를 분배마다 따로 생성하여 문제에 distribution_info를 표시합니다.
+    """
+    shard_size = PIPELINE_SHARD_SIZE if shard_size is None else shard_size
+    if shard_size > 0:
+        return generate_content_pipelined(request, distributions, db_info, max_workers, on_item, shard_size,
+                                          checkpoint, per_distribution)
+    
     all_results = {
         'passages': [],
         'sentences': [],
@@ -428,120 +739,696 @@ def generate_content_by_distribution(db_manager, request: ContentGenerationReque
     
     print(f"\n🚀 분배 계획에 따른 콘텐츠 생성 시작")
     
-    # 각 분배별로 콘텐츠 생성
-    for i, dist in enumerate(distributions):
-        print(f"\n📝 [{i+1}/{len(distributions)}] {dist.category} > {dist.subcategory} ({dist.difficulty_level}) - {dist.count}문항 생성 중...")
-        
-        # 해당 분배에 맞는 프롬프트 매개변수 생성
-        params = build_prompt_params_for_distribution(request, dist, db_info)
-        
-        # 지문 및 예문 생성 (각 분배마다 별도 생성)
-        passage_result = generate_content_with_prompt("passage", **params)
-        
-        if passage_result and "오류 발생" not in passage_result:
-            try:
-                json_match = re.search(r'```json\s*(\{.*?\})\s*```', passage_result, re.DOTALL)
-                if json_match:
-                    passage_data = json.loads(json_match.group(1))
-                    
-                    # 결과에 추가 (분배 정보와 함께)
-                    for passage in passage_data.get("passages", []):
-                        passage['distribution_info'] = f"{dist.category}-{dist.subcategory}-{dist.difficulty_level}"
-                        all_results['passages'].append(passage)
-                    
-                    for sentence in passage_data.get("sentences", []):
-                        sentence['distribution_info'] = f"{dist.category}-{dist.subcategory}-{dist.difficulty_level}"
-                        all_results['sentences'].append(sentence)
-                    
-                    print(f"✅ 지문 {len(passage_data.get('passages', []))}개, 예문 {len(passage_data.get('sentences', []))}개 생성 완료")
-                    
-            except Exception as e:
-                print(f"❌ 분배 {i+1} 처리 중 오류: {e}")
-                continue
+    # 각 분배별로 지문 및 예문 생성 (동시 실행)
+    passage_results = generate_passages_concurrently(request, distributions, db_info, max_workers, on_item,
+                                                     checkpoint=checkpoint)
+    
+    # 원래 분배 순서대로 결과 병합
+    merge_passage_results(all_results, distributions, passage_results)
+    
+    missing = sum(1 for passage_data in passage_results if not passage_data)
+    if checkpoint is not None and missing:
+        # 지문이 빠진 채로 문제를 만들면 이어서 실행할 때 샤드 구성이 달라져 문제를 다시 생성해야 함
+        print(f"⚠️ 분배 {len(distributions)}개 중 {missing}개의 지문이 없어 문제 생성으로 넘어가지 않습니다.")
+        checkpoint.fail("questions")
+        return all_results
     
     # 통합된 문제 생성 (모든 지문과 예문을 사용)
     if all_results['passages'] and all_results['sentences']:
         print(f"\n🔍 통합 문제 생성 중... (총 {request.total_questions}문항)")
-        questions_result = generate_integrated_questions(request, all_results, db_info)
+        questions_result = generate_integrated_questions(request, all_results, db_info, checkpoint=checkpoint,
+                                                         per_distribution=per_distribution)
         if questions_result:
             all_results.update(questions_result)
     
     return all_results
 
+def generate_content_pipelined(request: ContentGenerationRequest, distributions, db_info, max_workers=None,
+                               on_item=None, shard_size=1, checkpoint=None, per_distribution=False):
+    """
+    지문 → 문제 → 답안을 샤드별 의존성 그래프로 실행
+    
+    연속한 지문 요청 shard_size개가 하나의 문제 샤드가 되며, 샤드의 문항 수는 소속 분배 문항 수의 합입니다.
+    각 샤드의 문제 생성은 그 샤드의 지문 요청만 기다리고, 답안 생성은 그 샤드의 문제만 기다립니다.
+    문제 id는 샤드 순서대로 전체 기준으로 다시 매깁니다.
+    checkpoint가 있으면 지문 요청 묶음과 (토큰 예산으로 나눈) 문제/답안 샤드마다 결과를 저장합니다.
+    """
+    all_results = {
+        'passages': [],
+        'sentences': [],
+        'questions': [],
+        'answers': [],
+        'distributions': distributions
+    }
+    if not distributions:
+        return all_results
+    
+    print(f"\n🚀 분배 계획에 따른 콘텐츠 생성 시작 (파이프라인, 샤드당 지문 요청 {shard_size}개)")
+    max_workers = max(1, max_workers or MAX_CONCURRENT_PASSAGES)
+    batches = plan_passage_requests(request, distributions, db_info)
+    total = len(distributions)
+    graph = TaskGraph()
+    duplicates = DuplicateFilter() if DEDUP_ENABLED else None
+    
+    for b, batch in enumerate(batches):
+        graph.add(f"passage:{b}",
+                  lambda inputs, batch=batch, stage=f"passage:{b}": generate_passages_for_batch_checkpointed(
+                      request, batch, db_info, total, on_item, duplicates, checkpoint, stage))
+    
+    # 전체 문항 수를 샤드별 분배 문항 수에 비례하여 배분
+    groups = [batches[first:first + shard_size] for first in range(0, len(batches), shard_size)]
+    question_counts = allocate(request.total_questions,
+                               [sum(dist.count for batch in group for _, dist, _ in batch.members) for group in groups])
+    
+    shard_names = []
+    first = 0
+    for shard_number, (group, question_count) in enumerate(zip(groups, question_counts)):
+        deps = [f"passage:{b}" for b in range(first, first + len(group))]
+        first += len(group)
+        
+        def questions_task(inputs, group=group, deps=deps, question_count=question_count):
+            shard_results = {'passages': [], 'sentences': []}
+            for batch, dep in zip(group, deps):
+                merge_passage_results(shard_results, [dist for _, dist, _ in batch.members], inputs[dep])
+            if not shard_results['passages'] or question_count <= 0:
+                return None
+            weights = {get_distribution_info(dist): dist.count for batch in group for _, dist, _ in batch.members}
+            shards = plan_question_shards(shard_results['passages'], shard_results['sentences'], question_count,
+                                          weights, estimate_question_base_tokens(request),
+                                          per_distribution=per_distribution)
+            # 샤드가 문제 토큰 예산을 넘으면 나누어 차례로 생성
+            generated = [(shard, f"{shard_number}.{k}")
+                         + generate_shard_questions_checkpointed(shard, request.question_type, checkpoint,
+                                                                 f"{shard_number}.{k}")
+                         for k, shard in enumerate(shards)]
+            return [item for item in generated if item[2]] or None
+        
+        def answers_task(inputs, name=f"questions:{shard_number}"):
+            # 통합 모드에서는 어긋난 문항의 답안만, 분리 모드에서는 모든 답안을 요청
+            results = [complete_shard_answers_checkpointed(shard, questions, answers, checkpoint, shard_name)
+                       for shard, shard_name, questions, answers in inputs[name]]
+            return [result for result in results if result] or None
+        
+        graph.add(f"questions:{shard_number}", questions_task, deps)
+        shard_names.append(graph.add(f"answers:{shard_number}", answers_task, [f"questions:{shard_number}"]))
+    
+    results = graph.run(max_workers, reraise=(JobLeaseError,))
+    
+    passage_results = [None] * total
+    for b, batch in enumerate(batches):
+        for index, passage_data in zip(batch.indices, results[f"passage:{b}"] or []):
+            passage_results[index] = passage_data
+    merge_passage_results(all_results, distributions, passage_results)
+    
+    shard_results = [result for name in shard_names for result in (results[name] or [])]
+    questions_result = merge_question_shards(shard_results, all_results['passages'], all_results['sentences'])
+    if questions_result:
+        all_results.update(questions_result)
+    
+    stats = graph.stats()
+    print(f"\n⏱️ 파이프라인 {stats['wall_time']:.2f}초 (임계 경로 {stats['critical_path_time']:.2f}초, "
+          f"작업 시간 합계 {stats['total_task_time']:.2f}초, 실패 {stats['failed']}개, 건너뜀 {stats['skipped']}개)")
+    return all_results
+
+def merge_passage_results(all_results, distributions, passage_results):
+    """분배별 지문/예문 데이터를 분배 순서대로 all_results에 추가하며 distribution_info 표시"""
+    for dist, passage_data in zip(distributions, passage_results):
+        if not passage_data:
+            continue
+        
+        distribution_info = get_distribution_info(dist)
+        
+        for passage in passage_data.get("passages", []):
+            passage['distribution_info'] = distribution_info
+            all_results['passages'].append(passage)
+        
+        for sentence in passage_data.get("sentences", []):
+            sentence['distribution_info'] = distribution_info
+            all_results['sentences'].append(sentence)
+
+def get_distribution_info(dist: QuestionDistribution):
+    """지문/예문에 붙이는 분배 표시 (카테고리-세부 카테고리-난이도)"""
+    return f"{dist.category}-{dist.subcategory}-{dist.difficulty_level}"
+
+def generate_passage_for_distribution(request: ContentGenerationRequest, dist: QuestionDistribution, db_info,
+                                      on_item=None, params=None, use_cache=True):
+    """
+    단일 분배에 대한 지문 및 예문 생성
+    
+    Args:
+        on_item: 지정하면 스트리밍으로 생성하며 지문/예문이 완성될 때마다 on_item(dist, kind, item) 호출
+        params: 미리 만든 프롬프트 매개변수 (없으면 새로 생성)
+        use_cache: False이면 캐시된 응답을 쓰지 않고 새로 생성
+    
+    Returns:
+        dict: 파싱된 지문/예문 데이터 (실패 시 None)
+    """
+    # 해당 분배에 맞는 프롬프트 매개변수 생성
+    if params is None:
+        params = build_prompt_params_for_distribution(request, dist, db_info)
+    
+    if on_item:
+        return stream_passage_for_distribution(dist, params, on_item, use_cache)
+    
+    # 지문 및 예문 생성 (각 분배마다 별도 생성)
+    passage_result = generate_content_with_prompt("passage", use_cache=use_cache, **params)
+    
+    return parse_llm_response(passage_result, "passage", ("passages",))
+
+def stream_passage_for_distribution(dist: QuestionDistribution, params, on_item, use_cache=True):
+    """
+    지문 및 예문을 스트리밍으로 생성하며, 각 지문/예문 객체가 닫히는 즉시 on_item(dist, kind, item) 호출
+    
+    Returns:
+        dict: 완성된 지문/예문 데이터 (항목을 하나도 받지 못하면 None)
+    """
+    prompt = format_prompt("passage", **params)
+    parser = StreamingItemParser(keys=("passages", "sentences"))
+    passage_data = {"passages": [], "sentences": []}
+    
+    for chunk in generate_response_stream(prompt, prompt_type="passage", use_cache=use_cache):
+        if chunk.startswith("오류 발생"):
+            print(f"❌ {dist.category} > {dist.subcategory} ({dist.difficulty_level}) 스트리밍 중 {chunk}")
+            break
+        for kind, item in parser.feed(chunk):
+            passage_data[kind].append(item)
+            on_item(dist, kind, item)
+    
+    if not passage_data["passages"] and not passage_data["sentences"]:
+        # 점진적 파싱에 실패한 응답은 전체 응답 복구 경로로 한 번 더 시도
+        recovered = parse_llm_response(parser.text, "passage", ("passages",)) if parser.text else None
+        if not recovered:
+            return None
+        for kind in ("passages", "sentences"):
+            for item in recovered.get(kind, []):
+                passage_data[kind].append(item)
+                on_item(dist, kind, item)
+    return passage_data
+
+def generate_passages_concurrently(request: ContentGenerationRequest, distributions, db_info, max_workers=None,
+                                   on_item=None, batch_size=None, token_budget=None, checkpoint=None):
+    """
+    분배별 지문 생성을 스레드 풀에서 동시에 실행
+    
+    batch_size가 2 이상이면 호환되는 분배들을 토큰 예산 안에서 하나의 요청으로 묶어 생성하고,
+    응답의 지문/예문을 원래 분배에 나누어 돌려줍니다. 묶음 응답에서 빠진 분배는 단독으로 다시 생성합니다.
+    한 요청의 실패는 다른 요청에 영향을 주지 않으며, 실패한 분배의 결과는 None이 됩니다.
+    DEDUP이 켜져 있으면 분배들 사이의 유사 중복 지문/예문은 먼저 도착한 것만 남깁니다.
+    
+    Args:
+        max_workers: 동시에 진행할 최대 호출 수 (기본값: MAX_CONCURRENT_PASSAGES)
+        on_item: 스트리밍 콜백 (generate_passage_for_distribution 참고)
+        batch_size: 한 요청에 묶을 최대 분배 수 (기본값: PASSAGE_BATCH_SIZE, 1이면 묶지 않음)
+        token_budget: 묶음 요청 하나의 예상 토큰 상한 (기본값: TOKEN_BUDGET_PASSAGE 환경변수 또는 6000)
+        checkpoint: 지정하면 요청 묶음마다 결과를 저장하고 저장된 묶음은 다시 생성하지 않음
+    
+    Returns:
+        list: distributions와 같은 순서의 지문/예문 데이터 목록
+    """
+    if not distributions:
+        return []
+    
+    max_workers = max(1, max_workers or MAX_CONCURRENT_PASSAGES)
+    total = len(distributions)
+    batches = plan_passage_requests(request, distributions, db_info, batch_size, token_budget)
+    
+    duplicates = DuplicateFilter() if DEDUP_ENABLED else None
+    
+    results = [None] * total
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        futures = [(batch.indices, executor.submit(bind_priority(generate_passages_for_batch_checkpointed), request,
+                                                   batch, db_info, total, on_item, duplicates, checkpoint,
+                                                   f"passage:{b}"))
+                   for b, batch in enumerate(batches)]
+        for indices, future in futures:
+            try:
+                for index, passage_data in zip(indices, future.result()):
+                    results[index] = passage_data
+            except JobLeaseError:
+                raise
+            except Exception as e:
+                print(f"❌ 분배 {', '.join(str(index + 1) for index in indices)} 처리 중 오류: {e}")
+    
+    if duplicates is not None and duplicates.rejected:
+        print(f"♻️ 유사 중복 지문/예문 {duplicates.rejected}개를 제외했습니다.")
+    return results
+
+def generate_passages_for_batch_checkpointed(request, batch, db_info, total, on_item, duplicates, checkpoint, stage):
+    """
+    체크포인트를 남기는 generate_passages_for_batch
+    
+    저장된 결과가 있으면 LLM을 호출하지 않고, 유사 중복 색인에 넣은 뒤 on_item으로 다시 전달합니다.
+    묶음의 모든 분배가 지문을 받은 경우에만 저장합니다 (하나라도 빠지면 다음 실행에서 묶음을 다시 생성).
+    """
+    if checkpoint is None:
+        return generate_passages_for_batch(request, batch, db_info, total, on_item, duplicates)
+    
+    key = [f"{get_distribution_info(dist)}:{dist.count}" for _, dist, _ in batch.members]
+    saved = checkpoint.load(stage, key)
+    if saved is not None:
+        for (_, dist, _), passage_data in zip(batch.members, saved):
+            if duplicates is not None:
+                duplicates.seed(passage_data)
+            if on_item:
+                for kind in ("passages", "sentences"):
+                    for item in passage_data.get(kind, []):
+                        on_item(dist, kind, item)
+        return saved
+    
+    checkpoint.check()
+    results = generate_passages_for_batch(request, batch, db_info, total, on_item, duplicates)
+    if all(results):
+        checkpoint.save(stage, results, key)
+    else:
+        checkpoint.fail(stage)
+    return results
+
+def plan_passage_requests(request: ContentGenerationRequest, distributions, db_info, batch_size=None, token_budget=None):
+    """분배별 프롬프트 매개변수를 만들고 지문 요청 묶음으로 나누기 (batch_size 기본값: PASSAGE_BATCH_SIZE)"""
+    batch_size = batch_size or PASSAGE_BATCH_SIZE
+    params_list = [build_prompt_params_for_distribution(request, dist, db_info) for dist in distributions]
+    batches = plan_passage_batches(distributions, params_list, batch_size, token_budget)
+    if len(batches) < len(distributions):
+        print(f"📦 분배 {len(distributions)}개를 요청 {len(batches)}개로 묶어 생성합니다.")
+    return batches
+
+def generate_passages_for_batch(request: ContentGenerationRequest, batch, db_info, total, on_item=None,
+                                duplicates=None):
+    """
+    지문 요청 묶음 하나 실행 (분배가 하나면 단독 요청)
+    
+    받은 지문/예문은 결과와 on_item 전달 전에 검사하여, 긴 지문은 문장 경계에서 잘라내고(READABILITY_CHECK),
+    난이도 범위를 벗어난 항목(READABILITY_CHECK=reject), 필수 단어가 부족한 지문(VOCAB_CHECK=reject),
+    요청 안의 유사 중복 항목을 제외합니다. 지문이 모두 제외된 분배는 실패로 보고 단독으로 다시 생성합니다.
+    다시 생성될 수 있으므로 on_item에는 분배의 지문이 처음 통과할 때까지 예문 전달을 보류합니다.
+    
+    Args:
+        duplicates: 요청 안의 유사 중복을 거를 DuplicateFilter (없으면 중복 검사 안 함)
+    
+    Returns:
+        list: batch.members와 같은 순서의 지문/예문 데이터 목록 (실패한 분배는 None)
+    """
+    word_lists = {id(dist): params['word_list'] for _, dist, params in batch.members}
+    # id(항목) → (항목, 통과 여부): 스트리밍 중 이미 검사한 항목은 다시 검사하지 않음
+    # (검사가 지문을 잘라내 내용이 바뀌므로 id로 찾되, 항목을 보관하여 버려진 항목의 id가 다시 쓰이지 않게 함)
+    decisions = {}
+    
+    def accept(dist, kind, item, score=None):
+        key = id(item)
+        if key not in decisions:
+            label = f"{dist.category} > {dist.subcategory} ({dist.difficulty_level})"
+            # 길이 검사가 지문을 잘라낼 수 있으므로 필수 단어/중복 검사보다 먼저 실행
+            passed = (item_meets_readability(kind, item, dist.difficulty_level, label, score)
+                      and (kind != "passages" or passage_meets_vocabulary(item, word_lists.get(id(dist)), label)))
+            decisions[key] = (item, passed and (duplicates is None or duplicates.accept(kind, item)))
+        return decisions[key][1]
+    
+    def screen(dist, passage_data):
+        if not passage_data:
+            return passage_data
+        screened = dict(passage_data)
+        for kind in ("passages", "sentences"):
+            items = passage_data.get(kind, [])
+            # 파싱된 응답에서 아직 검사하지 않은 항목은 길이/난이도를 한 번에 측정
+            unchecked = [item for item in items if id(item) not in decisions] if READABILITY_CHECK != 'off' else []
+            scores = {id(item): score for item, score in zip(unchecked, score_items(kind, unchecked))}
+            screened[kind] = [item for item in items if accept(dist, kind, item, scores.get(id(item)))]
+        return screened if screened["passages"] else None
+    
+    held = {}  # id(분배) → 지문이 통과하기 전에 받은 예문 (통과한 지문이 없으면 다시 생성하므로 전달을 보류)
+    
+    if on_item is not None:
+        deliver = on_item
+        
+        def on_item(dist, kind, item):
+            if not accept(dist, kind, item):
+                return
+            pending = held.setdefault(id(dist), [])
+            if pending is None:
+                deliver(dist, kind, item)
+            elif kind == "passages":
+                held[id(dist)] = None
+                for args in pending:
+                    deliver(*args)
+                deliver(dist, kind, item)
+            else:
+                pending.append((dist, kind, item))
+    
+    def run(index, dist, params):
+        print(f"\n📝 [{index+1}/{total}] {dist.category} > {dist.subcategory} ({dist.difficulty_level}) - {dist.count}문항 생성 중...")
+        held.pop(id(dist), None)  # 묶음 응답에서 보류한 예문은 버리고 단독 생성 결과만 전달
+        generated = generate_passage_for_distribution(request, dist, db_info, on_item, params)
+        passage_data = screen(dist, generated)
+        if not passage_data:
+            # 같은 프롬프트는 캐시에서 같은 지문이 나오므로 캐시 없이 한 번 더 생성
+            reason = "지문이 모두 검사에서 제외되어" if generated else "응답을 파싱하지 못해"
+            print(f"♻️ [{index+1}/{total}] {reason} 다시 생성합니다.")
+            held.pop(id(dist), None)
+            passage_data = screen(dist, generate_passage_for_distribution(request, dist, db_info, on_item, params,
+                                                                          use_cache=False))
+        if passage_data:
+            print(f"✅ [{index+1}/{total}] 지문 {len(passage_data.get('passages', []))}개, 예문 {len(passage_data.get('sentences', []))}개 생성 완료")
+        return passage_data
+    
+    if len(batch) == 1:
+        return [run(*batch.members[0])]
+    
+    numbers = ", ".join(str(index + 1) for index in batch.indices)
+    print(f"\n📦 분배 {numbers} (총 {total}개 중) 묶음 생성 중... (예상 {batch.estimated_tokens} 토큰)")
+    batch_results = [screen(dist, passage_data)
+                     for (_, dist, _), passage_data in zip(batch.members, generate_passage_batch(batch, on_item))]
+    for slot, member in enumerate(batch.members):
+        if batch_results[slot] is None:
+            # 묶음 응답에서 빠진 분배만 단독으로 다시 생성
+            batch_results[slot] = run(*member)
+    return batch_results
+
+def generate_passage_batch(batch, on_item=None):
+    """
+    여러 분배의 지문 및 예문을 하나의 요청으로 생성하여 분배별로 분리
+    
+    Args:
+        batch: plan_passage_batches가 만든 묶음
+        on_item: 지정하면 스트리밍으로 생성하며 지문/예문이 완성될 때마다 on_item(dist, kind, item) 호출
+    
+    Returns:
+        list: batch.members와 같은 순서의 지문/예문 데이터 목록 (지문을 받지 못한 분배는 None)
+    """
+    prompt = batch.format_prompt()
+    
+    if not on_item:
+        response = generate_response(prompt, prompt_type="passage_batch")
+        return batch.split_response(parse_llm_response(response, "passage_batch", ("passages",)))
+    
+    parser = StreamingItemParser(keys=("passages", "sentences"))
+    results = [{"passages": [], "sentences": []} for _ in batch.members]
+    received = False
+    
+    for chunk in generate_response_stream(prompt, prompt_type="passage_batch"):
+        if chunk.startswith("오류 발생"):
+            print(f"❌ 묶음 스트리밍 중 {chunk}")
+            break
+        for kind, item in parser.feed(chunk):
+            received = True
+            slot = batch.slot_of(item)
+            if slot is not None:
+                results[slot][kind].append(item)
+                on_item(batch.members[slot][1], kind, item)
+    
+    if not received and parser.text:
+        # 점진적 파싱에 실패한 응답은 전체 응답 복구 경로로 한 번 더 시도
+        recovered = batch.split_response(parse_llm_response(parser.text, "passage_batch", ("passages",)))
+        for slot, passage_data in enumerate(recovered):
+            for kind in ("passages", "sentences"):
+                for item in (passage_data or {}).get(kind, []):
+                    results[slot][kind].append(item)
+                    on_item(batch.members[slot][1], kind, item)
+    
+    return [result if result["passages"] else None for result in results]
+
 def build_prompt_params_for_distribution(request: ContentGenerationRequest, dist: QuestionDistribution, db_info):
     """특정 분배를 위한 프롬프트 매개변수 생성"""
+    # 교육과정 문서에서 분배와 관련된 조각을 찾아 소재로 사용
+    snippets = retrieve_for_distribution(dist)
+    topic = " / ".join(snippets) if snippets else f"{dist.category} 관련 주제"
+    
     params = {
         "level": f"중학교 {request.grade}학년",
         "passage_count": "1",  # 분배별로 1개씩
-        "passage_length": "80" if dist.difficulty_level == "하" else "100" if dist.difficulty_level == "중" else "120",
+        "passage_length": str(PASSAGE_LENGTH.get(dist.difficulty_level, PASSAGE_LENGTH["상"])),
         "sentence_count": "2",
-        "sentence_length": "10" if dist.difficulty_level == "하" else "12" if dist.difficulty_level == "중" else "15",
+        "sentence_length": str(SENTENCE_LENGTH.get(dist.difficulty_level, SENTENCE_LENGTH["상"])),
         "word_list": ", ".join(db_info['word_list'][:10]) if db_info['word_list'] else "student, study, school",
-        "topic": f"{dist.category} 관련 주제",
+        "topic": topic,
         "grammar_point": dist.subcategory if dist.category == "문법" else "기본 문법",
         "reading_type": dist.subcategory if dist.category == "독해" else "내용 이해"
     }
     
     return params
 
-def generate_integrated_questions(request: ContentGenerationRequest, content_results, db_info):
-    """통합된 문제 및 답안 생성"""
-    # 모든 지문과 예문을 하나의 텍스트로 통합
+def generate_integrated_questions(request: ContentGenerationRequest, content_results, db_info, max_workers=None,
+                                  checkpoint=None, per_distribution=False):
+    """
+    통합된 문제 및 답안 생성
+    
+    모든 지문을 한 요청에 넣으면 문제 생성 토큰 예산(TOKEN_BUDGET_QUESTION)을 넘는 경우,
+    지문을 분배 단위 샤드로 나누어 동시에 생성하고 문제 번호를 전체 기준으로 다시 매겨 합칩니다.
+    
+    Args:
+        max_workers: 동시에 진행할 최대 샤드 수 (기본값: MAX_CONCURRENT_PASSAGES)
+        checkpoint: 지정하면 샤드마다 문제와 답안을 저장하고 저장된 샤드는 다시 생성하지 않음
+        per_distribution: True이면 토큰 예산과 관계없이 분배마다 샤드 하나로 생성
+    """
+    weights = {get_distribution_info(dist): dist.count for dist in content_results.get('distributions') or []}
+    shards = plan_question_shards(content_results['passages'], content_results['sentences'],
+                                  request.total_questions, weights, estimate_question_base_tokens(request),
+                                  per_distribution=per_distribution)
+    if not shards:
+        return {}
+    
+    passages, sentences = content_results['passages'], content_results['sentences']
+    if len(shards) == 1:
+        return merge_question_shards([generate_question_shard(request, shards[0], checkpoint)], passages, sentences)
+    
+    reason = "분배별로" if per_distribution else "토큰 예산 초과로"
+    print(f"✂️ {reason} 문제 생성을 {len(shards)}개 샤드로 나누어 진행합니다. "
+          f"(샤드별 문항 수: {[shard.question_count for shard in shards]})")
+    max_workers = max(1, max_workers or MAX_CONCURRENT_PASSAGES)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+        futures = [executor.submit(bind_priority(generate_question_shard), request, shard, checkpoint, str(s))
+                   for s, shard in enumerate(shards)]
+        shard_results = []
+        for i, future in enumerate(futures):
+            try:
+                shard_results.append(future.result())
+            except JobLeaseError:
+                raise
+            except Exception as e:
+                print(f"❌ 문제 샤드 {i+1} 처리 중 오류: {e}")
+                shard_results.append(None)
+    
+    failed = sum(1 for result in shard_results if not result)
+    if failed:
+        print(f"⚠️ 문제 샤드 {len(shards)}개 중 {failed}개 생성 실패")
+    return merge_question_shards(shard_results, passages, sentences)
+
+def generate_question_shard(request: ContentGenerationRequest, shard, checkpoint=None, name="0"):
+    """
+    샤드 하나의 지문/예문으로 문제와 답안 생성
+    
+    Args:
+        checkpoint: 지정하면 문제(questions:{name})와 답안(answers:{name}) 단계 결과를 저장
+    
+    Returns:
+        dict: {'questions', 'answers'} (실패 시 None)
+    """
+    questions, answers = generate_shard_questions_checkpointed(shard, request.question_type, checkpoint, name)
+    if not questions:
+        return None
+    
+    return complete_shard_answers_checkpointed(shard, questions, answers, checkpoint, name)
+
+def shard_sources(shard):
+    """샤드에 들어간 분배 목록 (샤드 구성이 바뀌면 저장된 문제/답안을 쓰지 않도록 체크포인트 key로 사용)"""
+    return sorted({item.get('distribution_info') or "" for item in shard.passages + shard.sentences})
+
+def generate_shard_questions_checkpointed(shard, question_type, checkpoint, name):
+    """체크포인트를 남기는 generate_shard_questions (문제 단계 이름: questions:{name})"""
+    def produce():
+        questions, answers = generate_shard_questions(shard, question_type)
+        return [questions, answers] if questions else None
+    
+    generated = checkpointed(checkpoint, f"questions:{name}", shard_sources(shard), produce)
+    return tuple(generated) if generated else (None, None)
+
+def complete_shard_answers_checkpointed(shard, questions, answers, checkpoint, name):
+    """
+    체크포인트를 남기는 complete_shard_answers (답안 단계 이름: answers:{name})
+    
+    샤드가 분배 하나의 지문/예문만 담고 있으면 문제에 그 분배의 distribution_info를 표시합니다 (문항 은행 저장용).
+    결과에는 문제 source의 번호를 전체 기준으로 옮길 수 있도록 샤드의 지문/예문 목록을 함께 담습니다.
+    """
+    sources = shard_sources(shard)
+    result = checkpointed(checkpoint, f"answers:{name}", sources,
+                          lambda: complete_shard_answers(shard, questions, answers))
+    if not result:
+        return result
+    if len(sources) == 1 and sources[0]:
+        for question in result['questions']:
+            question['distribution_info'] = sources[0]
+    return dict(result, passages=shard.passages, sentences=shard.sentences)
+
+def format_shard_texts(shard):
+    """샤드의 지문/예문을 프롬프트에 넣을 텍스트로 변환"""
     passages_text = "\n\n".join([f"지문 {i+1}: {p['title']}\n{p['content']}" 
-                                for i, p in enumerate(content_results['passages'])])
+                                for i, p in enumerate(shard.passages)])
     sentences_text = "\n".join([f"예문 {i+1}: {s['english']}" 
-                               for i, s in enumerate(content_results['sentences'])])
+                               for i, s in enumerate(shard.sentences)])
+    return passages_text, sentences_text
+
+def estimate_question_base_tokens(request: ContentGenerationRequest):
+    """지문/예문을 제외한 문제 생성 프롬프트의 토큰 수"""
+    return estimate_tokens(format_prompt(
+        "question", passages="", sentences="", question_count=request.total_questions,
+        question_type=request.question_type, learning_objective="다양한 카테고리의 종합적 이해 평가"
+    ))
+
+def generate_shard_questions(shard, question_type, learning_objective="다양한 카테고리의 종합적 이해 평가",
+                             combined=None):
+    """
+    샤드 하나의 지문/예문으로 문제 생성
+    
+    통합 모드에서는 문제와 정답/해설을 한 번의 요청으로 생성하며, 문제 id를 1부터 다시 매긴 뒤
+    문제별 answer 필드를 답안 목록으로 분리합니다.
+    
+    Args:
+        combined: True이면 문제와 답안을 함께 생성 (기본값: COMBINED_ANSWERS)
+    
+    Returns:
+        tuple: (문제 목록, 답안 목록) - 분리 모드의 답안은 None, 실패 시 (None, None)
+    """
+    combined = COMBINED_ANSWERS if combined is None else combined
+    prompt_type = "question_answer" if combined else "question"
+    passages_text, sentences_text = format_shard_texts(shard)
     
     question_params = {
         "passages": passages_text,
         "sentences": sentences_text,
-        "question_count": str(request.total_questions),
-        "question_type": request.question_type,
-        "learning_objective": f"다양한 카테고리의 종합적 이해 평가"
+        "question_count": str(shard.question_count),
+        "question_type": question_type,
+        "learning_objective": learning_objective
     }
     
     try:
-        # 문제 생성
-        question_response = generate_content_with_prompt("question", **question_params)
+        question_response = generate_content_with_prompt(prompt_type, **question_params)
         
-        if question_response and "오류 발생" not in question_response:
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', question_response, re.DOTALL)
-            if json_match:
-                question_data = json.loads(json_match.group(1))
-                questions = question_data.get("questions", [])
-                
-                if questions:
-                    # 답안 생성
-                    questions_text = ""
-                    for q in questions:
-                        questions_text += f"문제 {q['id']}: {q['question']}\n"
-                        if 'modified_passage' in q and q['modified_passage']:
-                            questions_text += f"변형된 지문: {q['modified_passage']}\n"
-                        questions_text += "\n".join(q['choices']) + "\n\n"
-                    
-                    answer_params = {
-                        "passages": passages_text,
-                        "sentences": sentences_text,
-                        "questions": questions_text
-                    }
-                    
-                    answer_response = generate_content_with_prompt("answer", **answer_params)
-                    
-                    if answer_response and "오류 발생" not in answer_response:
-                        json_match = re.search(r'```json\s*(\{.*?\})\s*```', answer_response, re.DOTALL)
-                        if json_match:
-                            answer_data = json.loads(json_match.group(1))
-                            answers = answer_data.get("answers", [])
-                            
-                            return {
-                                'questions': questions,
-                                'answers': answers
-                            }
-    
+        question_data = parse_llm_response(question_response, prompt_type, ("questions",))
+        questions = question_data.get("questions") if question_data else None
+        if not questions:
+            return None, None
+        if not combined:
+            return questions, None
+        
+        for i, question in enumerate(questions):
+            question['id'] = i + 1
+        return questions, split_combined_answers(questions)
     except Exception as e:
         print(f"❌ 통합 문제 생성 중 오류: {e}")
     
-    return {}
+    return None, None
+
+def complete_shard_answers(shard, questions, answers=None):
+    """
+    문제와 답안을 대조하여 빠지거나 어긋난 답안만 다시 요청
+    
+    answers가 None이면(분리 모드) 모든 문제의 답안을 요청합니다.
+    다시 요청해도 올바른 답안을 얻지 못한 문제는 결과에서 제외합니다.
+    
+    Returns:
+        dict: {'questions', 'answers'} (남은 문제가 없으면 None)
+    """
+    if answers is None:
+        answers = generate_shard_answers(shard, questions)
+        if answers is None:
+            return None
+    
+    valid, mismatched = find_answer_mismatches(questions, answers)
+    if mismatched:
+        print(f"🔁 정답이 빠지거나 어긋난 {len(mismatched)}문항의 답안만 다시 요청합니다.")
+        retried = generate_shard_answers(shard, mismatched) or []
+        retried_valid, still_mismatched = find_answer_mismatches(mismatched, retried)
+        valid.update(retried_valid)
+        if still_mismatched:
+            print(f"⚠️ 올바른 답안을 얻지 못한 {len(still_mismatched)}문항을 제외합니다.")
+    
+    questions = [q for q in questions if str(q.get('id')) in valid]
+    if not questions:
+        return None
+    for q in questions:
+        valid[str(q.get('id'))]['question_id'] = q.get('id')
+    
+    return {
+        'questions': questions,
+        'answers': [valid[str(q.get('id'))] for q in questions]
+    }
+
+def generate_shard_answers(shard, questions):
+    """
+    샤드 하나의 문제에 대한 답안 생성
+    
+    답안 생성 프롬프트가 답안 토큰 예산(TOKEN_BUDGET_ANSWER)을 넘으면 문제를 나누어 요청합니다.
+    
+    Returns:
+        list: 답안 목록 (실패 시 None)
+    """
+    passages_text, sentences_text = format_shard_texts(shard)
+    
+    def format_question(q):
+        text = f"문제 {q['id']}: {q['question']}\n"
+        if 'modified_passage' in q and q['modified_passage']:
+            text += f"변형된 지문: {q['modified_passage']}\n"
+        return text + "\n".join(q['choices']) + "\n\n"
+    
+    try:
+        base_tokens = estimate_tokens(format_prompt("answer", passages=passages_text,
+                                                    sentences=sentences_text, questions=""))
+        question_groups = split_by_budget(
+            questions, lambda q: estimate_tokens(format_question(q)) + OUTPUT_TOKENS_PER_ANSWER,
+            get_stage_budget("answer"), base_tokens
+        )
+        
+        answers = []
+        for group in question_groups:
+            answer_params = {
+                "passages": passages_text,
+                "sentences": sentences_text,
+                "questions": "".join(format_question(q) for q in group)
+            }
+            
+            answer_response = generate_content_with_prompt("answer", **answer_params)
+            answer_data = parse_llm_response(answer_response, "answer", ("answers",))
+            if not answer_data:
+                return None
+            answers.extend(answer_data.get("answers", []))
+        return answers
+    except Exception as e:
+        print(f"❌ 답안 생성 중 오류: {e}")
+    
+    return None
+
+def merge_question_shards(shard_results, passages=None, sentences=None):
+    """
+    샤드별 문제/답안을 하나로 합치며 문제 id를 1부터 전체 기준으로 다시 매김
+    
+    답안의 question_id도 같은 샤드의 새 id로 바꾸며, 대응하는 문제가 없는 답안은 버립니다.
+    passages/sentences(합친 결과의 지문/예문 목록)를 주면, 샤드 결과의 'passages'/'sentences' 안에서 매긴
+    문제 source의 "지문 n"/"예문 n" 번호를 합친 목록의 번호로 바꿉니다.
+    """
+    merged = {'questions': [], 'answers': []}
+    for result in shard_results:
+        if not result:
+            continue
+        
+        if passages is not None and 'passages' in result:
+            passage_numbers = number_map(result['passages'], passages)
+            sentence_numbers = number_map(result.get('sentences') or [], sentences or [])
+            for question in result['questions']:
+                renumber_source(question, passage_numbers, sentence_numbers)
+        
+        id_map = {}
+        for question in result['questions']:
+            new_id = len(merged['questions']) + 1
+            id_map[str(question.get('id'))] = new_id
+            question['id'] = new_id
+            merged['questions'].append(question)
+        
+        for answer in result['answers']:
+            new_id = id_map.get(str(answer.get('question_id')))
+            if new_id is not None:
+                answer['question_id'] = new_id
+                merged['answers'].append(answer)
+    
+    return merged if merged['questions'] else {}
 
 def build_prompt_params(grade, categories, difficulty, db_info):
     """프롬프트 매개변수를 구성합니다."""
@@ -591,59 +1478,34 @@ def generate_learning_content(params):
     try:
         # 1. 지문 및 예문 생성
         print("\n========== 지문 및 예문 생성 중 ==========")
-        passage_response = generate_content_with_prompt("passage", **params)
+        # params에는 문제 개수 등 지문 프롬프트에 없는 값도 들어 있으므로 지문 필드만 전달
+        passage_params = {key: value for key, value in params.items() if key in prompt_fields("passage")}
+        passage_response = generate_content_with_prompt("passage", **passage_params)
         
-        if passage_response and "오류 발생" not in passage_response:
-            # JSON 파싱
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', passage_response, re.DOTALL)
-            if json_match:
-                passage_data = json.loads(json_match.group(1))
-                result['passages'] = passage_data.get("passages", [])
-                result['sentences'] = passage_data.get("sentences", [])
-                
-                # 2. 문제 생성
-                print("========== 문제 생성 중 ==========")
-                passages_text = "\n\n".join([f"지문 {i+1}: {p['title']}\n{p['content']}" 
-                                           for i, p in enumerate(result['passages'])])
-                sentences_text = "\n".join([f"예문 {i+1}: {s['english']}" 
-                                          for i, s in enumerate(result['sentences'])])
-                
-                question_params = {
-                    "passages": passages_text,
-                    "sentences": sentences_text,
-                    "question_count": params.get("question_count", "3"),
-                    "question_type": "객관식 4지선다",
-                    "learning_objective": f"{params.get('reading_type', '독해')} 및 {params.get('grammar_point', '문법')} 이해 평가"
-                }
-                
-                question_response = generate_content_with_prompt("question", **question_params)
+        passage_data = parse_llm_response(passage_response, "passage", ("passages",))
+        
+        if passage_data:
+            result['passages'] = passage_data.get("passages", [])
+            result['sentences'] = passage_data.get("sentences", [])
+            
+            # 2. 문제 생성 (통합 모드에서는 정답/해설도 함께 생성)
+            print("========== 문제 생성 중 ==========")
+            shard = QuestionShard()
+            shard.passages = result['passages']
+            shard.sentences = result['sentences']
+            shard.question_count = int(params.get("question_count", 3))
+            learning_objective = f"{params.get('reading_type', '독해')} 및 {params.get('grammar_point', '문법')} 이해 평가"
+            
+            questions, answers = generate_shard_questions(shard, "객관식 4지선다", learning_objective)
+            
+            if questions:
+                result['questions'] = questions
                 
-                if question_response and "오류 발생" not in question_response:
-                    json_match = re.search(r'```json\s*(\{.*?\})\s*```', question_response, re.DOTALL)
-                    if json_match:
-                        question_data = json.loads(json_match.group(1))
-                        result['questions'] = question_data.get("questions", [])
-                        
-                        # 3. 답안 생성
-                        print("========== 답안 생성 중 ==========")
-                        questions_text = ""
-                        for q in result['questions']:
-                            questions_text += f"문제 {q['id']}: {q['question']}\n"
-                            questions_text += "\n".join(q['choices']) + "\n\n"
-                        
-                        answer_params = {
-                            "passages": passages_text,
-                            "sentences": sentences_text,
-                            "questions": questions_text
-                        }
-                        
-                        answer_response = generate_content_with_prompt("answer", **answer_params)
-                        
-                        if answer_response and "오류 발생" not in answer_response:
-                            json_match = re.search(r'```json\s*(\{.*?\})\s*```', answer_response, re.DOTALL)
-                            if json_match:
-                                answer_data = json.loads(json_match.group(1))
-                                result['answers'] = answer_data.get("answers", [])
+                # 3. 답안 생성 (통합 모드에서는 어긋난 문항만 다시 요청)
+                print("========== 답안 확인 중 ==========")
+                shard_result = complete_shard_answers(shard, questions, answers)
+                if shard_result:
+                    result.update(shard_result)
         
         print("========== 콘텐츠 생성 완료 ==========")
         return result
@@ -678,20 +1540,14 @@ def run_test_scenario():
         return
 
     try:
-        # 응답 문자열에서 JSON 부분만 추출
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', passage_response_str, re.DOTALL)
-        if json_match:
-            passage_json_str = json_match.group(1)
-        else:
-            # 마크다운 코드 블록이 없는 경우 전체를 JSON으로 시도
-            passage_json_str = passage_response_str.strip()
-        
-        passage_data = json.loads(passage_json_str)
+        passage_data = parse_llm_response(passage_response_str, "passage", ("passages", "sentences"))
+        if not passage_data:
+            raise ValueError("JSON 응답을 해석할 수 없습니다.")
         passages = passage_data.get("passages", [])
         sentences = passage_data.get("sentences", [])
         if not passages or not sentences:
             raise ValueError("JSON 응답에서 'passages' 또는 'sentences'를 찾을 수 없습니다.")
-    except (json.JSONDecodeError, ValueError) as e:
+    except ValueError as e:
         print(f"\n[오류] 지문 응답 JSON 파싱 오류: {e}")
         print("파싱에 실패하여 테스트를 종료합니다.")
         return
@@ -722,19 +1578,13 @@ def run_test_scenario():
         return
 
     try:
-        # 응답 문자열에서 JSON 부분만 추출
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', question_response_str, re.DOTALL)
-        if json_match:
-            question_json_str = json_match.group(1)
-        else:
-            # 마크다운 코드 블록이 없는 경우 전체를 JSON으로 시도
-            question_json_str = question_response_str.strip()
-        
-        question_data = json.loads(question_json_str)
+        question_data = parse_llm_response(question_response_str, "question", ("questions",))
+        if not question_data:
+            raise ValueError("JSON 응답을 해석할 수 없습니다.")
         questions = question_data.get("questions", [])
         if not questions:
              raise ValueError("JSON 응답에서 'questions'를 찾을 수 없습니다.")
-    except (json.JSONDecodeError, ValueError) as e:
+    except ValueError as e:
         print(f"\n[오류] 문제 응답 JSON 파싱 오류: {e}")
         return
     except Exception as e:
@@ -813,9 +1663,8 @@ def test_scenario_3_detailed():
     
     # JSON 파싱
     try:
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', passage_response, re.DOTALL)
-        if json_match:
-            passage_data = json.loads(json_match.group(1))
+        passage_data = parse_llm_response(passage_response, "passage", ("passages",))
+        if passage_data:
             passages = passage_data.get("passages", [])
             sentences = passage_data.get("sentences", [])
             
@@ -862,9 +1711,8 @@ def test_scenario_3_detailed():
     
     # 문제 JSON 파싱
     try:
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', question_response, re.DOTALL)
-        if json_match:
-            question_data = json.loads(json_match.group(1))
+        question_data = parse_llm_response(question_response, "question", ("questions",))
+        if question_data:
             questions = question_data.get("questions", [])
             
             print(f"✅ 문제 생성 성공: {len(questions)}개")
@@ -921,9 +1769,8 @@ def test_scenario_3_detailed():
     
     if answer_response and "오류 발생" not in answer_response:
         try:
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', answer_response, re.DOTALL)
-            if json_match:
-                answer_data = json.loads(json_match.group(1))
+            answer_data = parse_llm_response(answer_response, "answer", ("answers",))
+            if answer_data:
                 answers = answer_data.get("answers", [])
                 
                 print(f"✅ 답안 생성 성공: {len(answers)}개")
@@ -1025,10 +1872,77 @@ def test_new_structure():
     
     print("\n========== 새로운 입력 구조 테스트 완료 ==========")
 
+def run_offline_benchmark(runs=3, max_workers=None):
+    """
+    가짜 백엔드로 전체 생성 파이프라인의 처리 시간을 측정 (API/DB 불필요)
+    
+    LLM_BACKEND=fake 로 실행해야 하며, 캐시 적중을 피하려면 LLM_CACHE_DISABLED=1 도 설정하세요.
+    """
+    print("========== 오프라인 파이프라인 벤치마크 시작 ==========")
+    print(f"백엔드: {backend.model_name}")
+    
+    request = ContentGenerationRequest(
+        grade=2,
+        categories=[
+            {"name": "독해", "subcategories": ["주제/제목 추론", "세부사항 파악"], "ratio": 50},
+            {"name": "문법", "subcategories": ["현재완료시제", "관계대명사"], "ratio": 30},
+            {"name": "어휘", "subcategories": ["문맥상 적절한 어휘"], "ratio": 20}
+        ],
+        question_type="객관식",
+        difficulty="분배",
+        total_questions=10,
+        difficulty_distribution={"high": 20, "medium": 60, "low": 20}
+    )
+    distributions = calculate_question_distribution(request)
+    db_info = {
+        'grammar_points': [],
+        'reading_types': [],
+        'vocabulary_info': [],
+        'word_list': ["student", "study", "school", "teacher", "future", "dream", "important", "help"]
+    }
+    
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        result = generate_content_by_distribution(None, request, distributions, db_info, max_workers=max_workers)
+        timings.append(time.perf_counter() - start)
+        print(f"  실행 {run+1}: {timings[-1]:.3f}초 (지문 {len(result['passages'])}개, 문제 {len(result['questions'])}개)")
+    
+    stats = backend.stats()
+    print(f"\n📈 평균 {sum(timings) / len(timings):.3f}초, 최소 {min(timings):.3f}초, 최대 {max(timings):.3f}초")
+    print(f"   LLM 호출 {stats['calls']}회 (오류 {stats['errors']}회, 평균 지연 {stats['avg_latency']:.3f}초)")
+    for route, route_stats in stats.get('routes', {}).items():
+        print(f"   경로 {route}: {route_stats['calls']}회 (오류 {route_stats['errors']}회, "
+              f"SLO {route_stats['slo']:.0f}초 초과 {route_stats['slo_violations']}회, p95 {route_stats['p95']}초, "
+              f"브레이커 {route_stats['breaker']})")
+    for model, limiter_stats in (get_rate_limiter_stats() or {}).items():
+        print(f"   호출 조절 {model}: 동시 호출 창 {limiter_stats['window']}, 한도 초과 {limiter_stats['throttles']}회, "
+              f"대기 {limiter_stats['total_wait']:.3f}초")
+    retry_stats = get_retry_stats()
+    if retry_stats:
+        for prompt_type, counter in retry_stats['by_type'].items():
+            print(f"   {prompt_type}: p50 {counter['p50']}초, p99 {counter['p99']}초, "
+                  f"재시도 {counter.get('retries', 0)}회, 헤지 {counter.get('hedges', 0)}회 "
+                  f"(응답: 첫 요청 {counter.get('won_primary', 0)}, 헤지 {counter.get('won_hedge', 0)}, "
+                  f"재시도 {counter.get('won_retry', 0)}), 실패 {counter.get('failures', 0)}회")
+    prompt_stats = get_prompt_metrics()
+    prompt_bytes = sum(metrics['prompt_bytes'] for metrics in prompt_stats.values())
+    prefix_bytes = sum(metrics['prefix_bytes'] for metrics in prompt_stats.values())
+    if prompt_bytes:
+        print(f"   프롬프트 {prompt_bytes}바이트 중 고정 앞부분 {prefix_bytes}바이트 "
+              f"({prefix_bytes / prompt_bytes:.0%}, 컨텍스트 캐시 {stats.get('context_cache_hits', 0)}회 사용)")
+    parse_stats = get_parse_metrics()['by_path']
+    print("   응답 파싱 경로: " + ", ".join(f"{path} {count}회" for path, count in parse_stats.items()))
+    print("========== 오프라인 파이프라인 벤치마크 완료 ==========")
+    return timings
+
 # 테스트
 if __name__ == "__main__":
+    if os.getenv('LLM_BACKEND') == 'fake':
+        print("가짜 백엔드로 오프라인 벤치마크를 실행합니다.")
+        run_offline_benchmark()
     # API 키가 설정되었는지 확인
-    if not os.getenv('GEMINI_API_KEY'):
+    elif not os.getenv('GEMINI_API_KEY'):
         print("GEMINI_API_KEY 환경변수를 설정해주세요.")
     else:
         print("새로운 입력 구조를 테스트합니다.")
@@ -0,0 +1,328 @@
+"""
+프롬프트 유형(단계)별로 모델을 골라 호출하는 파일
+
+모든 단계가 gemini-2.5-pro를 쓰면 정답 정리나 JSON 수정 같은 단순한 단계도 가장 느린 모델을 기다립니다.
+ModelRouter는 LLMBackend처럼 동작하면서 프롬프트 유형마다
+- 기본 모델과 대체 모델 목록 (ROUTES, MODEL_ROUTE_<유형>="모델1,모델2"로 변경)
+- 지연 시간 목표(SLO, MODEL_SLO_<유형>초)
+를 두고, (유형, 모델) 경로마다 서킷 브레이커를 운영합니다. 최근 호출 중 오류나 SLO 초과 비율이
+기준을 넘으면 브레이커가 열려 BREAKER_COOLDOWN초 동안 다음 모델로 넘기고, 그 뒤 한 번 시험 호출하여
+성공하면 다시 기본 모델을 사용합니다. 호출이 실패하면 같은 요청을 다음 모델로 바로 다시 보내며,
+이 대체 호출도 재시도이므로 failover_budget(retry_policy.RetryBudget)이 있으면 그 예산에서 차감하고
+예산이 없으면 마지막 오류를 그대로 올립니다.
+응답은 실제로 응답한 모델과 대체 모델 여부를 담은 RoutedText로 반환하며, 응답 캐시는 대체 모델의 응답을
+저장하지 않습니다 (main.generate_response 참고).
+
+- MODEL_ROUTING: 1이면 사용 (기본값 1, 0이면 모든 단계에 MODEL_NAME 사용)
+- BREAKER_WINDOW / BREAKER_MIN_CALLS: 판단에 쓰는 최근 호출 수 (기본값 20) / 최소 호출 수 (기본값 5)
+- BREAKER_ERROR_RATE / BREAKER_SLOW_RATE: 브레이커를 여는 오류 비율 / SLO 초과 비율 (기본값 0.5 / 0.5)
+- BREAKER_COOLDOWN: 브레이커가 열린 뒤 시험 호출까지 기다리는 시간 (초, 기본값 30)
+"""
+import collections
+import os
+import threading
+import time
+
+import numpy as np
+
+from llm_backends import LLMBackend
+
+MODEL_ROUTING_ENABLED = os.getenv('MODEL_ROUTING', '1') == '1'
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 20))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 5))
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))
+BREAKER_SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', 0.5))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', 30))
+
+# 프롬프트 유형별 (모델 목록(기본 모델 먼저), 지연 시간 목표(초))
+ROUTES = {
+    "passage": (["gemini-2.5-pro", "gemini-2.5-flash"], 60),
+    "passage_batch": (["gemini-2.5-pro", "gemini-2.5-flash"], 120),
+    "question": (["gemini-2.5-pro", "gemini-2.5-flash"], 120),
+    "question_answer": (["gemini-2.5-pro", "gemini-2.5-flash"], 150),
+    "answer": (["gemini-2.5-flash", "gemini-2.5-flash-lite"], 40),
+    "json_repair": (["gemini-2.5-flash-lite", "gemini-2.5-flash"], 15),
+}
+
+
+def get_route(prompt_type, default_model):
+    """
+    프롬프트 유형의 모델 목록과 SLO (환경변수 MODEL_ROUTE_<유형>, MODEL_SLO_<유형>으로 변경 가능)
+
+    Returns:
+        tuple: (모델 이름 목록, SLO 초)
+    """
+    models, slo = ROUTES.get(prompt_type, ([default_model], 120))
+    suffix = (prompt_type or "").upper()
+    env_models = os.getenv(f"MODEL_ROUTE_{suffix}")
+    if env_models:
+        models = [model.strip() for model in env_models.split(",") if model.strip()]
+    env_slo = os.getenv(f"MODEL_SLO_{suffix}")
+    return list(models), float(env_slo) if env_slo else slo
+
+
+class RoutedText(str):
+    """라우터의 응답 텍스트 (또는 스트리밍 조각)와 실제로 응답한 모델"""
+
+    def __new__(cls, text, model, fallback):
+        routed = super().__new__(cls, text)
+        routed.model = model
+        routed.fallback = fallback  # 경로의 기본 모델이 아닌 대체 모델의 응답인지
+        return routed
+
+
+class CircuitBreaker:
+    """
+    경로 하나의 서킷 브레이커 (closed → open → half_open → closed)
+
+    시험 호출이 결과를 남기지 못하면(끝나지 않는 호출, 재시도/헤지에서 버려진 시도) 브레이커가 half_open에
+    머무르므로, 시험 호출이 SLO 안에 기록되지 않으면 실패로 보고 다시 엽니다 (SLO를 넘은 시험 호출은 어차피 실패).
+    소비자가 중간에 닫은 스트림처럼 결과 없이 끝난 호출은 abandon()으로 시험 호출 자리를 돌려줍니다.
+    """
+
+    def __init__(self, slo, window=None, min_calls=None, error_rate=None, slow_rate=None, cooldown=None):
+        self.slo = slo
+        self.min_calls = BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.error_rate = BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.slow_rate = BREAKER_SLOW_RATE if slow_rate is None else slow_rate
+        self.cooldown = BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.state = "closed"
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._outcomes = collections.deque(maxlen=window or BREAKER_WINDOW)  # (실패 여부, 지연 시간)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """지금 이 경로로 호출해도 되는지 (열린 뒤 cooldown이 지나면 시험 호출 하나만 허용)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "half_open" and self._probing and now - self._probe_started > self.slo:
+                self._probing = False
+                self._open()
+            if self.state == "open" and now - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    def abandon(self):
+        """결과 없이 끝난 호출 (진행 중인 시험 호출이면 다음 호출이 다시 시험하도록 자리를 돌려줌)"""
+        with self._lock:
+            if self.state == "half_open" and self._probing:
+                self._probing = False
+
+    def record(self, failed, latency):
+        with self._lock:
+            slow = latency > self.slo
+            if self.state == "half_open" and self._probing:
+                self._probing = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append((failed, latency))
+            if self.state != "closed" or len(self._outcomes) < self.min_calls:
+                return
+            errors = sum(1 for f, _ in self._outcomes if f)
+            slows = sum(1 for f, l in self._outcomes if not f and l > self.slo)
+            if errors >= self.error_rate * len(self._outcomes) or slows >= self.slow_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class RouteStats:
+    """경로별 호출 수, 오류 수, SLO 초과 수, 최근 지연 시간"""
+
+    def __init__(self, window=500):
+        self.calls = 0
+        self.errors = 0
+        self.slo_violations = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def record(self, failed, latency, slo):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        else:
+            self.latencies.append(latency)
+            if latency > slo:
+                self.slo_violations += 1
+
+    def snapshot(self):
+        latencies = np.asarray(self.latencies) if self.latencies else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "slo_violations": self.slo_violations,
+            "p50": round(float(np.percentile(latencies, 50)), 3) if latencies is not None else None,
+            "p95": round(float(np.percentile(latencies, 95)), 3) if latencies is not None else None,
+        }
+
+
+class ModelRouter(LLMBackend):
+    """프롬프트 유형별 모델 경로와 서킷 브레이커로 호출을 나누는 백엔드"""
+    model_name = "router"
+
+    def __init__(self, backend_factory, default_model="gemini-2.5-pro", failover_budget=None):
+        """
+        Args:
+            backend_factory: 모델 이름 → LLMBackend 함수 (모델마다 한 번만 호출)
+            default_model: ROUTES에 없는 프롬프트 유형에 쓸 모델
+            failover_budget: 실패 뒤 대체 모델 호출을 차감할 재시도 예산 (None이면 제한 없음)
+        """
+        super().__init__()
+        self.backend_factory = backend_factory
+        self.default_model = default_model
+        self.failover_budget = failover_budget
+        self._backends = {}
+        self._routes = {}
+        self._breakers = {}
+        self._route_stats = collections.defaultdict(RouteStats)
+        self._lock = threading.Lock()
+
+    @property
+    def generation_settings(self):
+        # 경로 표가 바뀌면 다른 모델의 응답이 캐시에서 나오지 않도록 캐시 키에 포함
+        # (캐시에는 기본 모델의 응답만 저장하므로 키의 모델은 경로의 기본 모델)
+        settings = dict(self._backend(self.default_model).generation_settings)
+        settings["routes"] = {prompt_type: self.route(prompt_type)[0] for prompt_type in ROUTES}
+        return settings
+
+    def _backend(self, model):
+        with self._lock:
+            if model not in self._backends:
+                self._backends[model] = self.backend_factory(model)
+            return self._backends[model]
+
+    def route(self, prompt_type):
+        """프롬프트 유형의 (모델 목록, SLO)"""
+        with self._lock:
+            if prompt_type not in self._routes:
+                self._routes[prompt_type] = get_route(prompt_type, self.default_model)
+            return self._routes[prompt_type]
+
+    def _breaker(self, prompt_type, model, slo):
+        with self._lock:
+            key = (prompt_type, model)
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(slo)
+            return self._breakers[key]
+
+    def candidates(self, prompt_type):
+        """
+        이번 호출에 시도할 모델을 순서대로 생성
+
+        브레이커가 닫힌(또는 시험 호출을 허용한) 모델을 목록 순서대로 내보내고, 모두 열려 있으면
+        마지막 대체 모델을 사용합니다. 시험 호출 허용은 실제로 그 모델을 호출하기 직전에만 확인합니다.
+        """
+        models, slo = self.route(prompt_type)
+        yielded = False
+        for model in models:
+            if self._breaker(prompt_type, model, slo).allow():
+                yielded = True
+                yield model
+        if not yielded:
+            yield models[-1]
+
+    def _can_fail_over(self, prompt_type, model):
+        """실패한 호출을 model로 다시 보내도 되는지 (예산이 없으면 시험 호출 자리를 돌려주고 False)"""
+        if self.failover_budget is None or self.failover_budget.withdraw():
+            return True
+        self._finish(prompt_type, model, None, 0.0)
+        return False
+
+    def _record(self, prompt_type, model, failed, latency):
+        _, slo = self.route(prompt_type)
+        self._breaker(prompt_type, model, slo).record(failed, latency)
+        with self._lock:
+            self._route_stats[(prompt_type, model)].record(failed, latency, slo)
+
+    def _generate(self, prompt, prompt_type):
+        error = None
+        primary = self.route(prompt_type)[0][0]
+        for model in self.candidates(prompt_type):
+            if error is not None and not self._can_fail_over(prompt_type, model):
+                break
+            start = time.perf_counter()
+            failed = None  # 결과 없이 끝나면 None
+            try:
+                text = self._backend(model).generate(prompt, prompt_type)
+                failed = False
+                return RoutedText(text, model, model != primary)
+            except Exception as e:
+                failed = True
+                error = e
+            finally:
+                self._finish(prompt_type, model, failed, time.perf_counter() - start)
+        raise error
+
+    def _generate_stream(self, prompt, prompt_type):
+        # 첫 조각을 받기 전에 실패한 경우만 다음 모델로 넘김
+        error = None
+        primary = self.route(prompt_type)[0][0]
+        for model in self.candidates(prompt_type):
+            if error is not None and not self._can_fail_over(prompt_type, model):
+                break
+            start = time.perf_counter()
+            started = False
+            failed = None  # 소비자가 스트림을 중간에 닫으면(GeneratorExit) None
+            try:
+                for chunk in self._backend(model).generate_stream(prompt, prompt_type):
+                    started = True
+                    yield RoutedText(chunk, model, model != primary)
+                failed = False
+            except Exception as e:
+                failed = True
+                if started:
+                    raise
+                error = e
+                continue
+            finally:
+                self._finish(prompt_type, model, failed, time.perf_counter() - start)
+            return
+        raise error
+
+    def _finish(self, prompt_type, model, failed, latency):
+        """호출 결과 기록 (결과 없이 끝난 호출은 브레이커의 시험 호출 자리만 돌려줌)"""
+        if failed is None:
+            _, slo = self.route(prompt_type)
+            self._breaker(prompt_type, model, slo).abandon()
+        else:
+            self._record(prompt_type, model, failed, latency)
+
+    def route_stats(self):
+        """경로별 지연 시간/오류 통계와 브레이커 상태"""
+        with self._lock:
+            items = list(self._route_stats.items())
+            breakers = dict(self._breakers)
+        routes = {}
+        for (prompt_type, model), stats in items:
+            snapshot = stats.snapshot()
+            breaker = breakers.get((prompt_type, model))
+            snapshot["breaker"] = breaker.state if breaker else "closed"
+            snapshot["breaker_opened"] = breaker.opened if breaker else 0
+            snapshot["slo"] = self.route(prompt_type)[1]
+            routes[f"{prompt_type}:{model}"] = snapshot
+        return routes
+
+    def stats(self):
+        stats = super().stats()
+        stats["routes"] = self.route_stats()
+        with self._lock:
+            backends = list(self._backends.values())
+        stats["context_cache_hits"] = sum(b.stats().get("context_cache_hits", 0) for b in backends)
+        return stats
@@ -1,9 +1,12 @@
 """
 모델 클래스들을 정의하는 파일
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Text, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 import os
 
@@ -11,16 +14,53 @@ Base = declarative_base()
 
 class DatabaseConfig:
     """데이터베이스 설정 클래스"""
-    def __init__(self, host="localhost", port=5432, database="", username="", password=""):
+    def __init__(self, host="localhost", port=5432, database="", username="", password="",
+                 url=None, pool_size=5, max_overflow=10, pool_pre_ping=True, pool_recycle=1800,
+                 pool_timeout=30):
         self.host = host
         self.port = port
         self.database = database
         self.username = username
         self.password = password
+        self.url = url  # 지정하면 host/port 대신 사용 (예: sqlite:///local.db)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_pre_ping = pool_pre_ping
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
     
     def get_connection_url(self):
         """SQLAlchemy 연결 URL 생성"""
+        if self.url:
+            return self.url
         return f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
+    
+    def is_sqlite(self):
+        """SQLite 연결 여부"""
+        return self.get_connection_url().startswith("sqlite")
+    
+    def get_engine_options(self):
+        """create_engine에 전달할 커넥션 풀 옵션"""
+        options = {
+            "pool_pre_ping": self.pool_pre_ping,
+            "pool_recycle": self.pool_recycle,
+        }
+        
+        if self.is_sqlite():
+            # 여러 스레드에서 같은 연결을 쓸 수 있도록 허용
+            options["connect_args"] = {"check_same_thread": False}
+            url = self.get_connection_url()
+            if url in ("sqlite://", "sqlite:///:memory:"):
+                # 메모리 DB는 연결이 끊기면 사라지므로 하나의 연결을 공유
+                options["poolclass"] = StaticPool
+                return options
+        
+        options.update({
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+        })
+        return options
 
 class DatabaseManager:
     """데이터베이스 연결 관리 클래스"""
@@ -28,37 +68,165 @@ class DatabaseManager:
         self.config = config
         self.engine = None
         self.SessionLocal = None
+        # 현재 작업 단위(unit_of_work)에서 공유 중인 세션
+        self._current_session = ContextVar(f"db_session_{id(self)}", default=None)
     
     def connect(self):
         """데이터베이스 연결"""
         try:
-            self.engine = create_engine(self.config.get_connection_url())
-            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            self.engine = create_engine(self.config.get_connection_url(), **self.config.get_engine_options())
+            # 세션이 닫힌 뒤에도 조회한 객체의 속성을 읽을 수 있도록 커밋 시 만료하지 않음
+            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False,
+                                             bind=self.engine)
             return True
         except Exception as e:
             print(f"데이터베이스 연결 오류: {e}")
             return False
     
+    @property
+    def cache_key(self):
+        """
+        DB별 메모리 캐시(단어 인덱스, 분류 체계 스냅샷)를 구분하는 식별자
+        
+        같은 URL이면 같은 DB이므로 연결 URL을 쓰되, 메모리 SQLite는 엔진마다 다른 DB이므로 엔진 id를 붙입니다.
+        """
+        url = self.config.get_connection_url()
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return f"{url}#{id(self.engine)}"
+        return url
+    
     def create_tables(self):
-        """테이블 생성"""
+        """테이블 생성 (기존 테이블에 없는 nullable 컬럼은 추가)"""
         Base.metadata.create_all(bind=self.engine)
+        self.add_missing_columns()
+    
+    def add_missing_columns(self):
+        """
+        모델에 새로 추가된 nullable 컬럼을 이미 만들어진 테이블에 추가
+        
+        create_all은 기존 테이블을 바꾸지 않으므로, 기본값 없이 추가할 수 있는 nullable 컬럼만 ALTER TABLE로 추가합니다.
+        """
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    print(f"🛠️ {table.name} 테이블에 {column.name} 컬럼을 추가했습니다.")
     
     def get_session(self):
         """세션 반환"""
         if self.SessionLocal:
             return self.SessionLocal()
         return None
+    
+    @contextmanager
+    def unit_of_work(self):
+        """
+        요청 단위 작업 세션
+        
+        블록 안에서 session_scope()를 사용하는 모든 조회/저장은 하나의 세션과 연결을 공유하며,
+        블록이 정상 종료되면 한 번에 커밋, 예외가 발생하면 롤백합니다.
+        이미 작업 단위 안이라면 기존 세션을 그대로 사용합니다.
+        """
+        current = self._current_session.get()
+        if current is not None:
+            yield current
+            return
+        
+        session = self.SessionLocal()
+        token = self._current_session.set(session)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self._current_session.reset(token)
+            session.close()
+    
+    @contextmanager
+    def session_scope(self):
+        """
+        CRUD 함수용 세션
+        
+        작업 단위 안에서는 공유 세션에 저장점(SAVEPOINT)을 만들고 flush만 수행합니다.
+        오류가 나면 이 블록의 변경만 저장점까지 되돌리므로, 호출자가 예외를 처리하고 계속 진행해도
+        같은 작업 단위의 앞선 저장은 그대로 남습니다.
+        작업 단위 밖에서는 새 세션을 열고 커밋 후 닫습니다.
+        """
+        current = self._current_session.get()
+        if current is not None:
+            savepoint = current.begin_nested()
+            try:
+                yield current
+                current.flush()
+                savepoint.commit()
+            except Exception:
+                # flush가 실패해 비활성화된 저장점도 rollback으로 닫아야 세션을 계속 쓸 수 있음
+                savepoint.rollback()
+                raise
+            return
+        
+        session = self.SessionLocal()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
 class GeminiModel:
     """제미나이 모델 관리 클래스"""
-    def __init__(self, api_key, model_name="gemini-pro"):
+    def __init__(self, api_key, model_name="gemini-pro", generation_config=None):
         self.api_key = api_key
         self.model_name = model_name
+        self.generation_config = generation_config or {}
         self.model = None
     
     def initialize(self):
         """모델 초기화"""
-        pass
+        import google.generativeai as genai
+        
+        genai.configure(api_key=self.api_key)
+        self.model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config or None)
+        return self.model
+    
+    def generate_content(self, prompt, stream=False):
+        """프롬프트로 응답 생성 (처음 호출 시 모델 초기화, stream=True이면 조각 단위 응답)"""
+        if self.model is None:
+            self.initialize()
+        return self.model.generate_content(prompt, stream=stream)
+    
+    def create_cached_model(self, static_prefix, ttl_seconds):
+        """
+        고정 앞부분을 제공자 컨텍스트 캐시에 올리고, 그 캐시를 사용하는 모델 반환
+        
+        SDK가 컨텍스트 캐시를 지원하지 않거나 앞부분이 모델의 최소 캐시 길이보다 짧으면 예외가 발생합니다.
+        """
+        import datetime
+        import google.generativeai as genai
+        from google.generativeai import caching
+        
+        if self.model is None:
+            self.initialize()
+        cached_content = caching.CachedContent.create(
+            model=f"models/{self.model_name}",
+            contents=[static_prefix],
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+        return genai.GenerativeModel.from_cached_content(
+            cached_content=cached_content,
+            generation_config=self.generation_config or None
+        )
 
 class PromptTemplate:
     """프롬프트 템플릿 클래스"""
@@ -161,6 +329,94 @@ class Word(Base):
     level = Column(String(20), nullable=False)  # basic, middle, high
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class GenerationJob(Base):
+    """콘텐츠 생성 작업 테이블 (중단된 작업을 이어서 실행하기 위한 기록)"""
+    __tablename__ = 'generation_jobs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    status = Column(String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    payload = Column(Text, nullable=False)  # 생성 요청 (ContentGenerationRequest JSON)
+    user_id = Column(String(100), nullable=True)  # 요청한 사용자 (문항 은행 중복 출제 방지용)
+    result = Column(Text, nullable=True)  # 최종 결과 JSON
+    attempts = Column(Integer, nullable=False, default=0)  # 실행 횟수
+    lease_owner = Column(String(100), nullable=True)  # 실행 중인 프로세스 (임대가 끝나면 다른 프로세스가 이어받음)
+    lease_expires_at = Column(DateTime, nullable=True)  # 임대 만료 시각
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GenerationStage(Base):
+    """생성 작업의 단계별 체크포인트 테이블"""
+    __tablename__ = 'generation_stages'
+    __table_args__ = (UniqueConstraint('job_id', 'stage'),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, nullable=False, index=True)
+    stage = Column(String(100), nullable=False)  # db_info, passage:0, questions:0, answers:0 등
+    status = Column(String(20), nullable=False)  # completed, failed
+    payload = Column(Text, nullable=True)  # 단계 결과 JSON
+    attempts = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobLeaseError(Exception):
+    """생성 작업의 임대를 얻지 못했거나 실행 중에 잃은 경우 (남은 단계를 실행하지 않고 그대로 전달)"""
+
+class ItemBankSet(Base):
+    """문항 은행 지문 묶음 테이블 (한 분배 조각에서 생성된 지문/예문)"""
+    __tablename__ = 'item_bank_sets'
+    __table_args__ = (Index('ix_item_bank_sets_slice', 'grade', 'category', 'subcategory', 'difficulty_level'),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grade = Column(Integer, nullable=False)
+    category = Column(String(50), nullable=False)  # 문법, 독해, 어휘
+    subcategory = Column(String(200), nullable=False)
+    difficulty_level = Column(String(10), nullable=False)  # 상, 중, 하
+    passages = Column(Text, nullable=False)  # 지문 목록 JSON
+    sentences = Column(Text, nullable=False)  # 예문 목록 JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ItemBankQuestion(Base):
+    """문항 은행 문제 테이블 (검증된 문제와 답안)"""
+    __tablename__ = 'item_bank_questions'
+    __table_args__ = (Index('ix_item_bank_questions_slice', 'grade', 'category', 'subcategory',
+                            'difficulty_level', 'question_type'),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    set_id = Column(Integer, nullable=False, index=True)
+    grade = Column(Integer, nullable=False)
+    category = Column(String(50), nullable=False)
+    subcategory = Column(String(200), nullable=False)
+    difficulty_level = Column(String(10), nullable=False)
+    question_type = Column(String(50), nullable=False)
+    question = Column(Text, nullable=False)  # 문제 JSON
+    answer = Column(Text, nullable=False)  # 답안 JSON
+    served_count = Column(Integer, nullable=True, default=0)  # 출제 횟수 (적게 낸 문제부터 고름)
+    last_served_at = Column(DateTime, nullable=True)  # 마지막 출제 시각
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ItemBankUsage(Base):
+    """사용자별 문항 은행 출제 기록 테이블 (같은 사용자에게 같은 문제를 다시 내지 않기 위한 기록)"""
+    __tablename__ = 'item_bank_usage'
+    __table_args__ = (UniqueConstraint('user_id', 'question_id'),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(100), nullable=False, index=True)  # 사용자 id 또는 세션 id (server.py 참고)
+    question_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ItemBankDemand(Base):
+    """분배 조각별 요청 수요 테이블 (시간이 지나면 감쇠하는 누적 문항 수)"""
+    __tablename__ = 'item_bank_demand'
+    __table_args__ = (UniqueConstraint('grade', 'category', 'subcategory', 'difficulty_level', 'question_type'),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grade = Column(Integer, nullable=False)
+    category = Column(String(50), nullable=False)
+    subcategory = Column(String(200), nullable=False)
+    difficulty_level = Column(String(10), nullable=False)
+    question_type = Column(String(50), nullable=False)
+    demand = Column(Float, nullable=False, default=0.0)  # 감쇠된 누적 요청 문항 수
+    updated_at = Column(DateTime, default=datetime.utcnow)  # 마지막 감쇠 기준 시각
+
 # 요청 데이터 구조를 위한 클래스들 (SQLAlchemy 모델이 아닌 일반 클래스)
 class CategoryRequest:
     """카테고리 요청 구조"""
@@ -0,0 +1,155 @@
+"""
+단계 작업의 의존성 그래프를 실행하는 스케줄러 파일
+
+지문 → 문제 → 답안처럼 이어지는 작업을 의존성 그래프로 등록하면, 입력이 준비된 작업부터
+스레드 풀에서 바로 실행합니다. 한 분배의 지문이 끝나면 다른 분배의 지문을 기다리지 않고
+그 분배의 문제 생성을 시작하므로, 전체 소요 시간이 단계별 소요 시간의 합이 아니라
+가장 긴 의존 경로(임계 경로)에 가까워집니다.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from rate_limiter import bind_priority
+
+
+class Task:
+    """그래프의 작업 하나"""
+
+    def __init__(self, name, fn, deps=()):
+        """
+        Args:
+            name: 작업 이름 (그래프 안에서 고유)
+            fn: 의존 작업 결과 딕셔너리({의존 작업 이름: 결과})를 받아 결과를 반환하는 함수
+            deps: 먼저 끝나야 하는 작업 이름 목록
+        """
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.result = None
+        self.error = None
+        self.skipped = False
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class TaskGraph:
+    """의존성 그래프 스케줄러"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.wall_time = 0.0
+
+    def add(self, name, fn, deps=()):
+        """작업 등록 (의존 작업은 먼저 등록되어 있어야 함)"""
+        if name in self.tasks:
+            raise ValueError(f"이미 등록된 작업입니다: {name}")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"'{name}'의 의존 작업 '{dep}'이(가) 등록되지 않았습니다.")
+        self.tasks[name] = Task(name, fn, deps)
+        return name
+
+    def run(self, max_workers=4, reraise=()):
+        """
+        입력이 준비된 작업부터 동시에 실행
+
+        작업이 예외를 발생시키거나 None을 반환하면 실패로 보고, 그 작업에 의존하는 작업은 건너뜁니다.
+
+        Args:
+            reraise: 작업이 이 예외 유형을 발생시키면 새 작업을 시작하지 않고, 실행 중인 작업이 끝난 뒤
+                     그 예외를 다시 발생시킴 (작업 임대를 잃은 경우 등)
+
+        Returns:
+            dict: 작업 이름 → 결과 (실패하거나 건너뛴 작업은 None)
+        """
+        waiting = {name: set(task.deps) for name, task in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for name, task in self.tasks.items():
+            for dep in task.deps:
+                dependents[dep].append(name)
+
+        start = time.perf_counter()
+        running = {}
+        aborted = []
+
+        def finish(name):
+            # 끝난 작업의 후속 작업 중 입력이 모두 준비된 것을 반환
+            ready = []
+            for child in dependents[name]:
+                waiting[child].discard(name)
+                if not waiting[child]:
+                    ready.append(child)
+            return ready
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            def submit(name):
+                task = self.tasks[name]
+                if aborted:
+                    task.skipped = True
+                    return
+                if any(self.tasks[dep].result is None for dep in task.deps):
+                    # 입력 중 하나라도 실패하면 실행하지 않음
+                    task.skipped = True
+                    for child in finish(name):
+                        submit(child)
+                    return
+                inputs = {dep: self.tasks[dep].result for dep in task.deps}
+                running[executor.submit(bind_priority(self._execute), task, inputs)] = name
+
+            for name, deps in list(waiting.items()):
+                if not deps:
+                    submit(name)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if reraise and isinstance(self.tasks[name].error, reraise):
+                        aborted.append(self.tasks[name].error)
+                    for child in finish(name):
+                        submit(child)
+
+        self.wall_time = time.perf_counter() - start
+        if aborted:
+            raise aborted[0]
+        return {name: task.result for name, task in self.tasks.items()}
+
+    @staticmethod
+    def _execute(task, inputs):
+        task.started_at = time.perf_counter()
+        try:
+            task.result = task.fn(inputs)
+        except Exception as e:
+            task.error = e
+            print(f"❌ 작업 '{task.name}' 실행 중 오류: {e}")
+        finally:
+            task.finished_at = time.perf_counter()
+
+    def critical_path(self):
+        """
+        실행 시간 기준 가장 긴 의존 경로
+
+        Returns:
+            tuple: (경로 소요 시간, 작업 이름 목록)
+        """
+        longest = {}
+        for name, task in self.tasks.items():  # 등록 순서가 곧 위상 정렬 순서
+            best = max((longest[dep] for dep in task.deps), key=lambda item: item[0], default=(0.0, []))
+            longest[name] = (best[0] + task.duration, best[1] + [name])
+        return max(longest.values(), key=lambda item: item[0], default=(0.0, []))
+
+    def stats(self):
+        """실행 통계 (실제 소요 시간, 작업 시간 합계, 임계 경로 시간, 실패/건너뛴 작업 수)"""
+        return {
+            "wall_time": self.wall_time,
+            "total_task_time": sum(task.duration for task in self.tasks.values()),
+            "critical_path_time": self.critical_path()[0],
+            "failed": sum(1 for task in self.tasks.values() if task.error is not None),
+            "skipped": sum(1 for task in self.tasks.values() if task.skipped),
+        }
@@ -0,0 +1,192 @@
+"""
+한가한 시간에 인기 분배 조각의 문항을 미리 생성해 문항 은행 재고를 채우는 파일
+
+교사들이 같은 시간대에 몰려 시험지를 만들고 밤에는 Gemini 호출 한도가 남으므로,
+요청마다 기록되는 분배 조각별 수요(item_bank_demand)를 보고 수요가 큰 조각부터
+목표 재고(감쇠된 수요, 최대 POOL_TARGET_STOCK문항)까지 문항을 미리 생성해 은행에 넣습니다.
+재고는 활동 중인 사용자가 아직 받지 않은 문제 수이므로(ItemBank.stock), 사용자들이 은행 문제를 다 받으면 다시 채웁니다.
+
+미리 생성하는 LLM 호출은 낮은 우선순위(rate_limiter.low_priority)로 보내므로, 호출 조절기의 동시 호출 창과
+분당 한도 중 LLM_LOW_PRIORITY_SHARE 비율까지만 쓰고 기다리는 사용자 요청의 호출이 있으면 양보합니다.
+또한 is_idle이 False를 반환하면(처리 중인 사용자 요청이 있으면) 다음 생성을 시작하지 않고 멈춥니다.
+
+사용법:
+    python pool_warmer.py           # 계속 실행 (POOL_WARMER_INTERVAL초마다 재고 확인)
+    python pool_warmer.py --once    # 한 번만 채우고 종료 (야간 cron 등)
+
+server.py는 POOL_WARMER=1이면 서버 안에서 백그라운드 스레드로 실행합니다.
+"""
+import argparse
+import math
+import os
+import threading
+import time
+
+from item_bank import ItemBank
+from main import gather_db_info_new, generate_content_with_llm, get_distribution_info, setup_database
+from models import ContentGenerationRequest, QuestionDistribution
+from rate_limiter import low_priority
+
+# 재고 확인 주기 (초)
+POOL_WARMER_INTERVAL = float(os.getenv('POOL_WARMER_INTERVAL', 300))
+
+# 재고를 유지할 인기 조각 수와 조각별 최대 목표 재고 (문항 수)
+POOL_HOT_SLICES = int(os.getenv('POOL_HOT_SLICES', 20))
+POOL_TARGET_STOCK = int(os.getenv('POOL_TARGET_STOCK', 20))
+
+# 한 번의 생성 요청으로 만들 문항 수
+POOL_BATCH_QUESTIONS = int(os.getenv('POOL_BATCH_QUESTIONS', 5))
+
+
+class PoolWarmer:
+    """인기 분배 조각의 은행 재고를 채우는 백그라운드 작업"""
+
+    def __init__(self, db_manager, hot_slices=None, target_stock=None, batch_questions=None,
+                 interval=None, is_idle=None):
+        """
+        Args:
+            hot_slices: 재고를 유지할 인기 조각 수 (기본값: POOL_HOT_SLICES)
+            target_stock: 조각별 최대 목표 재고 (기본값: POOL_TARGET_STOCK)
+            batch_questions: 한 번의 생성 요청으로 만들 문항 수 (기본값: POOL_BATCH_QUESTIONS)
+            interval: start()로 실행할 때 재고 확인 주기 (초, 기본값: POOL_WARMER_INTERVAL)
+            is_idle: 미리 생성을 해도 되는지 반환하는 함수 (기본값: 항상 True)
+        """
+        self.bank = ItemBank(db_manager)
+        self.db_manager = db_manager
+        self.hot_slices = hot_slices or POOL_HOT_SLICES
+        self.target_stock = target_stock or POOL_TARGET_STOCK
+        self.batch_questions = max(1, batch_questions or POOL_BATCH_QUESTIONS)
+        self.interval = interval or POOL_WARMER_INTERVAL
+        self.is_idle = is_idle or (lambda: True)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def plan(self):
+        """
+        재고가 목표보다 적은 인기 조각 목록
+
+        목표 재고는 감쇠된 수요(최근 요청 문항 수)를 올림한 값이며 target_stock을 넘지 않습니다.
+        재고는 활동 중인 사용자가 아직 받지 않은 문제 수입니다.
+
+        Returns:
+            list: (ItemBankDemand, 모자란 문항 수) 목록 (수요가 큰 순)
+        """
+        plan = []
+        for row, demand in self.bank.hot_slices(self.hot_slices):
+            target = min(self.target_stock, math.ceil(demand))
+            stock = self.bank.stock(row.grade, row.category, row.subcategory, row.difficulty_level,
+                                    row.question_type)
+            if stock < target:
+                plan.append((row, target - stock))
+        return plan
+
+    def warm_slice(self, row, count):
+        """
+        분배 조각 하나의 문항을 생성하여 은행에 저장
+
+        Returns:
+            int: 은행에 저장한 문항 수
+        """
+        request = ContentGenerationRequest(
+            grade=row.grade,
+            categories=[{"name": row.category, "subcategories": [row.subcategory], "ratio": 100}],
+            question_type=row.question_type,
+            difficulty=row.difficulty_level,
+            total_questions=count
+        )
+        dist = QuestionDistribution(row.category, row.subcategory, count, row.difficulty_level)
+        with self.db_manager.unit_of_work():
+            db_info = gather_db_info_new(self.db_manager, request)
+        with low_priority():
+            generated = generate_content_with_llm(request, [dist], db_info)
+        return self.bank.deposit(request, [dist], generated, get_distribution_info)
+
+    def run_once(self):
+        """
+        재고가 모자란 조각을 한 번 채우기
+
+        생성 한 번이 끝날 때마다 한가한지 확인하고, 한가하지 않으면 바로 멈춥니다.
+
+        Returns:
+            int: 은행에 저장한 문항 수
+        """
+        stored = 0
+        for row, deficit in self.plan():
+            label = f"{row.grade}학년 {row.category} > {row.subcategory} ({row.difficulty_level})"
+            while deficit > 0:
+                if self._stop.is_set():
+                    return stored
+                if not self.is_idle():
+                    print("⏸️ 처리 중인 요청이 있어 미리 생성을 멈춥니다.")
+                    return stored
+
+                start = time.perf_counter()
+                try:
+                    added = self.warm_slice(row, min(self.batch_questions, deficit))
+                except Exception as e:
+                    print(f"❌ {label} 미리 생성 중 오류: {e}")
+                    added = 0
+                elapsed = time.perf_counter() - start
+
+                stored += added
+                deficit -= added
+                print(f"🔥 {label} {added}문항 미리 생성 (남은 목표 {max(0, deficit)}문항, {elapsed:.1f}초)")
+
+                if added == 0:
+                    # 생성에 실패한 조각은 다음 주기에 다시 시도
+                    break
+        return stored
+
+    def start(self):
+        """백그라운드 스레드로 interval초마다 run_once 실행"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="pool-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """백그라운드 실행 중지 (진행 중인 생성 요청 하나는 끝까지 기다림)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.is_idle():
+                try:
+                    stored = self.run_once()
+                    if stored:
+                        print(f"🏦 미리 생성으로 문항 은행에 {stored}문항을 채웠습니다.")
+                except Exception as e:
+                    print(f"❌ 미리 생성 주기 실행 중 오류: {e}")
+            self._stop.wait(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="인기 분배 조각의 문항 은행 재고 채우기")
+    parser.add_argument("--once", action="store_true", help="한 번만 채우고 종료")
+    args = parser.parse_args()
+
+    db_manager = setup_database()
+    if not db_manager:
+        print("❌ 데이터베이스 연결 실패로 미리 생성을 종료합니다.")
+        return 1
+
+    warmer = PoolWarmer(db_manager)
+    if args.once:
+        print(f"🏦 미리 생성으로 문항 은행에 {warmer.run_once()}문항을 채웠습니다.")
+        return 0
+
+    warmer.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        warmer.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,21 +1,35 @@
+"""
+프롬프트 템플릿을 관리하는 파일
+
+프롬프트마다 긴 지시문과 JSON 응답 형식은 호출마다 같은 "고정 앞부분(prefix)"으로, 학년 수준·단어 목록·지문 등
+호출마다 바뀌는 값은 맨 뒤의 "[요청 정보]" 부분(payload)으로 나누어 둡니다. 앞부분이 바이트 단위로 같으므로
+제공자 쪽 컨텍스트 캐시(GeminiBackend, GEMINI_CONTEXT_CACHE=1)나 접두사 캐시가 재사용할 수 있습니다.
+
+템플릿은 import 시 한 번 컴파일하며, 앞부분에 {필드}가 들어 있으면 바로 오류를 냅니다.
+format_prompt는 빠진 값, 알 수 없는 값, None 값을 PromptParameterError로 거부합니다.
+호출마다 보낸 프롬프트 바이트 수와 그중 고정 앞부분 바이트 수는 record_prompt_bytes로 기록하고
+get_prompt_metrics()로 확인할 수 있습니다.
+"""
+import string
+import threading
+from collections import defaultdict
+
 # 1. 지문 및 예문 생성 프롬프트
-PASSAGE_GENERATION_PROMPT = """
+PASSAGE_GENERATION_PREFIX = """
 **[지시문]**
 
-당신은 {level} 수준의 영어 학습자를 위한 교육용 지문 및 예문 생성 AI입니다.
-PostgreSQL 데이터베이스에서 추출된 아래의 조건들을 충실히 반영하여, 교육적 가치가 높은 영어 지문과 예문을 생성해 주세요.
+당신은 중학교 영어 학습자를 위한 교육용 지문 및 예문 생성 AI입니다.
+PostgreSQL 데이터베이스에서 추출된 맨 아래 [요청 정보]의 조건들을 충실히 반영하여, 교육적 가치가 높은 영어 지문과 예문을 생성해 주세요.
 
 **[생성 조건]**
 
-1.  **지문 개수**: {passage_count}개
-2.  **지문 길이**: 각 지문당 {passage_length} 단어 내외
-3.  **예문 개수**: {sentence_count}개
-4.  **예문 길이**: 각 예문은 {sentence_length} 단어 내외
-5.  **어휘 수준**: {level} (주어진 {word_list}의 단어를 최소 3개 이상 포함)
-6.  **핵심 문법**: `{grammar_point}` 개념을 반드시 포함하고, 해당 문법이 사용된 문장을 지문과 예문에 각각 1개 이상 포함하세요.
-7.  **독해 유형**: `{reading_type}` 유형의 질문을 만들기에 적합한 내용으로 구성하세요.
-8.  **소재**: `{topic}`에 관한 내용으로 작성하세요.
-9.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여, `passages`와 `sentences` 필드를 채워서 응답해 주세요. 다른 설명 없이 JSON만 반환하세요.
+1.  **지문**: [요청 정보]의 지문 개수만큼 작성하고, 각 지문은 지문 길이에 맞추세요.
+2.  **예문**: [요청 정보]의 예문 개수만큼 작성하고, 각 예문은 예문 길이에 맞추세요.
+3.  **어휘 수준**: [요청 정보]의 학습자 수준에 맞추고, 필수 단어 중 최소 3개 이상을 포함하세요.
+4.  **핵심 문법**: [요청 정보]의 핵심 문법 개념을 반드시 포함하고, 해당 문법이 사용된 문장을 지문과 예문에 각각 1개 이상 포함하세요.
+5.  **독해 유형**: [요청 정보]의 독해 유형 질문을 만들기에 적합한 내용으로 구성하세요.
+6.  **소재**: [요청 정보]의 소재에 관한 내용으로 작성하세요.
+7.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여, `passages`와 `sentences` 필드를 채워서 응답해 주세요. 다른 설명 없이 JSON만 반환하세요.
 
 **[JSON 응답 형식]**
 ```json
@@ -41,35 +55,42 @@ PostgreSQL 데이터베이스에서 추출된 아래의 조건들을 충실히 
 ```
 """
 
+PASSAGE_GENERATION_PAYLOAD = """
+**[요청 정보]**
+
+- **학습자 수준**: {level}
+- **지문 개수**: {passage_count}개
+- **지문 길이**: 각 지문당 {passage_length} 단어 내외
+- **예문 개수**: {sentence_count}개
+- **예문 길이**: 각 예문은 {sentence_length} 단어 내외
+- **필수 단어**: {word_list}
+- **핵심 문법**: `{grammar_point}`
+- **독해 유형**: `{reading_type}`
+- **소재**: `{topic}`
+"""
+
 # 2. 문제 생성 프롬프트
-QUESTION_GENERATION_PROMPT = """
+QUESTION_GENERATION_PREFIX = """
 **[지시문]**
 
-당신은 영어 문제 출제 AI입니다. 주어진 [지문들]과 [예문들], [생성 조건]에 맞춰, 학습 목표를 달성할 수 있는 완성도 높은 영어 문제들을 생성해 주세요.
+당신은 영어 문제 출제 AI입니다. 맨 아래 [요청 정보]의 [지문들]과 [예문들], 생성 조건에 맞춰, 학습 목표를 달성할 수 있는 완성도 높은 영어 문제들을 생성해 주세요.
 
 **중요**: 필요에 따라 원본 지문을 문제 출제 의도에 맞게 **적절히 변형**하여 사용하세요. 예를 들어:
 - 독해 문제: 지문의 일부를 빈칸으로 만들거나, 문장 순서를 바꾸거나, 핵심 단어를 다른 표현으로 바꿔서 추론 능력을 평가
 - 문법 문제: 특정 문법 구조가 포함된 문장을 변형하여 문법 이해도를 평가
 - 어휘 문제: 핵심 어휘를 빈칸 처리하거나 유사한 의미의 다른 단어로 바꿔서 어휘력을 평가
 
-**[지문들]**
-{passages}
-
-**[예문들]**
-{sentences}
-
 **[생성 조건]**
 
-1.  **문제 개수**: {question_count}개
-2.  **문제 유형**: `{question_type}` (예: 객관식 4지선다, 빈칸 채우기, 서술형)
-3.  **학습 목표**: `{learning_objective}` (이 문제들을 통해 평가하고자 하는 능력)
-4.  **출제 가이드**:
+1.  **문제 개수와 유형**: [요청 정보]의 문제 개수만큼, 문제 유형(예: 객관식 4지선다, 빈칸 채우기, 서술형)에 맞춰 출제하세요.
+2.  **학습 목표**: [요청 정보]의 학습 목표(이 문제들을 통해 평가하고자 하는 능력)를 평가할 수 있어야 합니다.
+3.  **출제 가이드**:
     - 지문과 예문의 내용을 모두 활용하되, **문제 출제 의도에 맞게 변형**하여 사용하세요.
     - 각 문제는 서로 다른 관점에서 접근하되, 전체적으로 학습 목표를 달성할 수 있도록 구성하세요.
     - 선택지는 매력적인 오답을 포함해야 하며, 정답의 근거는 명확해야 합니다.
     - 학습 목표와 관련된 핵심 요소를 질문하거나 선택지에 포함하세요.
     - **변형된 지문이나 예문을 사용한 경우, 반드시 `modified_passage` 필드에 포함하세요.**
-5.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여 응답해 주세요. 다른 설명 없이 JSON만 반환하세요.
+4.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여 응답해 주세요. `learning_objective` 필드에는 [요청 정보]의 학습 목표를 그대로 쓰세요. 다른 설명 없이 JSON만 반환하세요.
 
 **[JSON 응답 형식]**
 ```json
@@ -87,7 +108,7 @@ QUESTION_GENERATION_PROMPT = """
       ],
       "source": "<지문 또는 예문 중 어느 것을 기반으로 했는지>",
       "modification_type": "<변형 유형: 빈칸 처리, 문장 순서 변경, 어휘 대체, 원본 유지 등>",
-      "learning_objective": "{learning_objective}"
+      "learning_objective": "<[요청 정보]의 학습 목표>"
     }},
     {{
       "id": 2,
@@ -101,29 +122,34 @@ QUESTION_GENERATION_PROMPT = """
       ],
       "source": "<지문 또는 예문 중 어느 것을 기반으로 했는지>",
       "modification_type": "<변형 유형: 빈칸 처리, 문장 순서 변경, 어휘 대체, 원본 유지 등>",
-      "learning_objective": "{learning_objective}"
+      "learning_objective": "<[요청 정보]의 학습 목표>"
     }}
   ]
 }}
 ```
 """
 
-# 3. 답안 및 해설 생성 프롬프트
-ANSWER_GENERATION_PROMPT = """
-**[지시문]**
+QUESTION_GENERATION_PAYLOAD = """
+**[요청 정보]**
 
-당신은 영어 문제 해설 AI입니다. 주어진 [지문들], [예문들], [문제들]을 바탕으로, 각 문제의 명확한 [정답]과 상세한 [해설]을 생성해 주세요.
-
-**중요**: 문제에 변형된 지문이나 예문이 포함되어 있다면, 그 변형 내용을 고려하여 해설을 작성하세요. 원본 지문과 변형된 지문의 차이점도 설명에 포함하면 학습에 도움이 됩니다.
+- **문제 개수**: {question_count}개
+- **문제 유형**: `{question_type}`
+- **학습 목표**: `{learning_objective}`
 
 **[지문들]**
 {passages}
 
 **[예문들]**
 {sentences}
+"""
 
-**[문제들]**
-{questions}
+# 3. 답안 및 해설 생성 프롬프트
+ANSWER_GENERATION_PREFIX = """
+**[지시문]**
+
+당신은 영어 문제 해설 AI입니다. 맨 아래 [요청 정보]의 [지문들], [예문들], [문제들]을 바탕으로, 각 문제의 명확한 [정답]과 상세한 [해설]을 생성해 주세요.
+
+**중요**: 문제에 변형된 지문이나 예문이 포함되어 있다면, 그 변형 내용을 고려하여 해설을 작성하세요. 원본 지문과 변형된 지문의 차이점도 설명에 포함하면 학습에 도움이 됩니다.
 
 **[생성 조건]**
 
@@ -162,41 +188,287 @@ ANSWER_GENERATION_PROMPT = """
 ```
 """
 
+ANSWER_GENERATION_PAYLOAD = """
+**[요청 정보]**
+
+**[지문들]**
+{passages}
+
+**[예문들]**
+{sentences}
+
+**[문제들]**
+{questions}
+"""
+
+# 2-1. 문제 및 정답/해설 통합 생성 프롬프트 (답안 생성 요청을 따로 보내지 않을 때 사용)
+QUESTION_ANSWER_GENERATION_PREFIX = """
+**[지시문]**
+
+당신은 영어 문제 출제 AI입니다. 맨 아래 [요청 정보]의 [지문들]과 [예문들], 생성 조건에 맞춰, 학습 목표를 달성할 수 있는 완성도 높은 영어 문제들을 생성하고,
+각 문제의 정답과 상세한 해설을 함께 작성해 주세요.
+
+**중요**: 필요에 따라 원본 지문을 문제 출제 의도에 맞게 **적절히 변형**하여 사용하세요. 예를 들어:
+- 독해 문제: 지문의 일부를 빈칸으로 만들거나, 문장 순서를 바꾸거나, 핵심 단어를 다른 표현으로 바꿔서 추론 능력을 평가
+- 문법 문제: 특정 문법 구조가 포함된 문장을 변형하여 문법 이해도를 평가
+- 어휘 문제: 핵심 어휘를 빈칸 처리하거나 유사한 의미의 다른 단어로 바꿔서 어휘력을 평가
+
+**[생성 조건]**
+
+1.  **문제 개수와 유형**: [요청 정보]의 문제 개수만큼, 문제 유형(예: 객관식 4지선다, 빈칸 채우기, 서술형)에 맞춰 출제하세요.
+2.  **학습 목표**: [요청 정보]의 학습 목표(이 문제들을 통해 평가하고자 하는 능력)를 평가할 수 있어야 합니다.
+3.  **출제 가이드**:
+    - 지문과 예문의 내용을 모두 활용하되, **문제 출제 의도에 맞게 변형**하여 사용하세요.
+    - 각 문제는 서로 다른 관점에서 접근하되, 전체적으로 학습 목표를 달성할 수 있도록 구성하세요.
+    - 선택지는 매력적인 오답을 포함해야 하며, 정답의 근거는 명확해야 합니다.
+    - **변형된 지문이나 예문을 사용한 경우, 반드시 `modified_passage` 필드에 포함하세요.**
+4.  **정답과 해설**:
+    - 각 문제의 `answer` 필드에 정답 선택지 기호와 해설을 작성하세요. 정답은 반드시 그 문제의 `choices` 중 하나여야 합니다.
+    - 왜 그것이 정답인지 지문/예문 또는 변형된 지문을 근거로 설명하고, 오답 선택지가 틀린 이유와 학습 포인트도 포함하세요.
+5.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여 응답해 주세요. `learning_objective` 필드에는 [요청 정보]의 학습 목표를 그대로 쓰세요. 다른 설명 없이 JSON만 반환하세요.
+
+**[JSON 응답 형식]**
+```json
+{{
+  "questions": [
+    {{
+      "id": 1,
+      "question": "<문제 1의 질문 부분>",
+      "modified_passage": "<문제 출제를 위해 변형된 지문이나 예문 (변형하지 않았다면 원본 그대로)>",
+      "choices": [
+        "(A) <선택지 1>",
+        "(B) <선택지 2>",
+        "(C) <선택지 3>",
+        "(D) <선택지 4>"
+      ],
+      "source": "<지문 또는 예문 중 어느 것을 기반으로 했는지>",
+      "modification_type": "<변형 유형: 빈칸 처리, 문장 순서 변경, 어휘 대체, 원본 유지 등>",
+      "learning_objective": "<[요청 정보]의 학습 목표>",
+      "answer": {{
+        "correct_choice": "<(A), (B), (C), (D) 중 정답>",
+        "explanation": {{
+          "main": "<정답에 대한 상세한 해설>",
+          "distractors": "<오답 선택지에 대한 간략한 설명>",
+          "learning_point": "<문제와 관련된 추가 학습 포인트 (문법, 어휘 등)>"
+        }}
+      }}
+    }}
+  ]
+}}
+```
+"""
+
+QUESTION_ANSWER_GENERATION_PAYLOAD = QUESTION_GENERATION_PAYLOAD
+
+# 1-1. 묶음 지문 생성 프롬프트 (여러 분배의 지문을 한 번의 요청으로 생성할 때 사용)
+PASSAGE_BATCH_GENERATION_PREFIX = """
+**[지시문]**
+
+당신은 중학교 영어 학습자를 위한 교육용 지문 및 예문 생성 AI입니다.
+맨 아래 [요청 정보]의 [슬롯 목록]에 있는 각 슬롯은 서로 다른 출제 영역입니다. 슬롯마다 주어진 조건을 충실히 반영하여,
+교육적 가치가 높은 영어 지문과 예문을 생성해 주세요.
+
+**[공통 조건]**
+
+1.  **어휘 수준**: [요청 정보]의 학습자 수준에 맞추고, 필수 단어를 슬롯마다 최소 3개 이상 포함하세요.
+2.  **핵심 문법**: 슬롯의 핵심 문법 개념이 사용된 문장을 그 슬롯의 지문과 예문에 각각 1개 이상 포함하세요.
+3.  **독해 유형**: 슬롯의 독해 유형 질문을 만들기에 적합한 내용으로 구성하세요.
+4.  **슬롯 표시**: 모든 지문과 예문에 해당 슬롯 번호를 `slot` 필드로 반드시 표시하세요.
+5.  **응답 형식**: 아래 JSON 구조를 반드시 준수하여, 모든 슬롯의 지문과 예문을 `passages`와 `sentences` 필드에 함께 담아 응답해 주세요. 다른 설명 없이 JSON만 반환하세요.
+
+**[JSON 응답 형식]**
+```json
+{{
+  "passages": [
+    {{
+      "slot": 1,
+      "title": "<지문 제목>",
+      "content": "<생성된 영어 지문>",
+      "korean_translation": "<지문 한글 번역>"
+    }}
+  ],
+  "sentences": [
+    {{
+      "slot": 1,
+      "english": "<생성된 영어 예문>",
+      "korean": "<예문 한글 번역>"
+    }}
+  ]
+}}
+```
+"""
+
+PASSAGE_BATCH_GENERATION_PAYLOAD = """
+**[요청 정보]**
+
+- **학습자 수준**: {level}
+- **필수 단어**: {word_list}
+
+**[슬롯 목록]** (총 {slot_count}개)
+{slots}
+"""
+
+# 4. JSON 수정 프롬프트 (로컬 복구에 실패한 응답을 다시 요청할 때 사용)
+JSON_REPAIR_PREFIX = """
+**[지시문]**
+
+당신은 JSON 수정 AI입니다. 맨 아래 [손상된 JSON]은 문법 오류가 있거나 중간에 잘린 JSON입니다.
+내용은 바꾸지 말고 문법만 고쳐서, [필수 최상위 키]를 모두 가진 올바른 JSON 객체 하나만 반환하세요. 다른 설명은 쓰지 마세요.
+"""
+
+JSON_REPAIR_PAYLOAD = """
+**[필수 최상위 키]**
+{required_keys}
+
+**[손상된 JSON]**
+{broken_json}
+"""
+
+
+class PromptParameterError(ValueError):
+    """프롬프트 매개변수가 빠졌거나, 알 수 없거나, 값이 None인 경우"""
+    pass
+
+
+class Prompt(str):
+    """
+    완성된 프롬프트 문자열 (문자열로 그대로 사용 가능)
+
+    static_prefix 속성에 호출마다 같은 고정 앞부분을 담고 있어, 백엔드가 앞부분을 컨텍스트 캐시로 보내고
+    나머지(payload)만 전송할 수 있습니다.
+    """
+
+    def __new__(cls, static_prefix, payload):
+        prompt = super().__new__(cls, static_prefix + payload)
+        prompt.static_prefix = static_prefix
+        prompt.payload = payload
+        return prompt
+
+
+class CompiledPrompt:
+    """고정 앞부분 + 요청 정보 템플릿으로 컴파일된 프롬프트"""
+
+    def __init__(self, prompt_type, prefix_template, payload_template):
+        """
+        Args:
+            prefix_template: 고정 앞부분 ({{ }}는 중괄호, 필드는 허용하지 않음)
+            payload_template: 요청 정보 템플릿 (str.format 필드)
+        """
+        formatter = string.Formatter()
+        prefix_fields = [field for _, field, _, _ in formatter.parse(prefix_template) if field is not None]
+        if prefix_fields:
+            raise ValueError(f"'{prompt_type}' 프롬프트의 고정 앞부분에 필드가 있습니다: {prefix_fields}")
+
+        fields = []
+        for _, field, format_spec, conversion in formatter.parse(payload_template):
+            if field is None:
+                continue
+            if not field.isidentifier() or format_spec or conversion:
+                raise ValueError(f"'{prompt_type}' 프롬프트의 필드 '{field}'는 단순한 이름이어야 합니다.")
+            if field not in fields:
+                fields.append(field)
+
+        self.prompt_type = prompt_type
+        self.prefix = prefix_template.format()
+        self.payload_template = payload_template
+        self.fields = tuple(fields)
+
+    def format(self, **kwargs):
+        """
+        요청 정보를 채운 Prompt 반환
+
+        Raises:
+            PromptParameterError: 빠진 값, 알 수 없는 값, None 값이 있는 경우
+        """
+        missing = [field for field in self.fields if field not in kwargs]
+        unknown = [key for key in kwargs if key not in self.fields]
+        empty = [key for key, value in kwargs.items() if value is None]
+        if missing or unknown or empty:
+            problems = []
+            if missing:
+                problems.append(f"누락: {', '.join(missing)}")
+            if unknown:
+                problems.append(f"알 수 없음: {', '.join(unknown)}")
+            if empty:
+                problems.append(f"None 값: {', '.join(empty)}")
+            raise PromptParameterError(f"'{self.prompt_type}' 프롬프트 매개변수 오류 ({'; '.join(problems)})")
+        return Prompt(self.prefix, self.payload_template.format(**kwargs))
+
+
+# import 시 한 번 컴파일 (고정 앞부분에 필드가 있으면 여기서 오류)
+PROMPTS = {
+    "passage": CompiledPrompt("passage", PASSAGE_GENERATION_PREFIX, PASSAGE_GENERATION_PAYLOAD),
+    "passage_batch": CompiledPrompt("passage_batch", PASSAGE_BATCH_GENERATION_PREFIX,
+                                    PASSAGE_BATCH_GENERATION_PAYLOAD),
+    "question": CompiledPrompt("question", QUESTION_GENERATION_PREFIX, QUESTION_GENERATION_PAYLOAD),
+    "question_answer": CompiledPrompt("question_answer", QUESTION_ANSWER_GENERATION_PREFIX,
+                                      QUESTION_ANSWER_GENERATION_PAYLOAD),
+    "answer": CompiledPrompt("answer", ANSWER_GENERATION_PREFIX, ANSWER_GENERATION_PAYLOAD),
+    "json_repair": CompiledPrompt("json_repair", JSON_REPAIR_PREFIX, JSON_REPAIR_PAYLOAD),
+}
+
+# 유형별 프롬프트 바이트 통계
+_metrics = defaultdict(lambda: {"calls": 0, "prompt_bytes": 0, "prefix_bytes": 0})
+_metrics_lock = threading.Lock()
+
+
 def get_prompt(prompt_type):
     """
-    요청된 유형에 맞는 프롬프트 템플릿을 반환합니다.
+    요청된 유형에 맞는 컴파일된 프롬프트 템플릿을 반환합니다.
 
     Args:
-        prompt_type (str): "passage", "question", "answer" 중 하나
+        prompt_type (str): "passage", "passage_batch", "question", "question_answer", "answer", "json_repair" 중 하나
 
     Returns:
-        str: 해당 프롬프트 템플릿 문자열
+        CompiledPrompt: 고정 앞부분(prefix), 요청 정보 템플릿(payload_template), 필드 목록(fields)
     """
-    if prompt_type == "passage":
-        return PASSAGE_GENERATION_PROMPT
-    elif prompt_type == "question":
-        return QUESTION_GENERATION_PROMPT
-    elif prompt_type == "answer":
-        return ANSWER_GENERATION_PROMPT
-    else:
-        raise ValueError(f"'{prompt_type}'은(는) 유효한 프롬프트 유형이 아닙니다.")
+    try:
+        return PROMPTS[prompt_type]
+    except KeyError:
+        raise ValueError(f"'{prompt_type}'은(는) 유효한 프롬프트 유형이 아닙니다.") from None
+
+
+def prompt_fields(prompt_type):
+    """프롬프트 유형이 요구하는 매개변수 이름 목록"""
+    return get_prompt(prompt_type).fields
+
 
 def format_prompt(prompt_type, **kwargs):
     """
     지정된 프롬프트 템플릿에 값을 채워서 반환합니다.
-    
+
     Args:
-        prompt_type (str): "passage", "question", "answer" 중 하나
-        **kwargs: 프롬프트에 채울 값들
-    
+        prompt_type (str): get_prompt 참고
+        **kwargs: 프롬프트에 채울 값들 (템플릿의 필드와 정확히 일치해야 함)
+
     Returns:
-        str: 내용이 채워진 완성된 프롬프트
+        Prompt: 내용이 채워진 완성된 프롬프트 (고정 앞부분은 static_prefix 속성)
+
+    Raises:
+        PromptParameterError: 빠진 값, 알 수 없는 값, None 값이 있는 경우
     """
-    template = get_prompt(prompt_type)
-    
-    try:
-        return template.format(**kwargs)
-    except KeyError as e:
-        print(f"프롬프트 포맷팅 오류: {e} 키가 누락되었습니다.")
-        # 누락된 키가 있어도 일단 템플릿을 반환하여 디버깅을 돕습니다.
-        return template
+    return get_prompt(prompt_type).format(**kwargs)
+
+
+def record_prompt_bytes(prompt_type, prompt):
+    """실제로 보낸 프롬프트 하나의 전체/고정 앞부분 바이트 수 기록 (Prompt가 아닌 문자열은 앞부분 0)"""
+    prefix = getattr(prompt, "static_prefix", "")
+    with _metrics_lock:
+        metrics = _metrics[prompt_type]
+        metrics["calls"] += 1
+        metrics["prompt_bytes"] += len(prompt.encode("utf-8"))
+        metrics["prefix_bytes"] += len(prefix.encode("utf-8"))
+
+
+def get_prompt_metrics():
+    """
+    유형별로 보낸 프롬프트 바이트 통계
+
+    Returns:
+        dict: 유형 → {"calls", "prompt_bytes"(전체), "prefix_bytes"(고정 앞부분), "payload_bytes"(호출마다 보내야 하는 부분)}
+    """
+    with _metrics_lock:
+        return {
+            prompt_type: dict(metrics, payload_bytes=metrics["prompt_bytes"] - metrics["prefix_bytes"])
+            for prompt_type, metrics in _metrics.items()
+        }
@@ -0,0 +1,333 @@
+"""
+LLM 호출 속도와 동시 호출 수를 조절하는 파일
+
+호출을 병렬로 보내면 순간적으로 몰린 요청이 Gemini의 분당 요청/토큰 한도를 넘어 429(ResourceExhausted)
+오류가 연달아 발생합니다. 한 모델의 모든 호출이 공유하는 AdaptiveRateLimiter가
+- 분당 요청 수(LLM_RPM)와 분당 토큰 수(LLM_TPM) 토큰 버킷
+- 한도 초과 오류가 나면 절반으로 줄고 성공할 때마다 조금씩 늘어나는 AIMD 동시 호출 창
+으로 호출을 통과시키므로, 처리량은 한도 근처를 유지하면서 오류가 몰리지 않습니다.
+토큰 버킷은 호출 전에 (프롬프트 + 예상 출력) 토큰을 차감하고, 응답을 받은 뒤 실제 길이로 정산합니다.
+제공자의 한도는 모델마다 따로 있으므로 조절기도 모델마다 두고, RateLimitedBackend로 모델 백엔드를 감싸
+대체 모델로 넘기는 시도(model_router.py)도 각자 그 모델의 자리를 차지하고 한도 초과 오류를 창에 반영합니다.
+
+- RATE_LIMIT: 1이면 사용 (기본값 1)
+- LLM_RPM / LLM_TPM: 분당 요청 수 / 토큰 수 한도 (0이면 제한 없음, 기본값 0)
+- LLM_RPM_<모델> / LLM_TPM_<모델>: 모델별 한도 (예: LLM_RPM_GEMINI_2_5_FLASH, 없으면 LLM_RPM / LLM_TPM)
+- LLM_MAX_CONCURRENCY / LLM_MIN_CONCURRENCY: 동시 호출 창의 상한/하한 (기본값 8 / 1)
+- LLM_OUTPUT_TOKEN_RESERVE: 호출 전에 미리 차감할 예상 출력 토큰 수 (기본값 2000)
+- LLM_BURST_FRACTION: 분당 한도 중 한꺼번에 보낼 수 있는 비율 (기본값 0.1)
+- LLM_LOW_PRIORITY_SHARE: 낮은 우선순위 호출(문항 미리 생성 등)이 쓸 수 있는 동시 호출 창과 분당 한도의 비율 (기본값 0.2)
+
+낮은 우선순위 호출은 low_priority() 블록 안에서 보낸 호출이며, 기다리는 일반 호출이 있으면 통과하지 않고
+동시 호출 창과 분당 한도 중 LLM_LOW_PRIORITY_SHARE 비율까지만 사용합니다. 호출 우선순위는 ContextVar로 전달하므로,
+블록 안에서 다른 스레드에 넘기는 함수는 bind_priority로 감싸야 같은 우선순위로 호출됩니다.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from token_budget import estimate_tokens
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT', '1') == '1'
+LLM_RPM = float(os.getenv('LLM_RPM', 0))
+LLM_TPM = float(os.getenv('LLM_TPM', 0))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+LLM_MIN_CONCURRENCY = int(os.getenv('LLM_MIN_CONCURRENCY', 1))
+LLM_OUTPUT_TOKEN_RESERVE = int(os.getenv('LLM_OUTPUT_TOKEN_RESERVE', 2000))
+LLM_BURST_FRACTION = float(os.getenv('LLM_BURST_FRACTION', 0.1))
+LLM_LOW_PRIORITY_SHARE = float(os.getenv('LLM_LOW_PRIORITY_SHARE', 0.2))
+
+# 현재 호출의 우선순위 (True면 낮은 우선순위)
+_low_priority = ContextVar("llm_low_priority", default=False)
+
+
+@contextmanager
+def low_priority():
+    """블록 안에서 보내는 LLM 호출을 낮은 우선순위로 표시"""
+    token = _low_priority.set(True)
+    try:
+        yield
+    finally:
+        _low_priority.reset(token)
+
+
+def bind_priority(fn):
+    """현재 호출 우선순위를 다른 스레드에서 실행할 함수에 전달 (일반 우선순위면 그대로 반환)"""
+    if not _low_priority.get():
+        return fn
+
+    def run(*args, **kwargs):
+        with low_priority():
+            return fn(*args, **kwargs)
+    return run
+
+# 한도 초과 오류로 보는 예외 메시지/클래스 이름 조각
+_THROTTLE_MARKERS = ("429", "resourceexhausted", "resource_exhausted", "resource exhausted", "quota",
+                     "rate limit", "ratelimit", "too many requests")
+
+
+def is_throttle_error(error):
+    """예외가 제공자의 한도 초과(429/쿼터) 오류인지 확인"""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _THROTTLE_MARKERS)
+
+
+class TokenBucket:
+    """
+    분당 한도를 넘지 않는 토큰 버킷 (한도가 0이면 제한 없음)
+
+    제공자는 최근 1분 동안의 사용량으로 한도를 검사하므로, 버킷 용량(순간 허용량)과 1분 동안 채워지는 양의
+    합이 한도와 같도록 한도의 burst_fraction만큼을 용량으로, 나머지를 채우는 속도로 나눕니다.
+    따라서 어느 1분 구간에서도 통과한 양이 한도를 넘지 않습니다.
+    """
+
+    def __init__(self, limit_per_minute, burst_fraction=None):
+        burst_fraction = LLM_BURST_FRACTION if burst_fraction is None else burst_fraction
+        self.limited = limit_per_minute > 0
+        self.capacity = min(max(1.0, limit_per_minute * burst_fraction), limit_per_minute / 2) if self.limited else 0.0
+        self.rate = (limit_per_minute - self.capacity) / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """amount를 꺼내려면 기다려야 할 시간 (초)"""
+        if not self.limited:
+            return 0.0
+        self._refill(now)
+        # 용량보다 큰 요청은 버킷이 가득 찼을 때 통과 (이후 잔량이 음수가 되어 다음 요청이 기다림)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount):
+        if self.limited:
+            self.level -= amount
+
+    def drain(self):
+        if self.limited:
+            self.level = min(self.level, 0.0)
+
+    def refund(self, amount):
+        """미리 차감한 양과 실제 사용량의 차이 정산 (음수면 추가 차감)"""
+        if self.limited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+def model_quota(name, model, default):
+    """모델별 분당 한도 환경변수 값 (예: LLM_RPM_GEMINI_2_5_FLASH, 없으면 default)"""
+    value = os.getenv(f"{name}_{re.sub(r'[^A-Z0-9]+', '_', model.upper())}")
+    return float(value) if value else default
+
+
+class AdaptiveRateLimiter:
+    """토큰 버킷 + AIMD 동시 호출 창으로 LLM 호출을 조절"""
+
+    def __init__(self, rpm=None, tpm=None, max_concurrency=None, min_concurrency=None, initial_window=None,
+                 low_priority_share=None):
+        """
+        Args:
+            rpm: 분당 요청 수 한도 (기본값: LLM_RPM, 0이면 제한 없음)
+            tpm: 분당 토큰 수 한도 (기본값: LLM_TPM, 0이면 제한 없음)
+            max_concurrency: 동시 호출 창 상한 (기본값: LLM_MAX_CONCURRENCY)
+            min_concurrency: 동시 호출 창 하한 (기본값: LLM_MIN_CONCURRENCY)
+            initial_window: 처음 동시 호출 창 (기본값: 상한)
+            low_priority_share: 낮은 우선순위 호출이 쓸 수 있는 동시 호출 창과 분당 한도의 비율
+                                (기본값: LLM_LOW_PRIORITY_SHARE)
+        """
+        rpm = LLM_RPM if rpm is None else rpm
+        tpm = LLM_TPM if tpm is None else tpm
+        self.low_share = min(1.0, max(0.01, low_priority_share or LLM_LOW_PRIORITY_SHARE))
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        # 낮은 우선순위 호출은 공용 버킷과 함께 분당 한도의 low_share만큼인 별도 버킷도 통과해야 함
+        self.low_requests = TokenBucket(rpm * self.low_share)
+        self.low_tokens = TokenBucket(tpm * self.low_share)
+        self.max_window = max(1, max_concurrency or LLM_MAX_CONCURRENCY)
+        self.min_window = max(1, min(self.max_window, min_concurrency or LLM_MIN_CONCURRENCY))
+        self.window = float(initial_window or self.max_window)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.low_in_flight = 0
+        self.low_waiting = 0
+        self.successes = 0
+        self.throttles = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def for_model(cls, model):
+        """모델 하나의 조절기 (LLM_RPM_<모델> / LLM_TPM_<모델>이 있으면 그 한도 사용)"""
+        return cls(rpm=model_quota('LLM_RPM', model, LLM_RPM), tpm=model_quota('LLM_TPM', model, LLM_TPM))
+
+    def acquire(self, estimated_tokens, low_priority=None):
+        """
+        동시 호출 창과 두 버킷에 여유가 생길 때까지 기다린 뒤 호출 자리 차지
+
+        낮은 우선순위 호출은 기다리는 일반 호출이 없고, 진행 중인 낮은 우선순위 호출이 창의 low_share 미만이며,
+        낮은 우선순위 버킷에도 여유가 있을 때만 통과합니다.
+
+        Args:
+            low_priority: 낮은 우선순위 호출 여부 (기본값: low_priority() 블록 안인지)
+
+        Returns:
+            float: 기다린 시간 (초)
+        """
+        low = _low_priority.get() if low_priority is None else low_priority
+        buckets = ((self.requests, self.low_requests), (self.tokens, self.low_tokens)) if low else \
+            ((self.requests,), (self.tokens,))
+        start = time.monotonic()
+        with self._cond:
+            if low:
+                self.low_waiting += 1
+            else:
+                self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.in_flight < int(self.window) and not (low and self._low_blocked()):
+                        delay = max([bucket.wait_time(1, now) for bucket in buckets[0]]
+                                    + [bucket.wait_time(estimated_tokens, now) for bucket in buckets[1]])
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                for bucket in buckets[0]:
+                    bucket.take(1)
+                for bucket in buckets[1]:
+                    bucket.take(estimated_tokens)
+                self.in_flight += 1
+                if low:
+                    self.low_in_flight += 1
+            finally:
+                if low:
+                    self.low_waiting -= 1
+                else:
+                    self.waiting -= 1
+            waited = time.monotonic() - start
+            self.total_wait += waited
+        return waited
+
+    def _low_blocked(self):
+        """낮은 우선순위 호출이 양보해야 하는지 (기다리는 일반 호출이 있거나 창의 low_share를 다 씀)"""
+        return self.waiting > 0 or self.low_in_flight >= max(1, int(self.window * self.low_share))
+
+    def release(self, estimated_tokens, used_tokens=None, error=None, low_priority=False):
+        """
+        호출 결과를 반영하고 자리 반환
+
+        성공하면 창을 1/창 크기만큼 늘리고 (호출 창 하나가 모두 성공하면 +1),
+        한도 초과 오류면 창을 절반으로 줄이고 버킷의 순간 허용량을 비웁니다. 동시에 진행 중이던 호출들이 함께 실패해도
+        마지막 감소 이후 1초 안의 오류는 한 번으로 봅니다.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if low_priority:
+                self.low_in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.refund(estimated_tokens - used_tokens)
+                if low_priority:
+                    self.low_tokens.refund(estimated_tokens - used_tokens)
+            if error is None:
+                self.successes += 1
+                self.window = min(self.max_window, self.window + 1.0 / self.window)
+            elif is_throttle_error(error):
+                self.throttles += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= 1.0:
+                    self.window = max(self.min_window, self.window / 2)
+                    self._last_decrease = now
+                    # 한도 추정이 실제보다 컸으므로 쌓아 둔 순간 허용량도 비움
+                    self.requests.drain()
+                    self.tokens.drain()
+            else:
+                self.failures += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, estimated_tokens):
+        """
+        호출 하나를 감싸는 컨텍스트 (예외는 결과에 반영한 뒤 그대로 전달)
+
+        Yields:
+            dict: 호출이 끝난 뒤 실제 사용 토큰 수를 넣을 수 있는 {"used_tokens": None}
+        """
+        low = _low_priority.get()
+        self.acquire(estimated_tokens, low)
+        usage = {"used_tokens": None}
+        try:
+            yield usage
+        except GeneratorExit:
+            # 스트리밍 응답을 소비자가 중간에 닫은 경우 (오류 아님)
+            self.release(estimated_tokens, usage["used_tokens"], low_priority=low)
+            raise
+        except BaseException as e:
+            self.release(estimated_tokens, usage["used_tokens"], e, low_priority=low)
+            raise
+        self.release(estimated_tokens, usage["used_tokens"], low_priority=low)
+
+    def stats(self):
+        """현재 상태와 누적 지표"""
+        with self._cond:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket.limited:
+                    bucket._refill(now)
+            return {
+                "window": round(self.window, 2),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "low_priority_in_flight": self.low_in_flight,
+                "low_priority_waiting": self.low_waiting,
+                "successes": self.successes,
+                "throttles": self.throttles,
+                "failures": self.failures,
+                "total_wait": round(self.total_wait, 3),
+                "rpm_limit": self.requests.rate * 60 + self.requests.capacity,
+                "rpm_available": round(self.requests.level, 1) if self.requests.limited else None,
+                "tpm_limit": self.tokens.rate * 60 + self.tokens.capacity,
+                "tpm_available": round(self.tokens.level) if self.tokens.limited else None,
+            }
+
+
+class RateLimitedBackend:
+    """
+    모델 백엔드의 호출마다 조절기 자리를 차지하게 감싸는 래퍼 (나머지 속성은 감싼 백엔드 그대로)
+
+    호출 전에 프롬프트와 예상 출력 토큰을 분당 토큰 버킷에서 차감하고, 응답을 받으면 실제 길이로 정산합니다.
+    """
+
+    def __init__(self, backend, limiter):
+        self.backend = backend
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def generate(self, prompt, prompt_type=None):
+        prompt_tokens = estimate_tokens(prompt)
+        with self.limiter.slot(prompt_tokens + LLM_OUTPUT_TOKEN_RESERVE) as usage:
+            text = self.backend.generate(prompt, prompt_type)
+            usage["used_tokens"] = prompt_tokens + estimate_tokens(text)
+        return text
+
+    def generate_stream(self, prompt, prompt_type=None):
+        # 응답이 끝날 때까지 동시 호출 자리를 차지
+        prompt_tokens = estimate_tokens(prompt)
+        with self.limiter.slot(prompt_tokens + LLM_OUTPUT_TOKEN_RESERVE) as usage:
+            output = []
+            for chunk in self.backend.generate_stream(prompt, prompt_type):
+                output.append(chunk)
+                yield chunk
+            usage["used_tokens"] = prompt_tokens + estimate_tokens("".join(output))
@@ -0,0 +1,227 @@
+"""
+생성된 지문/예문의 길이와 난이도를 로컬에서 측정하는 파일
+
+build_prompt_params_for_distribution은 난이도(하/중/상)마다 지문 80/100/120단어, 예문 10/12/15단어를
+요구하지만 응답이 이를 지켰는지는 확인하지 않았습니다. 지문/예문마다
+- 단어 수, 문장 수, 평균 문장 길이
+- 단어 인덱스 기준 basic/middle/high/목록 외 단어 수 (vocabulary_profile과 같은 원형 분석)
+- Flesch-Kincaid 학년 지수 (음절 수는 모음 묶음 규칙으로 추정)
+를 계산하고, 분배 조각의 난이도 허용 범위(단어 수, 지문의 학년 지수와 high/목록 외 단어 비율)를 벗어나면
+알리거나 로컬에서 잘라냅니다.
+토큰별 음절 수와 레벨은 캐시하고 여러 텍스트의 합계는 NumPy bincount로 한 번에 구합니다
+(파싱된 응답의 지문/예문은 score_items로 한 번에 측정).
+
+- READABILITY_CHECK: trim(기본값, 긴 지문을 문장 경계에서 잘라내고 나머지는 알림), warn(알리기만 함),
+  reject(잘라낸 뒤에도 범위를 벗어나면 결과에서 제외), off
+- READABILITY_TOLERANCE: 목표 단어 수에서 허용하는 비율 (기본값 0.25)
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+from vocabulary_profile import LEVEL_NAMES, get_vocabulary_profiler, tokenize
+
+READABILITY_CHECK = os.getenv('READABILITY_CHECK', 'trim')
+READABILITY_TOLERANCE = float(os.getenv('READABILITY_TOLERANCE', 0.25))
+
+# 난이도별 목표 단어 수 (프롬프트 매개변수와 검사에서 함께 사용)
+PASSAGE_LENGTH = {"하": 80, "중": 100, "상": 120}
+SENTENCE_LENGTH = {"하": 10, "중": 12, "상": 15}
+
+# 난이도별 지문 Flesch-Kincaid 학년 지수 상한
+MAX_GRADE = {"하": 6.0, "중": 8.0, "상": 10.0}
+
+# 난이도별 지문의 high/목록 외 단어 비율 상한 (단어 인덱스가 로드되지 않아 모든 단어가 목록 외이면 검사하지 않음)
+MAX_HARD_WORD_RATIO = {"하": 0.2, "중": 0.3, "상": 0.4}
+
+_SENTENCE_RE = re.compile(r"[^.!?]+(?:[.!?]+[\"')\]]*|$)")
+_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+
+def count_syllables(token):
+    """모음 묶음 수로 추정한 음절 수 (끝의 묵음 e 제외, 최소 1)"""
+    count = len(_VOWEL_GROUP_RE.findall(token))
+    if token.endswith("e") and not token.endswith(("le", "ee", "ye")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def split_sentences(text):
+    """문장 목록 (마침표/물음표/느낌표 기준, 공백만 있는 조각은 제외)"""
+    return [sentence.strip() for sentence in _SENTENCE_RE.findall(text or "") if sentence.strip()]
+
+
+class ReadabilityScorer:
+    """지문/예문 길이와 난이도 측정기 (토큰별 음절 수를 캐시)"""
+
+    # 음절 캐시 최대 크기 (넘으면 비움)
+    MAX_CACHE = 200000
+
+    def __init__(self, profiler=None):
+        """
+        Args:
+            profiler: 단어 레벨을 구할 VocabularyProfiler (기본값: 프로세스 전역 분석기)
+        """
+        self.profiler = profiler
+        self._syllables = {}
+        self._lock = threading.Lock()
+
+    def syllables(self, token):
+        cached = self._syllables.get(token)
+        if cached is not None:
+            return cached
+        count = count_syllables(token)
+        with self._lock:
+            if len(self._syllables) >= self.MAX_CACHE:
+                self._syllables = {}
+            self._syllables[token] = count
+        return count
+
+    def score_many(self, texts):
+        """
+        여러 텍스트를 한 번에 측정
+
+        Returns:
+            list: 텍스트별 {"words", "sentences", "words_per_sentence", "syllables_per_word", "grade", "levels"} 목록
+        """
+        profiler = self.profiler or get_vocabulary_profiler()
+        token_lists = [tokenize(text) for text in texts]
+        tokens = [token for token_list in token_lists for token in token_list]
+        owners = np.repeat(np.arange(len(texts)), [len(token_list) for token_list in token_lists])
+
+        words = np.bincount(owners, minlength=len(texts))
+        syllables = np.bincount(owners, weights=np.fromiter((self.syllables(token) for token in tokens),
+                                                            dtype=np.float64, count=len(tokens)),
+                                minlength=len(texts))
+        codes = np.fromiter((profiler.analyze_token(token)[1] for token in tokens), dtype=np.int64, count=len(tokens))
+        levels = np.bincount(owners * len(LEVEL_NAMES) + codes,
+                             minlength=len(texts) * len(LEVEL_NAMES)).reshape(len(texts), len(LEVEL_NAMES))
+        sentences = np.maximum(1, np.fromiter((len(split_sentences(text)) for text in texts),
+                                              dtype=np.int64, count=len(texts)))
+
+        safe_words = np.maximum(1, words)
+        words_per_sentence = words / sentences
+        syllables_per_word = syllables / safe_words
+        grade = np.where(words > 0, 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 0.0)
+
+        return [
+            {
+                "words": int(words[i]),
+                "sentences": int(sentences[i]),
+                "words_per_sentence": round(float(words_per_sentence[i]), 2),
+                "syllables_per_word": round(float(syllables_per_word[i]), 2),
+                "grade": round(float(grade[i]), 2),
+                "levels": dict(zip(LEVEL_NAMES, levels[i].tolist())),
+            }
+            for i in range(len(texts))
+        ]
+
+    def score(self, text):
+        """텍스트 하나 측정 (score_many 참고)"""
+        return self.score_many([text])[0]
+
+
+_scorer = ReadabilityScorer()
+
+
+def item_body(kind, item):
+    """측정 대상 텍스트 (지문은 본문, 예문은 영어 문장)"""
+    return item.get('content', '') if kind == "passages" else item.get('english', '')
+
+
+def score_items(kind, items):
+    """지문/예문 여러 개를 한 번에 측정 (score_many 참고)"""
+    return _scorer.score_many([item_body(kind, item) for item in items]) if items else []
+
+
+def hard_word_ratio(score):
+    """high/목록 외 단어 비율 (목록에 있는 단어가 하나도 없으면 None)"""
+    levels = score["levels"]
+    if not score["words"] or levels["out_of_list"] == score["words"]:
+        return None
+    return (levels["high"] + levels["out_of_list"]) / score["words"]
+
+
+def assess(kind, item, difficulty, score=None):
+    """
+    지문/예문이 난이도 허용 범위 안에 있는지 확인
+
+    Args:
+        score: 미리 측정한 결과 (없으면 여기서 측정)
+
+    Returns:
+        tuple: (문제 목록, 측정 결과) - 범위 안이면 문제 목록이 비어 있음
+    """
+    score = score or _scorer.score(item_body(kind, item))
+    target = (PASSAGE_LENGTH if kind == "passages" else SENTENCE_LENGTH).get(difficulty)
+    problems = []
+    if target:
+        low, high = target * (1 - READABILITY_TOLERANCE), target * (1 + READABILITY_TOLERANCE)
+        if not low <= score["words"] <= high:
+            problems.append(f"{score['words']}단어 (목표 {target}단어)")
+    if kind == "passages" and difficulty in MAX_GRADE and score["grade"] > MAX_GRADE[difficulty]:
+        problems.append(f"학년 지수 {score['grade']} (상한 {MAX_GRADE[difficulty]})")
+    ratio = hard_word_ratio(score) if kind == "passages" and difficulty in MAX_HARD_WORD_RATIO else None
+    if ratio is not None and ratio > MAX_HARD_WORD_RATIO[difficulty]:
+        problems.append(f"high/목록 외 단어 {ratio:.0%} (상한 {MAX_HARD_WORD_RATIO[difficulty]:.0%})")
+    return problems, score
+
+
+def trim_passage(passage, target):
+    """
+    지문을 문장 경계에서 잘라 목표 단어 수에 가장 가깝게 만들기
+
+    번역(korean_translation)이 있으면 문장 수가 본문과 같을 때만 같은 위치에서 함께 자릅니다.
+
+    Returns:
+        dict: 잘라낸 {"content", "korean_translation"} (허용 범위 안으로 들어오는 자르기가 없으면 None)
+    """
+    sentences = split_sentences(passage.get('content', ''))
+    translation = split_sentences(passage.get('korean_translation', ''))
+    if len(sentences) < 2 or (translation and len(translation) != len(sentences)):
+        return None
+    counts = np.cumsum([len(tokenize(sentence)) for sentence in sentences])
+    low, high = target * (1 - READABILITY_TOLERANCE), target * (1 + READABILITY_TOLERANCE)
+    fits = np.flatnonzero((counts >= low) & (counts <= high))
+    if not len(fits):
+        return None
+    keep = fits[np.argmin(np.abs(counts[fits] - target))] + 1
+    trimmed = {"content": " ".join(sentences[:keep])}
+    if translation:
+        trimmed["korean_translation"] = " ".join(translation[:keep])
+    return trimmed
+
+
+def item_meets_readability(kind, item, difficulty, label="", score=None):
+    """
+    지문/예문 하나의 길이와 난이도 검사
+
+    READABILITY_CHECK가 trim 또는 reject이면 긴 지문을 제자리에서 잘라낸 뒤 다시 측정하고,
+    범위를 벗어나면 알립니다. reject일 때만 범위를 벗어난 항목에 False를 반환합니다.
+
+    Args:
+        score: score_items로 미리 측정한 결과 (없으면 여기서 측정)
+    """
+    if READABILITY_CHECK == 'off':
+        return True
+    problems, score = assess(kind, item, difficulty, score)
+    if not problems:
+        return True
+
+    target = PASSAGE_LENGTH.get(difficulty)
+    if kind == "passages" and READABILITY_CHECK in ('trim', 'reject') and target \
+            and score["words"] > target * (1 + READABILITY_TOLERANCE):
+        trimmed = trim_passage(item, target)
+        if trimmed:
+            item.update(trimmed)
+            print(f"✂️ {label} 지문 '{item.get('title', '')}' {score['words']}단어 → "
+                  f"{len(tokenize(trimmed['content']))}단어로 잘라냄")
+            problems, score = assess(kind, item, difficulty)
+            if not problems:
+                return True
+
+    name = f"지문 '{item.get('title', '')}'" if kind == "passages" else "예문"
+    print(f"⚠️ {label} {name} 난이도 범위 벗어남: {', '.join(problems)}")
+    return READABILITY_CHECK != 'reject'
@@ -0,0 +1,275 @@
+"""
+LLM 응답에서 JSON을 추출하는 파일
+
+응답 파싱은 다음 순서로 시도하며, 어느 단계에서 성공했는지 통계를 남깁니다.
+
+1. direct: 응답을 한 번 훑어 괄호 짝이 맞는 JSON 객체를 찾아 그대로 파싱
+2. repaired: 흔한 결함(마지막 쉼표, 빠진 쉼표, 문자열 안 줄바꿈, 잘린 응답)을 로컬에서 고친 뒤 파싱
+3. reprompt: 그래도 실패하면 "JSON 수정" 프롬프트로 한 번 더 요청
+4. failed / error: 모두 실패했거나 API 호출 자체가 실패한 경우
+"""
+import json
+import threading
+
+PARSE_PATHS = ("direct", "repaired", "reprompt", "failed", "error")
+
+
+class ParseMetrics:
+    """파싱 경로별 횟수 통계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, path, prompt_type=None):
+        with self._lock:
+            key = (prompt_type or "unknown", path)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self):
+        """{"by_path": {경로: 횟수}, "by_prompt_type": {유형: {경로: 횟수}}}"""
+        with self._lock:
+            counts = dict(self._counts)
+
+        by_path = {path: 0 for path in PARSE_PATHS}
+        by_prompt_type = {}
+        for (prompt_type, path), count in counts.items():
+            by_path[path] += count
+            by_prompt_type.setdefault(prompt_type, {})[path] = count
+        return {"by_path": by_path, "by_prompt_type": by_prompt_type}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = ParseMetrics()
+
+
+def find_json_object(text):
+    """
+    텍스트를 한 번 훑어 최상위 JSON 객체 찾기
+
+    코드 블록 표시(```json)나 앞뒤 설명 문장이 있어도 괄호 짝으로 객체 범위를 찾습니다.
+
+    Returns:
+        tuple: (파싱된 객체 또는 None, 복구를 시도할 후보 문자열 또는 None)
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escape = False
+    first_broken = None
+
+    for i, c in enumerate(text):
+        if depth == 0:
+            # 객체 밖의 설명 문장에 있는 따옴표는 무시
+            if c == "{":
+                depth = 1
+                start = i
+            continue
+
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+
+        if c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                candidate = text[start:i + 1]
+                try:
+                    return json.loads(candidate), candidate
+                except json.JSONDecodeError:
+                    if first_broken is None:
+                        first_broken = candidate
+
+    if depth > 0:
+        # 응답이 중간에 잘린 경우 남은 부분 전체를 후보로 사용
+        truncated = text[start:].rstrip().rstrip("`").rstrip()
+        return None, first_broken or truncated
+    return None, first_broken
+
+
+def _strip_trailing(out, chars):
+    """출력 끝의 공백을 건너뛰고 chars에 속한 문자 하나를 제거"""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] in chars:
+        del out[i]
+        return True
+    return False
+
+
+def repair_json(candidate):
+    """
+    흔한 JSON 결함을 로컬에서 고쳐 파싱
+
+    - 닫는 괄호 앞의 마지막 쉼표 제거
+    - 값 사이에 빠진 쉼표 추가 (예: `} {`, `"a"\\n"b"`)
+    - 문자열 안의 줄바꿈/탭 이스케이프
+    - 잘린 응답의 열린 문자열과 괄호 닫기, 짝이 없는 닫는 괄호 제거
+
+    Returns:
+        dict 또는 list: 고친 뒤 파싱된 객체 (실패 시 None)
+    """
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    prev = None          # 문자열 밖에서 마지막으로 출력한 의미 있는 문자 ('l'은 숫자/리터럴)
+    gap = False          # prev 뒤에 공백이 있었는지
+    key_start = None     # 아직 ':'가 오지 않은 객체 키의 출력 위치 (잘린 키 제거용)
+
+    for c in candidate:
+        if in_string:
+            if escape:
+                escape = False
+                out.append(c)
+            elif c == "\\":
+                escape = True
+                out.append(c)
+            elif c == '"':
+                in_string = False
+                out.append(c)
+                prev, gap = '"', False
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\r":
+                out.append("\\r")
+            elif c == "\t":
+                out.append("\\t")
+            else:
+                out.append(c)
+            continue
+
+        if c.isspace():
+            out.append(c)
+            gap = True
+            continue
+
+        starts_value = c in '{["' or c.isalnum() or c == "-"
+        if starts_value and (prev in ('}', ']', '"') or (prev == "l" and gap)):
+            # 값 끝 바로 뒤에 새 값이 오면 쉼표가 빠진 것
+            out.append(",")
+            prev = ","
+
+        if c in "}]":
+            _strip_trailing(out, ",")
+            expected = "{" if c == "}" else "["
+            if not stack or stack[-1] != expected:
+                continue
+            stack.pop()
+            out.append(c)
+            prev, gap = c, False
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+            prev, gap = c, False
+        elif c == '"':
+            if stack and stack[-1] == "{" and prev in ("{", ","):
+                key_start = len(out)
+            in_string = True
+            out.append(c)
+        elif c.isalnum() or c in "-+.":
+            out.append(c)
+            prev, gap = "l", False
+        else:
+            if c == ":":
+                key_start = None
+            out.append(c)
+            prev, gap = c, False
+
+    # 잘린 응답 마무리 (값 없이 끝난 키는 버림)
+    if key_start is not None:
+        del out[key_start:]
+        in_string = False
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    if _strip_trailing(out, ":"):
+        out.append(": null")
+    _strip_trailing(out, ",")
+    for opener in reversed(stack):
+        _strip_trailing(out, ",")
+        out.append("}" if opener == "{" else "]")
+
+    try:
+        return json.loads("".join(out))
+    except json.JSONDecodeError:
+        return None
+
+
+def _is_valid(data, required_keys):
+    return isinstance(data, dict) and all(key in data for key in required_keys)
+
+
+def is_parseable(text, required_keys=()):
+    """
+    로컬 복구까지만 시도해서 required_keys를 가진 JSON 객체를 얻을 수 있는지 확인 (통계에 기록하지 않음)
+
+    응답 캐시가 나중에 파싱에 실패할 응답을 저장하지 않도록 저장 전에 사용합니다.
+    """
+    if not text or text.startswith("오류 발생"):
+        return False
+    data, candidate = find_json_object(text)
+    if not _is_valid(data, required_keys) and candidate:
+        data = repair_json(candidate)
+    return _is_valid(data, required_keys)
+
+
+def parse_json_response(text, prompt_type=None, required_keys=(), reprompt=None):
+    """
+    LLM 응답에서 JSON 객체 추출
+
+    Args:
+        text: LLM 응답 텍스트
+        prompt_type: 통계용 프롬프트 유형
+        required_keys: 결과 객체에 반드시 있어야 하는 키 (예: ("passages",))
+        reprompt: 로컬 복구 실패 시 호출할 함수 (깨진 JSON 문자열 → 새 응답 텍스트)
+
+    Returns:
+        dict: 파싱된 객체 (실패 시 None)
+    """
+    if not text or text.startswith("오류 발생"):
+        metrics.record("error", prompt_type)
+        return None
+
+    data, candidate = find_json_object(text)
+    if _is_valid(data, required_keys):
+        metrics.record("direct", prompt_type)
+        return data
+
+    if candidate:
+        data = repair_json(candidate)
+        if _is_valid(data, required_keys):
+            metrics.record("repaired", prompt_type)
+            return data
+
+    if reprompt:
+        fixed_text = reprompt(candidate or text)
+        if fixed_text and not fixed_text.startswith("오류 발생"):
+            data, fixed_candidate = find_json_object(fixed_text)
+            if not _is_valid(data, required_keys) and fixed_candidate:
+                data = repair_json(fixed_candidate)
+            if _is_valid(data, required_keys):
+                metrics.record("reprompt", prompt_type)
+                return data
+
+    metrics.record("failed", prompt_type)
+    return None
+
+
+def get_parse_metrics():
+    """파싱 경로별 통계 조회"""
+    return metrics.snapshot()
@@ -0,0 +1,251 @@
+"""
+교육과정 문서 검색 인덱스를 관리하는 파일
+
+중1_영어_핵심자료.txt 등 교육과정 문서(*_핵심자료.txt)를 제목/항목 단위 조각으로 나누고,
+BM25 가중치 행렬(NumPy)로 색인하여 디스크에 저장합니다.
+문항 분배(카테고리 > 세부 카테고리)마다 관련 조각을 밀리초 단위로 찾아
+지문 생성 프롬프트에 넣습니다.
+"""
+import glob
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(BASE_DIR, ".cache", "curriculum_index.npz")
+
+_TOKEN_RE = re.compile(r"\[\d+영\d+-\d+\]|[a-z]+(?:'[a-z]+)?|[가-힣]+|\d+")
+_HANGUL_RE = re.compile(r"[가-힣]+")
+
+
+def tokenize(text):
+    """영어는 단어, 한글은 음절 2-gram(조사/어미 변화에 강함), 성취기준 코드는 통째로"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if _HANGUL_RE.fullmatch(token) and len(token) > 1:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def chunk_document(text, source="", max_chars=400):
+    """
+    문서를 검색 단위 조각으로 분할
+
+    목록 항목(*, -)은 한 줄씩, 일반 문단은 max_chars까지 묶어 하나의 조각으로 만들며,
+    각 조각 앞에 소속 제목(예: "5. 언어 형식 > 시제")을 붙입니다.
+
+    Returns:
+        list: {"source", "heading", "text"} 딕셔너리 목록
+    """
+    chunks = []
+    headings = []
+    paragraph = []
+
+    def heading_path():
+        return " > ".join(h for h in headings if h)
+
+    def flush_paragraph():
+        if paragraph:
+            chunks.append({"source": source, "heading": heading_path(), "text": " ".join(paragraph)})
+            paragraph.clear()
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line == "---":
+            flush_paragraph()
+            continue
+
+        heading = re.match(r"^(#+)\s*(.*)$", line)
+        if heading:
+            flush_paragraph()
+            depth = len(heading.group(1))
+            headings[depth - 1:] = [heading.group(2).strip()]
+            continue
+
+        bullet = re.match(r"^[*\-]\s+(.*)$", line)
+        if bullet:
+            flush_paragraph()
+            chunks.append({"source": source, "heading": heading_path(), "text": bullet.group(1).strip()})
+            continue
+
+        if sum(len(p) for p in paragraph) + len(line) > max_chars:
+            flush_paragraph()
+        paragraph.append(line)
+
+    flush_paragraph()
+    return chunks
+
+
+def find_curriculum_files(base_dir=BASE_DIR):
+    """교육과정 문서 목록 (CURRICULUM_DIR 환경변수로 추가 디렉터리 지정 가능)"""
+    directories = [base_dir]
+    if os.getenv('CURRICULUM_DIR'):
+        directories.append(os.getenv('CURRICULUM_DIR'))
+
+    paths = []
+    for directory in directories:
+        paths.extend(glob.glob(os.path.join(directory, "*_핵심자료.txt")))
+    return sorted(set(paths))
+
+
+def _fingerprint(paths):
+    """원본 문서가 바뀌었는지 판단하기 위한 (경로, 크기, 수정 시각) 목록"""
+    return [[os.path.basename(p), os.path.getsize(p), os.stat(p).st_mtime_ns] for p in paths]
+
+
+class CurriculumIndex:
+    """교육과정 문서 BM25 검색 인덱스"""
+
+    def __init__(self, chunks, vocabulary, weights, fingerprint=None):
+        """
+        Args:
+            chunks: 조각 목록
+            vocabulary: 토큰 → 열 번호
+            weights: (조각 수 × 토큰 수) BM25 가중치 행렬
+        """
+        self.chunks = chunks
+        self.vocabulary = vocabulary
+        self.weights = weights
+        self.fingerprint = fingerprint or []
+
+    @classmethod
+    def build(cls, paths, k1=1.5, b=0.75):
+        """문서들을 조각으로 나누어 BM25 가중치 행렬 생성"""
+        chunks = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                chunks.extend(chunk_document(f.read(), source=os.path.basename(path)))
+
+        token_counts = [Counter(tokenize(f"{c['heading']} {c['text']}")) for c in chunks]
+
+        vocabulary = {}
+        for counts in token_counts:
+            for token in counts:
+                vocabulary.setdefault(token, len(vocabulary))
+
+        weights = np.zeros((len(chunks), len(vocabulary)), dtype=np.float32)
+        if chunks:
+            lengths = np.array([sum(c.values()) for c in token_counts], dtype=np.float32)
+            average_length = max(float(lengths.mean()), 1.0)
+
+            document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+            for counts in token_counts:
+                for token in counts:
+                    document_frequency[vocabulary[token]] += 1
+            n = len(chunks)
+            idf = np.log(1.0 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+
+            for row, counts in enumerate(token_counts):
+                norm = k1 * (1.0 - b + b * lengths[row] / average_length)
+                for token, tf in counts.items():
+                    column = vocabulary[token]
+                    weights[row, column] = idf[column] * tf * (k1 + 1.0) / (tf + norm)
+
+        return cls(chunks, vocabulary, weights, _fingerprint(paths))
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        """인덱스를 .npz 파일로 저장"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        metadata = json.dumps(
+            {"chunks": self.chunks, "vocabulary": self.vocabulary, "fingerprint": self.fingerprint},
+            ensure_ascii=False
+        )
+        np.savez_compressed(path, weights=self.weights, metadata=np.array(metadata))
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """저장된 인덱스 읽기"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            weights = data["weights"]
+        return cls(metadata["chunks"], metadata["vocabulary"], weights, metadata["fingerprint"])
+
+    def search(self, query, k=3):
+        """
+        질의와 관련된 상위 k개 조각 검색
+
+        Returns:
+            list: (점수, 조각) 튜플 목록 (점수 내림차순, 점수 0인 조각 제외)
+        """
+        columns = [self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary]
+        if not columns or not self.chunks:
+            return []
+
+        scores = self.weights[:, columns].sum(axis=1)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top if scores[i] > 0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_curriculum_index(index_path=DEFAULT_INDEX_PATH):
+    """
+    프로세스 전역 검색 인덱스 반환
+
+    저장된 인덱스가 있고 원본 문서가 바뀌지 않았으면 불러오고, 아니면 새로 만들어 저장합니다.
+    교육과정 문서가 없으면 None을 반환합니다.
+    """
+    global _index
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is not None:
+            return _index
+
+        paths = find_curriculum_files()
+        if not paths:
+            return None
+
+        index = None
+        if os.path.exists(index_path):
+            try:
+                index = CurriculumIndex.load(index_path)
+                if index.fingerprint != _fingerprint(paths):
+                    index = None
+            except Exception as e:
+                print(f"교육과정 인덱스 로드 오류: {e}")
+                index = None
+
+        if index is None:
+            index = CurriculumIndex.build(paths)
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print(f"교육과정 인덱스 저장 오류: {e}")
+
+        _index = index
+        return _index
+
+
+def retrieve_for_distribution(dist, k=3):
+    """
+    문항 분배(카테고리 > 세부 카테고리)와 관련된 교육과정 조각 검색
+
+    Returns:
+        list: "제목: 내용" 형식의 조각 문자열 목록
+    """
+    index = get_curriculum_index()
+    if index is None:
+        return []
+
+    results = index.search(f"{dist.subcategory} {dist.category}", k=k)
+    snippets = []
+    for _, chunk in results:
+        # 가장 가까운 제목만 붙여 짧게 유지 (예: "시제: The train has arrived. (현재완료 - 완료)")
+        heading = chunk['heading'].split(" > ")[-1]
+        snippets.append(f"{heading}: {chunk['text']}" if heading else chunk['text'])
+    return snippets
@@ -0,0 +1,326 @@
+"""
+LLM 호출 재시도와 헤지 요청(hedged request)을 처리하는 파일
+
+시험지 하나는 여러 호출을 기다려야 끝나므로 가장 느린 호출(p99)이 전체 지연 시간을 정하고,
+일시적인 오류 한 번에 분배 하나가 통째로 빠집니다. 프롬프트 유형별 RetryPolicy가
+- 지터를 넣은 지수 백오프로 재시도 (400/401/403/404 등 다시 보내도 같은 오류는 재시도하지 않음)
+- 시도마다 제한 시간 (넘으면 그 시도는 버리고 다음 시도로 넘어감)
+- 재시도 예산 (재시도/헤지 수가 전체 호출의 RETRY_BUDGET_RATIO를 넘지 않도록 제한)
+- 헤지 요청 (HEDGE=1이면 응답이 같은 유형 호출의 HEDGE_PERCENTILE 지연보다 늦을 때 같은 요청을 한 번 더 보내
+  먼저 도착한 유효한 응답 사용)
+을 적용하고, 유형별 지연 분포와 어느 시도(첫 요청/헤지/재시도)가 응답했는지 기록하여 stats()로 보여줍니다.
+
+백엔드 호출은 중간에 취소할 수 없으므로 제한 시간을 넘기거나 헤지에 진 시도는 결과만 버리고 끝까지 실행됩니다.
+
+- RETRY: 1이면 사용 (기본값 1)
+- RETRY_MAX_ATTEMPTS: 최대 시도 수 (기본값: 유형별 설정)
+- RETRY_BASE_DELAY / RETRY_MAX_DELAY: 백오프 기준/최대 대기 시간 (초, 기본값 1 / 20)
+- RETRY_BUDGET_RATIO: 호출 수 대비 허용할 재시도/헤지 비율 (기본값 0.2, 처음 RETRY_BUDGET_MIN회는 항상 허용)
+- LLM_ATTEMPT_TIMEOUT_<유형>: 유형별 시도 제한 시간 (초, 예: LLM_ATTEMPT_TIMEOUT_PASSAGE=90)
+- HEDGE / HEDGE_PERCENTILE / HEDGE_MIN_SAMPLES: 헤지 사용 여부 (기본값 0), 기준 백분위 (기본값 95),
+  헤지를 시작하기 전에 모을 최소 지연 표본 수 (기본값 20)
+"""
+import collections
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from rate_limiter import bind_priority
+
+RETRY_ENABLED = os.getenv('RETRY', '1') == '1'
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 1.0))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 20.0))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.2))
+RETRY_BUDGET_MIN = int(os.getenv('RETRY_BUDGET_MIN', 10))
+HEDGE_ENABLED = os.getenv('HEDGE', '0') == '1'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+
+# 유형별 기본 설정: (최대 시도 수, 시도 제한 시간(초))
+DEFAULT_POLICIES = {
+    "passage": (3, 90),
+    "passage_batch": (3, 180),
+    "question": (3, 180),
+    "question_answer": (3, 240),
+    "answer": (3, 180),
+    "json_repair": (2, 60),
+}
+
+# 다시 보내도 결과가 같은 오류의 상태 코드
+_NON_RETRYABLE_CODES = {400, 401, 403, 404}
+
+
+class AttemptTimeout(Exception):
+    """시도 제한 시간 초과"""
+    pass
+
+
+class InvalidResponse(Exception):
+    """검증을 통과하지 못한 응답 (받은 응답 텍스트는 text)"""
+
+    def __init__(self, message, text=None):
+        super().__init__(message)
+        self.text = text
+
+
+def is_retryable(error):
+    """다시 시도하면 성공할 수 있는 오류인지 확인"""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in _NON_RETRYABLE_CODES:
+        return False
+    # 안전 필터로 막힌 응답 등은 SDK가 ValueError로 알림
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class RetryBudget:
+    """재시도/헤지 수를 전체 호출 수의 일정 비율로 제한하는 예산"""
+
+    def __init__(self, ratio=None, minimum=None):
+        self.ratio = RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.minimum = RETRY_BUDGET_MIN if minimum is None else minimum
+        self.calls = 0
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def withdraw(self):
+        """예산이 남아 있으면 한 번 사용하고 True"""
+        with self._lock:
+            if self.spent >= self.minimum + self.calls * self.ratio:
+                return False
+            self.spent += 1
+            return True
+
+
+class LatencyTracker:
+    """프롬프트 유형별 최근 성공 호출 지연 시간 (헤지 기준과 stats()의 백분위에 사용)"""
+
+    def __init__(self, window=500):
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, prompt_type, latency):
+        with self._lock:
+            self._samples[prompt_type].append(latency)
+
+    def percentile(self, prompt_type, q, min_samples=1):
+        """백분위 지연 시간 (표본이 min_samples보다 적으면 None)"""
+        with self._lock:
+            samples = list(self._samples.get(prompt_type, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return float(np.percentile(samples, q))
+
+
+class RetryPolicy:
+    """프롬프트 유형 하나의 재시도/헤지 설정"""
+
+    def __init__(self, prompt_type, max_attempts=None, attempt_timeout=None, base_delay=None, max_delay=None,
+                 hedge=None):
+        default_attempts, default_timeout = DEFAULT_POLICIES.get(prompt_type, (3, 180))
+        env_timeout = os.getenv(f"LLM_ATTEMPT_TIMEOUT_{(prompt_type or '').upper()}")
+        self.prompt_type = prompt_type
+        self.max_attempts = max(1, max_attempts or int(os.getenv('RETRY_MAX_ATTEMPTS', default_attempts)))
+        self.attempt_timeout = attempt_timeout or float(env_timeout or default_timeout)
+        self.base_delay = RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
+
+    def backoff(self, retry):
+        """retry번째 재시도 전 대기 시간 (0 ~ 기준 * 2^(retry-1) 사이의 균등 지터)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+class RetryingCaller:
+    """유형별 RetryPolicy로 호출을 실행하고 시도 결과를 기록"""
+
+    def __init__(self, max_workers=64, budget=None, latencies=None):
+        self.budget = budget or RetryBudget()
+        self.latencies = latencies or LatencyTracker()
+        self._policies = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-attempt")
+        self._counters = collections.defaultdict(collections.Counter)
+        self._lock = threading.Lock()
+
+    def policy(self, prompt_type):
+        with self._lock:
+            if prompt_type not in self._policies:
+                self._policies[prompt_type] = RetryPolicy(prompt_type)
+            return self._policies[prompt_type]
+
+    def set_policy(self, policy):
+        """유형별 설정 교체"""
+        with self._lock:
+            self._policies[policy.prompt_type] = policy
+
+    def _count(self, prompt_type, key, amount=1):
+        with self._lock:
+            self._counters[prompt_type][key] += amount
+
+    def call(self, fn, prompt_type=None, validate=None):
+        """
+        fn()을 정책에 따라 실행하고 첫 번째 유효한 결과 반환
+
+        유효하지 않은 응답은 다시 시도하며, 끝내 유효한 응답을 얻지 못했지만 응답 자체는 받았다면
+        마지막으로 받은 응답을 반환하여 호출한 쪽의 복구 경로(JSON 수정 재요청 등)에 맡깁니다.
+
+        Args:
+            fn: 인자 없이 응답 텍스트를 반환하는 함수 (실패 시 예외)
+            validate: 응답이 유효한지 반환하는 함수 (기본값: 빈 문자열이 아니면 유효)
+
+        Returns:
+            str: 응답 텍스트 (모든 시도가 응답 없이 실패하면 마지막 예외 발생)
+        """
+        policy = self.policy(prompt_type)
+        validate = validate or (lambda text: bool(text and text.strip()))
+        self.budget.record_call()
+        self._count(prompt_type, "calls")
+
+        error = None
+        invalid = None
+        for attempt in range(policy.max_attempts):
+            if attempt > 0:
+                if not self.budget.withdraw():
+                    self._count(prompt_type, "budget_exhausted")
+                    break
+                self._count(prompt_type, "retries")
+                time.sleep(policy.backoff(attempt))
+            try:
+                text, hedged = self._attempt(fn, policy, validate)
+            except InvalidResponse as e:
+                self._count(prompt_type, "invalid")
+                error = e
+                invalid = e.text
+                continue
+            except AttemptTimeout as e:
+                self._count(prompt_type, "timeouts")
+                error = e
+                continue
+            except Exception as e:
+                self._count(prompt_type, "errors")
+                error = e
+                if not is_retryable(e):
+                    break
+                continue
+            winner = "hedge" if hedged else "primary" if attempt == 0 else "retry"
+            self._count(prompt_type, f"won_{winner}")
+            return text
+
+        self._count(prompt_type, "failures")
+        if invalid is not None:
+            return invalid
+        raise error
+
+    def stream(self, fn, prompt_type=None):
+        """
+        fn()이 반환하는 응답 조각 생성기를 실행하고, 첫 조각을 받기 전에 실패하면 재시도
+
+        이미 전달한 조각은 되돌릴 수 없으므로 조각을 보낸 뒤의 오류는 그대로 전달하며,
+        시도 제한 시간과 헤지는 적용하지 않습니다.
+        """
+        policy = self.policy(prompt_type)
+        self.budget.record_call()
+        self._count(prompt_type, "calls")
+
+        error = None
+        for attempt in range(policy.max_attempts):
+            if attempt > 0:
+                if not self.budget.withdraw():
+                    self._count(prompt_type, "budget_exhausted")
+                    break
+                self._count(prompt_type, "retries")
+                time.sleep(policy.backoff(attempt))
+            started = False
+            try:
+                for chunk in fn():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._count(prompt_type, "errors")
+                if started:
+                    self._count(prompt_type, "failures")
+                    raise
+                error = e
+                if not is_retryable(e):
+                    break
+                continue
+            self._count(prompt_type, "won_primary" if attempt == 0 else "won_retry")
+            return
+
+        self._count(prompt_type, "failures")
+        raise error
+
+    def _attempt(self, fn, policy, validate):
+        """
+        시도 하나 실행 (헤지 포함)
+
+        Returns:
+            tuple: (응답 텍스트, 헤지 요청이 이겼는지 여부)
+        """
+        def timed():
+            # 헤지에 지거나 제한 시간을 넘긴 호출도 끝나면 지연 시간을 기록 (백분위가 빠른 쪽으로 치우치지 않도록)
+            start = time.perf_counter()
+            text = fn()
+            self.latencies.record(policy.prompt_type, time.perf_counter() - start)
+            return text
+
+        start = time.monotonic()
+        deadline = start + policy.attempt_timeout
+        hedge_at = None
+        if policy.hedge:
+            threshold = self.latencies.percentile(policy.prompt_type, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+            if threshold is not None:
+                hedge_at = start + threshold
+
+        # 시도는 별도 스레드에서 실행되므로 호출 우선순위(rate_limiter.low_priority)를 함께 넘김
+        timed = bind_priority(timed)
+        pending = {self._executor.submit(timed): False}
+        error = None
+        invalid = None
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                if invalid is not None:
+                    raise invalid
+                raise AttemptTimeout(f"{policy.prompt_type} 호출이 {policy.attempt_timeout:.0f}초 안에 끝나지 않았습니다.")
+            timeout = min(deadline, hedge_at or deadline) - now
+            done, _ = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                hedged = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if validate(text):
+                    return text, hedged
+                invalid = InvalidResponse(f"{policy.prompt_type} 응답이 유효하지 않습니다.", text)
+
+            if hedge_at is not None and time.monotonic() >= hedge_at and pending:
+                hedge_at = None
+                if self.budget.withdraw():
+                    self._count(policy.prompt_type, "hedges")
+                    pending[self._executor.submit(timed)] = True
+        # 받은 응답이 있으면 (다른 요청이 예외로 끝났더라도) 유효하지 않은 응답으로 알림
+        raise invalid or error
+
+    def stats(self):
+        """유형별 시도 결과와 지연 시간 백분위"""
+        with self._lock:
+            counters = {prompt_type: dict(counter) for prompt_type, counter in self._counters.items()}
+        for prompt_type, counter in counters.items():
+            for q in (50, 95, 99):
+                value = self.latencies.percentile(prompt_type, q)
+                counter[f"p{q}"] = round(value, 3) if value is not None else None
+        return {
+            "by_type": counters,
+            "budget": {"calls": self.budget.calls, "spent": self.budget.spent},
+        }
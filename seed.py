@@ -0,0 +1,302 @@
+"""
+단어 목록과 교육과정 분류 체계를 데이터베이스에 적재하는 파일
+
+basic.txt / middle.txt / high.txt를 스트리밍으로 읽어 여러 행을 한 번에 INSERT하며,
+이미 있는 단어는 ON CONFLICT DO NOTHING으로 건너뜁니다. 분류 체계도 이름 기준으로
+없는 항목만 추가하므로 배포 때마다 다시 실행해도 안전합니다.
+
+사용법:
+    python seed.py                  # 단어 + 분류 체계
+    python seed.py --words-only
+    python seed.py --taxonomy-only --batch-size 2000
+"""
+import argparse
+import os
+import re
+import time
+
+from sqlalchemy import insert
+
+from models import (GrammarCategory, GrammarTopic, ReadingType,
+                    VocabularyCategory, Word)
+from taxonomy import invalidate_taxonomy
+from vocabulary_index import refresh_vocabulary_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 레벨별 단어 파일 (앞 레벨 파일에 있는 단어가 우선)
+WORD_FILES = (
+    ("basic", "basic.txt"),
+    ("middle", "middle.txt"),
+    ("high", "high.txt"),
+)
+
+# 교육과정 분류 체계 (index.html의 세부 카테고리와 중1_영어_핵심자료.txt의 언어 형식/성취기준)
+GRAMMAR_SEED = (
+    ("명사/대명사/관사", (
+        ("재귀대명사", "You should be proud of yourself. / I myself took this picture."),
+        ("지시대명사 that", "The climate of Seoul is milder than that of New York."),
+        ("비인칭 주어 It", "It's Wednesday. / It's cold outside."),
+    )),
+    ("시제", (
+        ("과거진행", "I was studying when John called me."),
+        ("현재완료 - 완료", "The train has arrived."),
+        ("현재완료 - 경험", "Have you ever been to Florida?"),
+        ("현재완료 - 계속", "He has attended the club meetings regularly."),
+        ("과거완료", "He had already left when we arrived."),
+    )),
+    ("태", (
+        ("수동태", "The novel was written by Mark Twain."),
+        ("4형식 수동태", "A prize was given to Jasmin."),
+        ("5형식 수동태", "I was made to clean the room."),
+    )),
+    ("조동사", (
+        ("허가 (can)", "Can we sit down here?"),
+        ("의무/충고 (should)", "You should do as he says."),
+        ("강한 추측 (must)", "They must do well on the test."),
+        ("불필요 (don't have to)", "You don't have to go to school tomorrow."),
+        ("약한 추측 (may)", "He may be sick."),
+        ("과거의 습관/상태 (used to)", "There used to be a lake around here."),
+    )),
+    ("to부정사", (
+        ("형용사적 용법", "I have a book to read."),
+        ("부사적 용법 - 목적", "He came to see me."),
+        ("부사적 용법 - 감정의 원인", "Chris was glad to hear the news."),
+        ("too ... to 용법", "This story sounds too good (to be true)."),
+        ("5형식 목적격 보어", "I asked her to help me."),
+    )),
+    ("동명사", (
+        ("주어 역할", "Playing baseball is fun."),
+        ("목적어 역할", "We enjoy swimming in the pool."),
+        ("전치사의 목적어", "I'm interested in watching horror movies."),
+        ("feel like -ing", "I don't feel like sleeping now."),
+    )),
+    ("분사", (
+        ("현재분사 - 명사 수식", "The girl who is playing the piano is called Ann."),
+        ("분사구문", "(Being) tired, he went to bed."),
+        ("with + 명사 + 분사", "With the night coming, stars began to shine in the sky."),
+    )),
+    ("관계사", (
+        ("주격 관계대명사", "The girl who is playing the piano is called Ann."),
+        ("목적격 관계대명사", "This is the book (that) I bought yesterday."),
+        ("소유격 관계대명사", "I met the girl whose father is a musician."),
+        ("계속적 용법", "Mr. Lee, who teaches English, has two children."),
+        ("관계대명사 what", "Nobody understood what she said about that plan."),
+    )),
+    ("가정법", ()),
+    ("비교구문", (
+        ("원급 비교", "She is as tall as her mother (is)."),
+        ("비교급", "Mary is taller than I/me."),
+        ("비교급 강조", "A car is much more expensive than a motorbike."),
+        ("최상급", "Cindy is the shortest of the three."),
+        ("one of the 최상급 + 복수명사", "She is one of the smartest students in my class."),
+    )),
+    ("접속사", (
+        ("상관접속사 both A and B", "Both the teacher and the students enjoyed the class."),
+        ("시간 접속사 when", "When we arrived, she was talking on the phone."),
+        ("양보 접속사 although/though", "Although/Though it was cold, I went swimming."),
+        ("so ... that 구문", "The weather was so nice that we went hiking."),
+    )),
+    ("전치사", ()),
+    ("품사 및 어법", ()),
+    ("도치", ()),
+    ("생략", ()),
+    ("강조구문", ()),
+)
+
+READING_SEED = (
+    ("주제/제목 추론", "[9영01-03] 친숙한 주제에 관한 글의 중심 내용을 파악한다."),
+    ("요지/주장 파악", "[9영01-06] 필자의 의도나 목적을 추론한다."),
+    ("세부사항 파악", "[9영01-02] 친숙한 주제에 관한 글에서 세부 정보를 파악한다."),
+    ("빈칸 추론", "[9영01-04] 글에서 일이나 사건의 논리적 관계를 파악한다."),
+    ("문단 순서", "[9영01-04] 글에서 일이나 사건의 논리적 관계를 파악한다."),
+    ("문장 삽입", "[9영01-04] 글에서 일이나 사건의 논리적 관계를 파악한다."),
+    ("내용 일치/불일치", "[9영01-02] 친숙한 주제에 관한 글에서 세부 정보를 파악한다."),
+    ("글의 분위기/어조", "[9영01-05] 글에서 인물의 기분이나 감정을 추론한다."),
+    ("함축 의미 추론", "[9영01-07] 단어, 어구, 문장의 함축적 의미를 추론한다."),
+    ("연결어구 추론", "[9영01-04] 글에서 일이나 사건의 논리적 관계를 파악한다."),
+    ("문맥상 어법", None),
+)
+
+VOCABULARY_SEED = (
+    "단어의 의미", "문맥상 적절한 어휘", "어휘 추론",
+    "숙어/관용표현", "어근/접사", "동의어/반의어",
+    "다의어", "형태 변화", "어휘 배열",
+)
+
+VOCABULARY_OBJECTIVE = "중학교 1~3학년 학습 어휘(1,500단어 이내) 범위에서 어휘를 이해하고 활용한다."
+
+
+def iter_word_file(path, chunk_size=64 * 1024):
+    """쉼표/줄바꿈으로 구분된 단어 파일을 조각 단위로 읽으며 단어를 하나씩 반환"""
+    pending = ""
+    with open(path, encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            *tokens, pending = re.split(r"[,\n]", pending + chunk)
+            for token in tokens:
+                word = token.strip()
+                if word:
+                    yield word
+    word = pending.strip()
+    if word:
+        yield word
+
+
+def iter_word_rows(base_dir=BASE_DIR):
+    """모든 단어 파일의 (단어, 레벨) 행 (파일 간 중복 단어는 먼저 나온 레벨만)"""
+    seen = set()
+    for level, filename in WORD_FILES:
+        for word in iter_word_file(os.path.join(base_dir, filename)):
+            key = word.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {"word": word, "level": level}
+
+
+def _insert_ignore_conflicts(session, model, rows, index_elements):
+    """여러 행 INSERT ... ON CONFLICT DO NOTHING (삽입된 행 수 반환)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise ValueError(f"'{dialect}' 데이터베이스는 일괄 적재를 지원하지 않습니다.")
+
+    statement = dialect_insert(model).values(rows).on_conflict_do_nothing(index_elements=index_elements)
+    return session.execute(statement).rowcount
+
+
+def seed_words(db_manager, batch_size=1000, base_dir=BASE_DIR):
+    """
+    단어 파일을 words 테이블에 일괄 적재
+
+    Returns:
+        dict: 읽은 행 수, 삽입된 행 수, 소요 시간, 초당 행 수
+    """
+    start = time.perf_counter()
+    total = 0
+    inserted = 0
+    batch = []
+
+    with db_manager.session_scope() as session:
+        for row in iter_word_rows(base_dir):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted += _insert_ignore_conflicts(session, Word, batch, ["word"])
+                total += len(batch)
+                batch = []
+        if batch:
+            inserted += _insert_ignore_conflicts(session, Word, batch, ["word"])
+            total += len(batch)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": total,
+        "inserted": inserted,
+        "elapsed": elapsed,
+        "rows_per_sec": total / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _insert_missing(session, model, rows, key_columns):
+    """key_columns 기준으로 아직 없는 행만 한 번에 INSERT (삽입된 행 수 반환)"""
+    columns = [getattr(model, name) for name in key_columns]
+    existing = set(tuple(row) for row in session.query(*columns).all())
+
+    missing = []
+    for row in rows:
+        key = tuple(row[name] for name in key_columns)
+        if key not in existing:
+            existing.add(key)
+            missing.append(row)
+
+    if missing:
+        session.execute(insert(model), missing)
+    return len(missing)
+
+
+def seed_taxonomy(db_manager):
+    """
+    문법 카테고리/주제, 독해 유형, 어휘 카테고리를 이름 기준으로 없는 것만 추가
+
+    Returns:
+        dict: 테이블별 삽입된 행 수
+    """
+    start = time.perf_counter()
+    counts = {}
+
+    with db_manager.session_scope() as session:
+        counts["grammar_categories"] = _insert_missing(
+            session, GrammarCategory,
+            [{"name": name, "order_num": i + 1} for i, (name, _) in enumerate(GRAMMAR_SEED)],
+            ["name"]
+        )
+        session.flush()
+
+        category_ids = dict(session.query(GrammarCategory.name, GrammarCategory.id).all())
+        topic_rows = []
+        for category_name, topics in GRAMMAR_SEED:
+            for i, (topic_name, example) in enumerate(topics):
+                topic_rows.append({
+                    "category_id": category_ids[category_name],
+                    "name": topic_name,
+                    "order_num": i + 1,
+                    "learning_objective": f"예: {example}",
+                })
+        counts["grammar_topics"] = _insert_missing(session, GrammarTopic, topic_rows, ["category_id", "name"])
+
+        counts["reading_types"] = _insert_missing(
+            session, ReadingType,
+            [{"name": name, "description": description, "order_num": i + 1}
+             for i, (name, description) in enumerate(READING_SEED)],
+            ["name"]
+        )
+
+        counts["vocabulary_categories"] = _insert_missing(
+            session, VocabularyCategory,
+            [{"name": name, "order_num": i + 1, "learning_objective": VOCABULARY_OBJECTIVE}
+             for i, name in enumerate(VOCABULARY_SEED)],
+            ["name"]
+        )
+
+    counts["elapsed"] = time.perf_counter() - start
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="단어 목록과 교육과정 분류 체계 적재")
+    parser.add_argument("--words-only", action="store_true", help="단어만 적재")
+    parser.add_argument("--taxonomy-only", action="store_true", help="분류 체계만 적재")
+    parser.add_argument("--batch-size", type=int, default=1000, help="한 번에 INSERT할 행 수")
+    args = parser.parse_args()
+
+    from main import setup_database
+
+    db_manager = setup_database()
+    if not db_manager:
+        print("❌ 데이터베이스 연결 실패로 적재를 종료합니다.")
+        return 1
+
+    if not args.taxonomy_only:
+        result = seed_words(db_manager, batch_size=args.batch_size)
+        print(f"📚 단어 {result['rows']}개 처리, {result['inserted']}개 추가 "
+              f"({result['elapsed']:.2f}초, {result['rows_per_sec']:.0f} rows/s)")
+        refresh_vocabulary_index(db_manager)
+
+    if not args.words_only:
+        result = seed_taxonomy(db_manager)
+        print(f"🗂 분류 체계 추가: 문법 카테고리 {result['grammar_categories']}개, "
+              f"문법 주제 {result['grammar_topics']}개, 독해 유형 {result['reading_types']}개, "
+              f"어휘 카테고리 {result['vocabulary_categories']}개 ({result['elapsed']:.2f}초)")
+        invalidate_taxonomy()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+"""
+콘텐츠 생성 파이프라인을 HTTP API로 제공하는 비동기 서버 파일
+
+index.html이 만드는 ContentGenerationRequest 요청을 생성 작업(jobs.py)으로 저장한 뒤 스레드 풀에서 실행하고,
+분배별 진행 상황을 Server-Sent Events(SSE)로 전달합니다. 작업은 단계마다 체크포인트를 남기므로 서버가 중간에
+죽어도 /api/jobs/{job_id}/resume으로 완료된 단계를 다시 생성하지 않고 이어서 실행할 수 있습니다. 생성 작업은 이벤트 루프를 막지 않으므로
+한 프로세스에서 여러 교사의 요청을 동시에 처리할 수 있습니다.
+
+실행:
+    python server.py  (기본 주소 http://localhost:8080)
+
+엔드포인트:
+    GET  /                               index.html
+    GET  /api/subcategories/{category}   카테고리(문법/독해/어휘)별 세부 카테고리 목록
+    POST /api/generate                   콘텐츠 생성 (응답은 text/event-stream)
+    POST /api/jobs/{job_id}/resume       작업을 만든 사용자가 중단되거나 실패한 작업 이어서 실행 (응답은 text/event-stream)
+    GET  /api/stats                      LLM 호출/호출 조절기/재시도/응답 캐시 상태
+
+SSE 이벤트:
+    plan    문항 분배 계획
+    job     생성 작업 id (이어서 실행할 때 사용)
+    item    분배별 지문/예문이 완성될 때마다 전달
+    result  최종 결과 (지문, 예문, 문제, 답안)
+    error   요청 처리 실패
+
+문항 은행(ITEM_BANK=1)이 같은 사용자에게 같은 문제를 다시 내지 않도록 요청마다 사용자를 구분합니다.
+인증 프록시가 넣어 주는 X-User-Id 헤더를 쓰고, 없으면 브라우저마다 세션 쿠키(exam_session)를 발급해 사용합니다.
+
+POOL_WARMER=1이면 처리 중인 생성 요청이 없을 때 인기 분배 조각의 문항을 미리 생성합니다 (pool_warmer.py 참고).
+"""
+import asyncio
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from aiohttp import web
+
+from jobs import JobStore, run_job
+from main import calculate_question_distribution, get_distribution_info, get_llm_stats, setup_database
+from models import ContentGenerationRequest
+from pool_warmer import PoolWarmer
+from taxonomy import get_taxonomy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 동시에 진행할 최대 생성 요청 수 (요청마다 내부에서 지문 생성 스레드 풀을 따로 사용)
+SERVER_MAX_JOBS = int(os.getenv('SERVER_MAX_JOBS', 8))
+
+# 1이면 한가할 때 인기 분배 조각의 문항을 미리 생성
+POOL_WARMER_ENABLED = os.getenv('POOL_WARMER', '0') == '1'
+
+# 사용자 식별 헤더가 없을 때 쓰는 세션 쿠키 이름과 유지 기간 (초)
+SESSION_COOKIE = "exam_session"
+SESSION_MAX_AGE = 365 * 24 * 3600
+
+json_response = partial(web.json_response, dumps=partial(json.dumps, ensure_ascii=False))
+
+DB_MANAGER_KEY = web.AppKey("db_manager", object)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+ACTIVE_REQUESTS_KEY = web.AppKey("active_requests", dict)
+WARMER_KEY = web.AppKey("warmer", object)
+
+
+def serialize_distribution(dist):
+    """문항 분배를 JSON으로 보낼 수 있는 딕셔너리로 변환"""
+    return {
+        "category": dist.category,
+        "subcategory": dist.subcategory,
+        "count": dist.count,
+        "difficulty_level": dist.difficulty_level,
+        "distribution_info": get_distribution_info(dist),
+    }
+
+
+def format_event(event, data):
+    """SSE 이벤트 한 건의 전송 형식"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def request_user_id(request):
+    """
+    요청한 사용자 id (X-User-Id 헤더, 없으면 세션 쿠키)
+
+    Returns:
+        tuple: (사용자 id, 새로 발급해야 하는 세션 쿠키 값 또는 None)
+    """
+    user_id = request.headers.get("X-User-Id", "").strip()
+    if user_id:
+        return user_id[:100], None
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if session_id:
+        return f"session:{session_id[:64]}", None
+    session_id = uuid.uuid4().hex
+    return f"session:{session_id}", session_id
+
+
+async def index(request):
+    return web.FileResponse(os.path.join(BASE_DIR, "index.html"))
+
+
+async def subcategories(request):
+    """카테고리별 세부 카테고리 목록 (분류 체계 스냅샷에서 조회)"""
+    db_manager = request.app[DB_MANAGER_KEY]
+    if db_manager is None:
+        return json_response({"error": "데이터베이스에 연결되지 않았습니다."}, status=503)
+
+    category = request.match_info["category"]
+    loop = asyncio.get_running_loop()
+    # 스냅샷이 없을 때만 DB를 읽으며, 생성 작업이 밀려 있어도 기다리지 않도록 기본 실행기 사용
+    snapshot = await loop.run_in_executor(None, get_taxonomy, db_manager)
+    return json_response(snapshot.subcategories(category))
+
+
+async def stats(request):
+    """LLM 호출 통계, 호출 조절기 상태, 유형별 재시도/헤지 결과와 지연 시간 백분위, 응답 캐시 통계"""
+    loop = asyncio.get_running_loop()
+    # 캐시 통계는 SQLite를 읽으므로 기본 실행기에서 조회
+    data = await loop.run_in_executor(None, get_llm_stats)
+    data["active_requests"] = request.app[ACTIVE_REQUESTS_KEY]["count"]
+    return json_response(data)
+
+
+async def generate(request):
+    """콘텐츠 생성 요청을 작업으로 만들어 실행하며 진행 상황을 SSE로 전달"""
+    db_manager = request.app[DB_MANAGER_KEY]
+    if db_manager is None:
+        return json_response({"error": "데이터베이스에 연결되지 않았습니다."}, status=503)
+
+    try:
+        payload = await request.json()
+        content_request = ContentGenerationRequest(**payload)
+        distributions = calculate_question_distribution(content_request)
+    except Exception as e:
+        return json_response({"error": f"잘못된 요청입니다: {e}"}, status=400)
+
+    user_id, new_session = request_user_id(request)
+
+    def start(emit, on_item):
+        job_id = JobStore(db_manager).create_job(content_request, user_id=user_id)
+        emit("job", {"job_id": job_id})
+        return run_job(db_manager, job_id, on_item=on_item)
+
+    return await stream_job(request, distributions, start, new_session)
+
+
+async def resume(request):
+    """
+    중단되거나 실패한 작업을 이어서 실행하며 진행 상황을 SSE로 전달 (완료된 단계는 다시 생성하지 않음)
+
+    작업을 만든 사용자(X-User-Id 헤더 또는 세션 쿠키)만 이어서 실행할 수 있으며, 다른 사용자의 작업은 없는 작업처럼 404로 응답합니다.
+    """
+    db_manager = request.app[DB_MANAGER_KEY]
+    if db_manager is None:
+        return json_response({"error": "데이터베이스에 연결되지 않았습니다."}, status=503)
+
+    try:
+        job_id = int(request.match_info["job_id"])
+    except ValueError:
+        return json_response({"error": "작업 id는 정수여야 합니다."}, status=400)
+
+    user_id, _ = request_user_id(request)
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, JobStore(db_manager).get_job, job_id)
+    if job is None or job.user_id != user_id:
+        return json_response({"error": f"{job_id}번 작업이 없습니다."}, status=404)
+    distributions = calculate_question_distribution(ContentGenerationRequest(**json.loads(job.payload)))
+
+    def start(emit, on_item):
+        emit("job", {"job_id": job_id})
+        return run_job(db_manager, job_id, on_item=on_item)
+
+    return await stream_job(request, distributions, start)
+
+
+async def stream_job(request, distributions, start, new_session=None):
+    """
+    start(emit, on_item)를 생성 스레드 풀에서 실행하며 진행 상황을 SSE로 전달
+
+    start는 생성 스레드에서 emit(event, data)로 이벤트를 보내고 최종 결과를 반환합니다.
+    new_session을 주면 응답을 시작하기 전에 세션 쿠키로 발급합니다.
+    """
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    if new_session:
+        response.set_cookie(SESSION_COOKIE, new_session, max_age=SESSION_MAX_AGE, httponly=True, samesite="Lax")
+    await response.prepare(request)
+    await response.write(format_event("plan", [serialize_distribution(d) for d in distributions]))
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def emit(event, data):
+        # 생성 스레드에서 호출되므로 이벤트 루프로 넘겨서 전송
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def on_item(dist, kind, item):
+        emit("item", {"distribution": get_distribution_info(dist), "kind": kind, "item": item})
+
+    def run():
+        try:
+            return start(emit, on_item)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    active = request.app[ACTIVE_REQUESTS_KEY]
+    active["count"] += 1
+    future = loop.run_in_executor(request.app[EXECUTOR_KEY], run)
+    future.add_done_callback(lambda _: active.update(count=active["count"] - 1))
+    try:
+        while True:
+            message = await queue.get()
+            if message is done:
+                break
+            await response.write(format_event(*message))
+
+        try:
+            results = await future
+        except Exception as e:
+            await response.write(format_event("error", {"error": str(e)}))
+        else:
+            if results is None:
+                await response.write(format_event("error", {"error": "작업을 찾을 수 없습니다."}))
+            else:
+                results = dict(results)
+                results["distributions"] = [serialize_distribution(d) for d in results.get("distributions") or []]
+                await response.write(format_event("result", results))
+    except ConnectionResetError:
+        # 클라이언트가 연결을 끊어도 이미 시작된 생성은 끝까지 진행되어 작업과 캐시에 남음
+        print("클라이언트 연결이 끊어져 진행 상황 전송을 중단합니다.")
+        return response
+
+    await response.write_eof()
+    return response
+
+
+async def on_startup(app):
+    loop = asyncio.get_running_loop()
+    app[DB_MANAGER_KEY] = await loop.run_in_executor(None, setup_database)
+
+
+async def start_warmer(app):
+    if app[DB_MANAGER_KEY] is None:
+        return
+    active = app[ACTIVE_REQUESTS_KEY]
+    app[WARMER_KEY] = PoolWarmer(app[DB_MANAGER_KEY], is_idle=lambda: active["count"] == 0)
+    app[WARMER_KEY].start()
+
+
+async def on_cleanup(app):
+    if app.get(WARMER_KEY) is not None:
+        await asyncio.get_running_loop().run_in_executor(None, app[WARMER_KEY].stop)
+    if app[DB_MANAGER_KEY] is not None and app[DB_MANAGER_KEY].engine is not None:
+        app[DB_MANAGER_KEY].engine.dispose()
+    app[EXECUTOR_KEY].shutdown(wait=False)
+
+
+def create_app(db_manager=None, max_jobs=None, warmer=None):
+    """
+    aiohttp 애플리케이션 생성
+
+    Args:
+        db_manager: 사용할 데이터베이스 매니저 (없으면 시작 시 setup_database로 연결)
+        max_jobs: 동시에 진행할 최대 생성 요청 수 (기본값: SERVER_MAX_JOBS)
+        warmer: True이면 한가할 때 문항을 미리 생성 (기본값: POOL_WARMER 환경변수)
+    """
+    app = web.Application()
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=max_jobs or SERVER_MAX_JOBS)
+    app[DB_MANAGER_KEY] = db_manager
+    app[ACTIVE_REQUESTS_KEY] = {"count": 0}
+    if db_manager is None:
+        app.on_startup.append(on_startup)
+    if POOL_WARMER_ENABLED if warmer is None else warmer:
+        app.on_startup.append(start_warmer)
+    app.on_cleanup.append(on_cleanup)
+
+    app.router.add_get("/", index)
+    app.router.add_get("/api/subcategories/{category}", subcategories)
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/jobs/{job_id}/resume", resume)
+    app.router.add_get("/api/stats", stats)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=os.getenv('SERVER_HOST', '0.0.0.0'), port=int(os.getenv('SERVER_PORT', 8080)))
@@ -0,0 +1,86 @@
+"""
+스트리밍 응답의 점진적 JSON 파싱을 담당하는 파일
+
+LLM 응답이 조각 단위로 도착하는 동안 `passages` / `sentences` 배열을 한 글자씩 추적하여,
+배열 안의 객체가 닫히는 즉시 그 객체를 꺼냅니다. 전체 응답을 기다리지 않고
+첫 지문을 바로 보여줄 수 있습니다.
+"""
+import json
+
+
+class StreamingItemParser:
+    """최상위 객체의 지정된 배열 항목을 완성되는 대로 꺼내는 점진적 파서"""
+
+    def __init__(self, keys=("passages", "sentences")):
+        """
+        Args:
+            keys: 항목을 꺼낼 최상위 배열 키
+        """
+        self.keys = set(keys)
+        self.errors = 0
+        self._text = ""
+        self._pos = 0
+        self._stack = []  # [괄호, 키] (객체는 현재 키, 배열은 배열의 키)
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._item_start = None
+        self._item_key = None
+
+    @property
+    def text(self):
+        """지금까지 받은 전체 텍스트"""
+        return self._text
+
+    def feed(self, chunk):
+        """
+        응답 조각을 추가하고 새로 완성된 항목 반환
+
+        Returns:
+            list: (배열 키, 항목 객체) 튜플 목록
+        """
+        self._text += chunk
+        text = self._text
+        completed = []
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":":
+                if self._stack and self._stack[-1][0] == "{":
+                    self._stack[-1][1] = self._last_string
+            elif c == "{" or c == "[":
+                parent = self._stack[-1] if self._stack else None
+                if c == "{" and parent and parent[0] == "[" and parent[1] in self.keys \
+                        and len(self._stack) == 2 and self._item_start is None:
+                    self._item_start = i
+                    self._item_key = parent[1]
+                key = parent[1] if parent and parent[0] == "{" else None
+                self._stack.append([c, key])
+            elif c == "}" or c == "]":
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and self._item_start is not None and len(self._stack) == 2:
+                    try:
+                        completed.append((self._item_key, json.loads(text[self._item_start:i + 1])))
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                    self._item_start = None
+                    self._item_key = None
+
+        self._pos = len(text)
+        return completed
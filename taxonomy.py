@@ -0,0 +1,156 @@
+"""
+문법/독해/어휘 분류 체계 스냅샷을 관리하는 파일
+
+분류 체계 테이블(문법 카테고리 → 주제 → 성취기준, 독해 유형, 어휘 카테고리 → 성취기준)은
+거의 바뀌지 않으므로 테이블별 쿼리 한 번씩으로 모두 읽어 불변 구조로 보관합니다.
+스냅샷은 DB마다 따로 보관하며, 요청 처리 중에는 DB를 조회하지 않고 이 스냅샷에서 id/이름으로 찾습니다.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from models import (GrammarCategory, GrammarTopic, GrammarAchievement,
+                    ReadingType, VocabularyCategory, VocabularyAchievement)
+
+GrammarCategoryInfo = namedtuple("GrammarCategoryInfo", "id name order_num topics")
+GrammarTopicInfo = namedtuple("GrammarTopicInfo", "id category_id name order_num learning_objective achievements")
+GrammarAchievementInfo = namedtuple("GrammarAchievementInfo", "id topic_id level description")
+ReadingTypeInfo = namedtuple("ReadingTypeInfo", "id name description order_num")
+VocabularyCategoryInfo = namedtuple("VocabularyCategoryInfo", "id name order_num learning_objective achievements")
+VocabularyAchievementInfo = namedtuple("VocabularyAchievementInfo", "id category_id level description")
+
+
+def _group_by(records, key):
+    groups = {}
+    for record in records:
+        groups.setdefault(getattr(record, key), []).append(record)
+    return {k: tuple(v) for k, v in groups.items()}
+
+
+class TaxonomySnapshot:
+    """분류 체계 불변 스냅샷"""
+
+    def __init__(self, version, grammar_categories, reading_types, vocabulary_categories):
+        self.version = version
+        self.grammar_categories = tuple(grammar_categories)
+        self.reading_types = tuple(reading_types)
+        self.vocabulary_categories = tuple(vocabulary_categories)
+
+        topics = [topic for category in self.grammar_categories for topic in category.topics]
+
+        self.grammar_category_by_id = MappingProxyType({c.id: c for c in self.grammar_categories})
+        self.grammar_category_by_name = MappingProxyType({c.name: c for c in self.grammar_categories})
+        self.grammar_topic_by_id = MappingProxyType({t.id: t for t in topics})
+        self.grammar_topic_by_name = MappingProxyType({t.name: t for t in topics})
+        self.reading_type_by_id = MappingProxyType({r.id: r for r in self.reading_types})
+        self.reading_type_by_name = MappingProxyType({r.name: r for r in self.reading_types})
+        self.vocabulary_category_by_id = MappingProxyType({c.id: c for c in self.vocabulary_categories})
+        self.vocabulary_category_by_name = MappingProxyType({c.name: c for c in self.vocabulary_categories})
+
+    @classmethod
+    def load(cls, db_manager, version=0):
+        """분류 체계 테이블을 하나의 세션에서 테이블별 쿼리 한 번씩으로 읽어 스냅샷 생성"""
+        with db_manager.session_scope() as session:
+            category_rows = session.query(
+                GrammarCategory.id, GrammarCategory.name, GrammarCategory.order_num
+            ).order_by(GrammarCategory.order_num).all()
+            topic_rows = session.query(
+                GrammarTopic.id, GrammarTopic.category_id, GrammarTopic.name,
+                GrammarTopic.order_num, GrammarTopic.learning_objective
+            ).order_by(GrammarTopic.order_num).all()
+            achievement_rows = session.query(
+                GrammarAchievement.id, GrammarAchievement.topic_id,
+                GrammarAchievement.level, GrammarAchievement.description
+            ).order_by(GrammarAchievement.id).all()
+            reading_rows = session.query(
+                ReadingType.id, ReadingType.name, ReadingType.description, ReadingType.order_num
+            ).order_by(ReadingType.order_num).all()
+            vocab_category_rows = session.query(
+                VocabularyCategory.id, VocabularyCategory.name,
+                VocabularyCategory.order_num, VocabularyCategory.learning_objective
+            ).order_by(VocabularyCategory.order_num).all()
+            vocab_achievement_rows = session.query(
+                VocabularyAchievement.id, VocabularyAchievement.category_id,
+                VocabularyAchievement.level, VocabularyAchievement.description
+            ).order_by(VocabularyAchievement.id).all()
+
+        achievements_by_topic = _group_by(
+            [GrammarAchievementInfo(*row) for row in achievement_rows], "topic_id"
+        )
+        topics_by_category = _group_by(
+            [GrammarTopicInfo(*row, achievements_by_topic.get(row[0], ())) for row in topic_rows],
+            "category_id"
+        )
+        grammar_categories = [
+            GrammarCategoryInfo(*row, topics_by_category.get(row[0], ())) for row in category_rows
+        ]
+
+        vocab_achievements_by_category = _group_by(
+            [VocabularyAchievementInfo(*row) for row in vocab_achievement_rows], "category_id"
+        )
+        vocabulary_categories = [
+            VocabularyCategoryInfo(*row, vocab_achievements_by_category.get(row[0], ()))
+            for row in vocab_category_rows
+        ]
+
+        reading_types = [ReadingTypeInfo(*row) for row in reading_rows]
+
+        return cls(version, grammar_categories, reading_types, vocabulary_categories)
+
+    def grammar_topics(self, category_id):
+        """카테고리별 문법 주제"""
+        category = self.grammar_category_by_id.get(category_id)
+        return category.topics if category else ()
+
+    def grammar_achievements(self, topic_id):
+        """주제별 문법 성취기준"""
+        topic = self.grammar_topic_by_id.get(topic_id)
+        return topic.achievements if topic else ()
+
+    def vocabulary_achievements(self, category_id):
+        """카테고리별 어휘 성취기준"""
+        category = self.vocabulary_category_by_id.get(category_id)
+        return category.achievements if category else ()
+
+    def subcategories(self, category):
+        """화면의 카테고리(문법/독해/어휘)별 세부 카테고리 이름 목록"""
+        if category == "문법":
+            return [c.name for c in self.grammar_categories]
+        elif category == "독해":
+            return [r.name for r in self.reading_types]
+        elif category == "어휘":
+            return [c.name for c in self.vocabulary_categories]
+        return []
+
+
+# DB별 스냅샷 (DatabaseManager.cache_key → TaxonomySnapshot)
+_snapshots = {}
+_version = 0
+_lock = threading.Lock()
+
+
+def get_taxonomy(db_manager):
+    """그 DB의 현재 분류 체계 스냅샷 반환 (없거나 무효화된 경우에만 DB에서 로드)"""
+    key = db_manager.cache_key
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and snapshot.version == _version:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None or snapshot.version != _version:
+            snapshot = _snapshots[key] = TaxonomySnapshot.load(db_manager, _version)
+        return snapshot
+
+
+def invalidate_taxonomy():
+    """분류 체계 데이터가 바뀌었음을 알림 (모든 DB의 스냅샷을 다음 조회 때 다시 로드)"""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def get_taxonomy_version():
+    """현재 분류 체계 버전"""
+    return _version
@@ -0,0 +1,160 @@
+"""
+프롬프트 토큰 추정과 단계별 토큰 예산을 관리하는 파일
+
+문항 수가 많은 시험(30~50문항)은 모든 지문을 하나의 문제 생성 프롬프트에 넣으면
+입력과 출력이 함께 커져 응답이 느려지고 중간에 잘립니다.
+단계별 예산(입력 + 예상 출력 토큰)을 넘기면 지문을 분배 단위로 나누어 여러 샤드로 생성합니다.
+
+예산은 환경변수로 조정할 수 있습니다.
+- TOKEN_BUDGET_PASSAGE: 묶음 지문 생성 요청 하나의 토큰 상한
+- TOKEN_BUDGET_QUESTION: 문제 생성 요청 하나의 토큰 상한
+- TOKEN_BUDGET_ANSWER: 답안 생성 요청 하나의 토큰 상한
+"""
+import os
+
+# 단계별 요청 하나의 기본 토큰 상한 (입력 + 예상 출력)
+DEFAULT_STAGE_BUDGETS = {
+    "passage": 6000,
+    "question": 8000,
+    "answer": 8000,
+}
+
+# 문제/답안 1개당 예상 출력 토큰 (질문, 선택지, 변형 지문, 해설 등)
+OUTPUT_TOKENS_PER_QUESTION = 300
+OUTPUT_TOKENS_PER_ANSWER = 250
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수 추정 (영문/기호는 4자당 1토큰, 한글 등 비ASCII 문자는 1자당 1토큰)"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def get_stage_budget(stage):
+    """단계별 요청 하나의 토큰 상한 (TOKEN_BUDGET_<단계> 환경변수로 변경 가능)"""
+    value = os.getenv(f"TOKEN_BUDGET_{stage.upper()}")
+    return int(value) if value else DEFAULT_STAGE_BUDGETS[stage]
+
+
+def allocate(total, weights):
+    """가중치에 따라 total을 정수로 배분 (최대 나머지 방식)"""
+    weight_sum = sum(weights)
+    if not weights or weight_sum <= 0:
+        return [0] * len(weights)
+    raw = [total * w / weight_sum for w in weights]
+    allocation = [int(value) for value in raw]
+    remaining = total - sum(allocation)
+    by_remainder = sorted(range(len(weights)), key=lambda i: raw[i] - allocation[i], reverse=True)
+    for i in by_remainder[:remaining]:
+        allocation[i] += 1
+    return allocation
+
+
+class QuestionShard:
+    """하나의 문제 생성 요청에 넣을 지문/예문과 문항 수"""
+
+    def __init__(self):
+        self.passages = []
+        self.sentences = []
+        self.question_count = 0
+        self.estimated_tokens = 0
+
+
+def _pack_units(units, budget, base_tokens):
+    """(분배 묶음, 문항 수, 토큰) 목록을 순서대로 예산을 넘기 직전까지 채워 샤드로 만들기"""
+    shards = []
+    shard = None
+    for group, count, cost in units:
+        if shard is None or (shard.passages and shard.estimated_tokens + cost > budget):
+            shard = QuestionShard()
+            shard.estimated_tokens = base_tokens
+            shards.append(shard)
+
+        shard.passages.extend(group["passages"])
+        shard.sentences.extend(group["sentences"])
+        shard.question_count += count
+        shard.estimated_tokens += cost
+    return shards
+
+
+def plan_question_shards(passages, sentences, total_questions, weights=None, base_tokens=0, budget=None,
+                         per_distribution=False):
+    """
+    문제 생성을 토큰 예산 안의 샤드로 나누기
+
+    지문과 예문은 distribution_info(분배) 단위로 묶어 같은 분배가 서로 다른 샤드로 갈라지지 않게 하고,
+    원래 순서를 유지하면서 예산을 넘기 직전까지 채웁니다. 문항 수는 분배별 가중치에 비례하여
+    전체 합이 total_questions가 되도록 배분합니다. 예산 안에 들어가면 샤드 하나를 반환합니다.
+
+    Args:
+        passages: 지문 목록
+        sentences: 예문 목록
+        total_questions: 전체 문항 수
+        weights: distribution_info → 문항 가중치 (없으면 분배마다 1)
+        base_tokens: 지문을 제외한 프롬프트 지시문의 토큰 수
+        budget: 요청 하나의 토큰 상한 (기본값: get_stage_budget("question"))
+        per_distribution: True이면 예산과 관계없이 분배마다 샤드 하나 (문제가 어느 분배에서 나왔는지 알아야 할 때)
+
+    Returns:
+        list: QuestionShard 목록
+    """
+    budget = budget or get_stage_budget("question")
+    weights = weights or {}
+
+    # 분배 단위로 묶기 (처음 등장한 순서 유지)
+    groups = {}
+    for kind, items in (("passages", passages), ("sentences", sentences)):
+        for item in items:
+            group = groups.setdefault(item.get('distribution_info'), {"passages": [], "sentences": []})
+            group[kind].append(item)
+    keys = list(groups)
+    counts = allocate(total_questions, [weights.get(key, 1) for key in keys])
+
+    units = []
+    for key, count in zip(keys, counts):
+        group = groups[key]
+        text = " ".join(p.get('title', '') + " " + p.get('content', '') for p in group["passages"])
+        text += " ".join(s.get('english', '') for s in group["sentences"])
+        units.append((group, count, estimate_tokens(text) + count * OUTPUT_TOKENS_PER_QUESTION))
+
+    if per_distribution:
+        shards = [_pack_units([unit], budget, base_tokens)[0] for unit in units]
+    else:
+        shards = _pack_units(units, budget, base_tokens)
+    if len(shards) > 1 and not per_distribution:
+        # 앞쪽 샤드만 꽉 차지 않도록, 같은 샤드 수를 유지하는 가장 작은 상한을 이분 탐색하여 크기를 고르게 맞춤
+        low = base_tokens + max(cost for _, _, cost in units)
+        high = budget
+        while low < high:
+            middle = (low + high) // 2
+            if len(_pack_units(units, middle, base_tokens)) <= len(shards):
+                high = middle
+            else:
+                low = middle + 1
+        shards = _pack_units(units, high, base_tokens)
+
+    # 문항이 배정되지 않은 샤드는 요청하지 않음
+    return [shard for shard in shards if shard.question_count > 0]
+
+
+def split_by_budget(items, cost, budget, base_tokens=0):
+    """
+    순서를 유지하며 항목들을 토큰 예산 안의 묶음으로 나누기 (예산보다 큰 항목 하나는 단독 묶음)
+
+    Args:
+        cost: 항목 → 예상 토큰 수 함수
+        base_tokens: 묶음마다 공통으로 들어가는 토큰 수
+
+    Returns:
+        list: 항목 목록의 목록
+    """
+    groups = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if not groups or (groups[-1] and used + item_cost > budget):
+            groups.append([])
+            used = base_tokens
+        groups[-1].append(item)
+        used += item_cost
+    return groups
@@ -0,0 +1,186 @@
+"""
+단어 목록 인덱스를 관리하는 파일
+
+DB마다 words 테이블을 한 번만 읽어 레벨별(basic/middle/high) 튜플로 메모리에 보관하고,
+난이도별 레벨 비율에 맞춰 단어를 무작위로 추출합니다.
+요청마다 DB를 조회하거나 ORM 객체를 만들지 않습니다.
+"""
+import random
+import threading
+
+from models import Word
+
+LEVELS = ("basic", "middle", "high")
+
+# 난이도별 단어 레벨 비율 (README의 난이도별 단어 비율 표)
+DIFFICULTY_WORD_RATIOS = {
+    "하": {"basic": 0.4, "middle": 0.6, "high": 0.0},
+    "중간": {"basic": 0.3, "middle": 0.7, "high": 0.0},
+    "상": {"basic": 0.1, "middle": 0.6, "high": 0.3},
+}
+
+# 요청에서 쓰이는 다른 난이도 표기
+DIFFICULTY_ALIASES = {
+    "중": "중간",
+    "분배": "중간",
+    "기본": "하",
+    "고급": "상",
+}
+
+
+def _sample_indices(n, k, rng):
+    """0..n-1 에서 중복 없이 k개 추출 (Floyd 알고리즘, O(k))"""
+    if k >= n:
+        indices = list(range(n))
+        rng.shuffle(indices)
+        return indices
+
+    chosen = set()
+    for j in range(n - k, n):
+        t = rng.randint(0, j)
+        chosen.add(j if t in chosen else t)
+
+    indices = list(chosen)
+    rng.shuffle(indices)
+    return indices
+
+
+def _allocate(count, ratios):
+    """비율에 따라 레벨별 단어 수 배분 (최대 나머지 방식)"""
+    raw = {level: count * ratios.get(level, 0.0) for level in LEVELS}
+    allocation = {level: int(value) for level, value in raw.items()}
+    remaining = count - sum(allocation.values())
+    by_remainder = sorted(LEVELS, key=lambda level: raw[level] - allocation[level], reverse=True)
+    for level in by_remainder[:remaining]:
+        allocation[level] += 1
+    return allocation
+
+
+class VocabularyIndex:
+    """레벨별 단어 인덱스"""
+
+    def __init__(self):
+        self._words = {level: () for level in LEVELS}
+        self._level_by_word = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.version = 0
+
+    def load(self, db_manager):
+        """words 테이블에서 (단어, 레벨) 컬럼만 읽어 인덱스를 다시 구성"""
+        with db_manager.session_scope() as session:
+            rows = session.query(Word.word, Word.level).order_by(Word.id).all()
+
+        self.load_rows(rows)
+
+    def load_rows(self, rows):
+        """(단어, 레벨) 목록으로 인덱스 구성"""
+        buckets = {level: [] for level in LEVELS}
+        level_by_word = {}
+        for word, level in rows:
+            if level not in buckets:
+                continue
+            buckets[level].append(word)
+            level_by_word[word.lower()] = level
+
+        with self._lock:
+            self._words = {level: tuple(words) for level, words in buckets.items()}
+            self._level_by_word = level_by_word
+            self.loaded = True
+            self.version += 1
+
+    def words(self, level):
+        """레벨의 전체 단어 (불변 튜플)"""
+        return self._words.get(level, ())
+
+    def level_of(self, word):
+        """단어의 레벨 (목록에 없으면 None)"""
+        return self._level_by_word.get(word.lower())
+
+    def counts(self):
+        """레벨별 단어 수"""
+        return {level: len(words) for level, words in self._words.items()}
+
+    def sample(self, level, k, rng=None):
+        """레벨에서 k개 단어를 중복 없이 무작위 추출"""
+        rng = rng or random
+        words = self._words.get(level, ())
+        return [words[i] for i in _sample_indices(len(words), k, rng)]
+
+    def sample_by_difficulty(self, difficulty, count, rng=None):
+        """
+        난이도별 레벨 비율에 맞춰 단어 추출
+
+        Args:
+            difficulty: "하", "중간", "상" (또는 "중", "기본", "고급" 등 별칭)
+            count: 추출할 단어 수
+            rng: random.Random 인스턴스 (재현이 필요한 경우)
+
+        Returns:
+            list: 추출된 단어 목록 (레벨 단어가 부족하면 다른 레벨에서 채움)
+        """
+        rng = rng or random
+        difficulty = DIFFICULTY_ALIASES.get(difficulty, difficulty)
+        ratios = DIFFICULTY_WORD_RATIOS.get(difficulty, DIFFICULTY_WORD_RATIOS["중간"])
+
+        words_snapshot = self._words
+        allocation = _allocate(count, ratios)
+
+        # 단어가 부족한 레벨의 몫은 비율이 높은 다른 레벨로 넘김
+        shortage = 0
+        for level in LEVELS:
+            available = len(words_snapshot[level])
+            if allocation[level] > available:
+                shortage += allocation[level] - available
+                allocation[level] = available
+        for level in sorted(LEVELS, key=lambda level: ratios.get(level, 0.0), reverse=True):
+            if shortage <= 0:
+                break
+            extra = min(shortage, len(words_snapshot[level]) - allocation[level])
+            allocation[level] += extra
+            shortage -= extra
+
+        selected = []
+        for level in LEVELS:
+            words = words_snapshot[level]
+            selected.extend(words[i] for i in _sample_indices(len(words), allocation[level], rng))
+
+        rng.shuffle(selected)
+        return selected
+
+
+# DB별 단어 인덱스 (DatabaseManager.cache_key → VocabularyIndex)
+_indexes = {}
+# db_manager 없이 조회할 때 돌려줄 인덱스 (마지막으로 db_manager와 함께 조회한 DB의 인덱스)
+_current = VocabularyIndex()
+_index_lock = threading.Lock()
+
+
+def get_vocabulary_index(db_manager=None):
+    """
+    DB별 단어 인덱스 반환 (DB마다 처음 호출 시 한 번 로드)
+
+    db_manager를 생략하면 마지막으로 조회한 DB의 인덱스를 반환합니다 (지문 어휘 분석 등).
+    """
+    global _current
+    if db_manager is None:
+        return _current
+
+    index = _indexes.get(db_manager.cache_key)
+    if index is None or not index.loaded:
+        with _index_lock:
+            index = _indexes.setdefault(db_manager.cache_key, VocabularyIndex())
+            if not index.loaded:
+                index.load(db_manager)
+    _current = index
+    return index
+
+
+def refresh_vocabulary_index(db_manager):
+    """words 테이블이 바뀐 뒤 그 DB의 인덱스를 명시적으로 다시 로드"""
+    global _current
+    with _index_lock:
+        index = _indexes.setdefault(db_manager.cache_key, VocabularyIndex())
+        index.load(db_manager)
+    _current = index
+    return index
@@ -0,0 +1,219 @@
+"""
+생성된 지문의 필수 단어 사용 여부와 단어 레벨 분포를 로컬에서 분석하는 파일
+
+지문 생성 프롬프트는 "주어진 word_list의 단어를 최소 3개 이상 포함"하도록 요구하지만,
+응답이 이를 지켰는지 다른 LLM 호출로 확인하면 느립니다.
+정규식 토크나이저와 규칙 기반 표제어 추출(불규칙 변화표 + 접미사 규칙)로 단어를 원형으로 바꾸고,
+단어 인덱스(words 테이블)의 레벨을 해시 조회하여 지문마다
+- 사용한/빠진 필수 단어
+- basic/middle/high/목록 외 단어 수
+를 계산합니다. 토큰별 분석 결과는 캐시하고 여러 지문의 레벨 집계는 NumPy bincount로 한 번에 처리하므로
+초당 수천 개 이상의 지문을 검사할 수 있습니다.
+
+- VOCAB_CHECK: warn(기본값, 필수 단어가 부족한 지문을 로그로 알림), reject(결과에서 제외), off
+- VOCAB_MIN_REQUIRED: 지문마다 포함해야 할 최소 필수 단어 수 (기본값 3)
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+from vocabulary_index import LEVELS, get_vocabulary_index
+
+VOCAB_CHECK = os.getenv('VOCAB_CHECK', 'warn')
+VOCAB_MIN_REQUIRED = int(os.getenv('VOCAB_MIN_REQUIRED', 3))
+
+# 레벨 코드 (bincount 열 순서)
+LEVEL_NAMES = LEVELS + ("out_of_list",)
+_LEVEL_CODES = {level: code for code, level in enumerate(LEVEL_NAMES)}
+_OUT_OF_LIST = _LEVEL_CODES["out_of_list"]
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# 중학교 수준에서 자주 나오는 불규칙 변화 → 원형
+IRREGULAR_FORMS = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do",
+    "went": "go", "gone": "go", "goes": "go", "made": "make", "took": "take", "taken": "take",
+    "saw": "see", "seen": "see", "came": "come", "got": "get", "gotten": "get", "gave": "give",
+    "given": "give", "knew": "know", "known": "know", "thought": "think", "told": "tell",
+    "found": "find", "left": "leave", "felt": "feel", "brought": "bring", "bought": "buy",
+    "taught": "teach", "caught": "catch", "ran": "run", "wrote": "write", "written": "write",
+    "ate": "eat", "eaten": "eat", "drank": "drink", "drunk": "drink", "began": "begin",
+    "begun": "begin", "spoke": "speak", "spoken": "speak", "sat": "sit", "stood": "stand",
+    "met": "meet", "sent": "send", "spent": "spend", "built": "build", "lost": "lose",
+    "kept": "keep", "slept": "sleep", "heard": "hear", "said": "say", "paid": "pay", "sold": "sell",
+    "held": "hold", "won": "win", "chose": "choose", "chosen": "choose", "drove": "drive",
+    "driven": "drive", "flew": "fly", "flown": "fly", "grew": "grow", "grown": "grow",
+    "threw": "throw", "thrown": "throw", "forgot": "forget", "forgotten": "forget", "fell": "fall",
+    "fallen": "fall", "broke": "break", "broken": "break", "wore": "wear", "worn": "wear",
+    "swam": "swim", "swum": "swim", "sang": "sing", "sung": "sing", "rode": "ride",
+    "ridden": "ride", "hid": "hide", "hidden": "hide", "became": "become", "understood": "understand",
+    "meant": "mean", "led": "lead", "fed": "feed", "fought": "fight", "woke": "wake",
+    "woken": "wake", "children": "child", "men": "man", "women": "woman", "people": "person",
+    "feet": "foot", "teeth": "tooth", "mice": "mouse", "better": "good", "best": "good",
+    "worse": "bad", "worst": "bad", "i'm": "i", "don't": "do", "doesn't": "do", "didn't": "do",
+    "can't": "can", "won't": "will", "isn't": "be", "aren't": "be", "wasn't": "be",
+}
+
+_VOWELS = set("aeiou")
+
+
+def tokenize(text):
+    """소문자 영어 단어 목록 (소유격 's는 떼어냄)"""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    return [token[:-2] if token.endswith("'s") else token for token in tokens]
+
+
+def lemma_candidates(token):
+    """
+    토큰이 될 수 있는 원형 후보 (토큰 자신이 첫 번째)
+
+    규칙만으로는 어느 후보가 맞는지 알 수 없으므로, 단어 목록에 있는 첫 번째 후보를 원형으로 봅니다.
+    """
+    candidates = [token]
+    if token in IRREGULAR_FORMS:
+        candidates.append(IRREGULAR_FORMS[token])
+
+    def strip(suffix, *replacements):
+        if len(token) > len(suffix) + 1 and token.endswith(suffix):
+            stem = token[:-len(suffix)]
+            candidates.extend(stem + r for r in replacements)
+            # 자음 중복 (stopped → stop, running → run, bigger → big)
+            if len(stem) > 2 and stem[-1] == stem[-2] and stem[-1] not in _VOWELS:
+                candidates.append(stem[:-1])
+
+    strip("ies", "y")
+    strip("ied", "y")
+    strip("ier", "y")
+    strip("iest", "y")
+    strip("ily", "y")
+    strip("ves", "f", "fe")
+    strip("ying", "ie", "y")
+    strip("es", "")
+    if not token.endswith("ss"):
+        strip("s", "")
+    strip("ed", "", "e")
+    strip("ing", "", "e")
+    strip("er", "", "e")
+    strip("est", "", "e")
+    strip("ly", "")
+    return tuple(dict.fromkeys(candidates))
+
+
+def parse_word_list(word_list):
+    """프롬프트의 word_list 문자열("a, b, c") 또는 목록을 소문자 단어 목록으로"""
+    if isinstance(word_list, str):
+        word_list = word_list.split(",")
+    return [word.strip().lower() for word in word_list or [] if word and word.strip()]
+
+
+class VocabularyProfiler:
+    """지문 단어 분석기 (토큰별 원형 후보와 레벨 코드를 캐시)"""
+
+    # 토큰 캐시 최대 크기 (넘으면 비움)
+    MAX_CACHE = 200000
+
+    def __init__(self, level_of=None):
+        """
+        Args:
+            level_of: 단어 → 레벨("basic", "middle", "high" 또는 None) 함수 (없으면 모두 목록 외)
+        """
+        self.level_of = level_of or (lambda word: None)
+        self._cache = {}  # 토큰 → (원형 후보, 레벨 코드)
+        self._lock = threading.Lock()
+
+    def analyze_token(self, token):
+        cached = self._cache.get(token)
+        if cached is not None:
+            return cached
+
+        candidates = lemma_candidates(token)
+        code = _OUT_OF_LIST
+        for candidate in candidates:
+            level = self.level_of(candidate)
+            if level in _LEVEL_CODES:
+                code = _LEVEL_CODES[level]
+                break
+        result = (candidates, code)
+        with self._lock:
+            if len(self._cache) >= self.MAX_CACHE:
+                self._cache = {}
+            self._cache[token] = result
+        return result
+
+    def profile_many(self, texts, required_lists, min_required=None):
+        """
+        여러 지문을 한 번에 분석
+
+        Args:
+            texts: 지문 텍스트 목록
+            required_lists: texts와 같은 순서의 필수 단어 목록 (문자열 "a, b, c" 또는 목록)
+            min_required: 포함해야 할 최소 필수 단어 수 (기본값: VOCAB_MIN_REQUIRED, 필수 단어가 더 적으면 전부)
+
+        Returns:
+            list: 지문별 {"tokens", "levels", "required_used", "required_missing", "compliant"} 목록
+        """
+        min_required = VOCAB_MIN_REQUIRED if min_required is None else min_required
+        analyze = self.analyze_token
+
+        token_lists = [tokenize(text) for text in texts]
+        codes = np.fromiter((analyze(token)[1] for tokens in token_lists for token in tokens), dtype=np.int64)
+        owners = np.repeat(np.arange(len(texts)), [len(tokens) for tokens in token_lists])
+        counts = np.bincount(owners * len(LEVEL_NAMES) + codes,
+                             minlength=len(texts) * len(LEVEL_NAMES)).reshape(len(texts), len(LEVEL_NAMES))
+
+        profiles = []
+        for tokens, level_counts, required in zip(token_lists, counts.tolist(), required_lists):
+            required = parse_word_list(required)
+            lemmas = set()
+            for token in set(tokens):
+                lemmas.update(analyze(token)[0])
+            used = [word for word in required if word in lemmas]
+            profiles.append({
+                "tokens": len(tokens),
+                "levels": dict(zip(LEVEL_NAMES, level_counts)),
+                "required_used": used,
+                "required_missing": [word for word in required if word not in lemmas],
+                "compliant": len(used) >= min(min_required, len(required)),
+            })
+        return profiles
+
+    def profile(self, text, required, min_required=None):
+        """지문 하나 분석 (profile_many 참고)"""
+        return self.profile_many([text], [required], min_required)[0]
+
+
+_profiler = None
+_profiler_version = None  # (인덱스 id, 인덱스 버전)
+_profiler_lock = threading.Lock()
+
+
+def get_vocabulary_profiler():
+    """프로세스 전역 분석기 (단어 인덱스가 바뀌거나 다시 로드되면 새로 만듦)"""
+    global _profiler, _profiler_version
+    index = get_vocabulary_index()
+    version = (id(index), index.version)
+    if _profiler is None or _profiler_version != version:
+        with _profiler_lock:
+            if _profiler is None or _profiler_version != version:
+                _profiler = VocabularyProfiler(index.level_of)
+                _profiler_version = version
+    return _profiler
+
+
+def passage_meets_vocabulary(passage, word_list, label=""):
+    """
+    지문 하나가 필수 단어를 VOCAB_MIN_REQUIRED개 이상 포함하는지 검사
+
+    부족하면 알리고, VOCAB_CHECK가 reject일 때만 False를 반환합니다 (off이면 검사하지 않음).
+    """
+    if VOCAB_CHECK == 'off' or not word_list:
+        return True
+    profile = get_vocabulary_profiler().profile(f"{passage.get('title', '')} {passage.get('content', '')}", word_list)
+    if profile['compliant']:
+        return True
+    print(f"⚠️ {label} 지문 '{passage.get('title', '')}' 필수 단어 {len(profile['required_used'])}개 사용 "
+          f"(최소 {VOCAB_MIN_REQUIRED}개, 누락: {', '.join(profile['required_missing'][:5])})")
+    return VOCAB_CHECK != 'reject'